@@ -0,0 +1,289 @@
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+import traceback
+from Parser import parseXML, produceXML
+import Utils
+import Instrumentation
+import Cache
+import Partition
+
+def analyseFile(inputPath, outputDirectory):
+    """ Analyses the network in inputPath and writes its results to outputDirectory/<network name>_res.xml
+
+    Returns a dictionary with the name of the network, the results file and the time spent in each step, and
+    the report of the counters and timers of the analysis if Utils.instrument is True
+    """
+    if Utils.verbose:
+        print("-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+")
+        print(inputPath)
+        print("-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+")
+    Instrumentation.reset()
+    start = time.perf_counter()
+    with Instrumentation.Timer("parse"):
+        net = parseXML(inputPath)
+    parsed = time.perf_counter()
+    if Utils.partitionWorkers > 1:
+        Partition.analyzeComponents(net, Utils.partitionWorkers)
+    if Utils.verbose:
+        printReport(net)
+    outputPath = os.path.join(outputDirectory, net.name + "_res.xml")
+    with Instrumentation.Timer("results"):
+        produceXML(net, outputPath)
+    done = time.perf_counter()
+    outcome = {"network": net.name, "output": outputPath, "parseSeconds": parsed - start, "analysisSeconds": done - parsed}
+    if Utils.instrument:
+        outcome["instrumentation"] = Instrumentation.getReport()
+    return outcome
+
+def printReport(net):
+    """ Prints loads, stability, curves, delays and backlogs of the network
+    
+    Delays and backlogs are read from Network.analyze, which produceXML then reuses. Loads and stability are
+    read from the link statistics it computed
+    """
+    Utils.printIfVerbose("----------------------------------------")
+    print("\n------------LOADS------------------")
+    loads = net.computeLoads()
+    print(loads)
+    print("\n------------STABILITY------------------")
+    isStable = net.isStable()
+    if isStable:
+        print(net.name + " is stable")
+    else:
+        print(net.name + " is NOT! stable")
+
+    print("\n------------AFFINE CURVES------------------")
+    print("Flow arrival curves:")
+    for flow in net.flows.values():
+        arrival = flow.computeArrivalAffine()
+        Utils.affineCurvePrint(flow, arrival)
+    print("Nodes service curves:")
+    for station in net.stations.values():
+        service = station.computeServiceAffine()
+        Utils.affineCurvePrint(station.name, service)
+    for switch in net.switches.values():
+        service = switch.computeServiceAffine()
+        Utils.affineCurvePrint(switch.name, service)
+
+    print("\n---------End to End Delay -----------------")
+    result = net.analyze()
+    for flow in net.flows.values():
+        for target in flow.targets.values():
+            print("{0}, target {1} has an end to end delay of {2}s".format(str(target.parentFlow.name), \
+            str(target.path[-1]), Utils.createQuantity(result.delays[flow.name][target.name], digits = 4)))
+
+    print("\n--------- Backlogs -----------------")
+    for switch in net.switches.values():
+        for outLink in switch.getLinks():
+            port = result.ports[switch.name][outLink.name]
+            delay = str(Utils.createQuantity(port.delay))
+            backlog = str(Utils.createQuantity(port.backlog, digits = 0))
+            print("{0} leaving from {1} has backlog {2}b and delay {3}s".format(outLink, switch, backlog, delay))
+
+def getSettings():
+    """ Returns the module settings that the worker processes must share with this one """
+    return {"verbose": Utils.verbose, "checkStability": Utils.checkStability, "solver": Utils.solver, "instrument": Utils.instrument,
+            "partitionWorkers": Utils.partitionWorkers, "digitsPrecision": Utils.digitsPrecision,
+            "fixedPointTolerance": Utils.fixedPointTolerance, "fixedPointIterations": Utils.fixedPointIterations}
+
+def applySettings(settings):
+    Utils.verbose = settings["verbose"]
+    Utils.checkStability = settings["checkStability"]
+    Utils.solver = settings["solver"]
+    Utils.instrument = settings["instrument"]
+    Utils.partitionWorkers = settings["partitionWorkers"]
+    Utils.digitsPrecision = settings["digitsPrecision"]
+    Utils.fixedPointTolerance = settings["fixedPointTolerance"]
+    Utils.fixedPointIterations = settings["fixedPointIterations"]
+
+def runWorker(inputPath, outputDirectory, settings, connection, cacheDirectory = None, key = None):
+    """ Entry point of the worker processes, sends the outcome of analyseFile through connection
+
+    The results file is stored in the cache as the entry of key, if given
+    """
+    joinGroup(os.getpid())
+    applySettings(settings)
+    try:
+        outcome = analyseFile(inputPath, outputDirectory)
+        outcome["status"] = "ok"
+    except Exception:
+        outcome = {"status": "error", "error": traceback.format_exc()}
+    if key is not None and outcome["status"] == "ok":
+        try:
+            Cache.store(cacheDirectory, key, outcome["output"])
+        except OSError as error:
+            # The results are still written, only the next runs won't reuse them
+            Utils.printIfVerbose("Results of {0} could not be cached: {1}", inputPath, error)
+    connection.send(outcome)
+    connection.close()
+
+def runBatch(inputPaths, outputDirectory = "PythonResults", workers = None, timeout = None, summaryPath = None,
+             cacheDirectory = None, cacheBytes = Cache.maxBytes):
+    """ Analyses the given files in parallel, each one in its own process, and returns a summary of the batch
+
+    workers is the maximum number of files analysed at the same time, the number of cores by default. Files
+    taking longer than timeout seconds are stopped. A file failing, timing out or crashing its process is
+    reported in the summary and does not affect the others. The summary is also written as JSON to
+    summaryPath if given.
+    If cacheDirectory is given, files analysed before with the same contents, settings and code get their
+    results copied from the cache without being parsed, see Cache. The cache is then brought back to at most
+    cacheBytes.
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    os.makedirs(outputDirectory, exist_ok = True)
+    settings = getSettings()
+    if cacheDirectory is not None:
+        os.makedirs(cacheDirectory, exist_ok = True)
+
+    batchStart = time.perf_counter()
+    pending = list(reversed(inputPaths))
+    running = {} # connection -> (process, input path, start time)
+    outcomes = {}
+
+    try:
+        analyseFiles(pending, running, outcomes, outputDirectory, workers, timeout, settings, cacheDirectory)
+    finally:
+        # Interrupted, the files being analysed are stopped with the processes they started
+        for process, inputPath, start in running.values():
+            stopProcess(process)
+
+    files = []
+    counts = {}
+    for inputPath in inputPaths:
+        outcome = outcomes[inputPath]
+        outcome["file"] = inputPath
+        files.append(outcome)
+        counts[outcome["status"]] = counts.get(outcome["status"], 0) + 1
+    summary = {"outputDirectory": outputDirectory, "workers": workers, "timeout": timeout, "cache": cacheDirectory,
+               "seconds": time.perf_counter() - batchStart, "counts": counts, "files": files}
+    if cacheDirectory is not None:
+        Cache.evict(cacheDirectory, cacheBytes)
+
+    if summaryPath is not None:
+        with open(summaryPath, "w") as summaryFile:
+            json.dump(summary, summaryFile, indent = "\t")
+    return summary
+
+def analyseFiles(pending, running, outcomes, outputDirectory, workers, timeout, settings, cacheDirectory):
+    """ Starts a worker for each pending file, up to workers at the same time, and records their outcomes until all are analysed """
+    while pending or running:
+        # Keep all the workers busy
+        while pending and len(running) < workers:
+            inputPath = pending.pop()
+            key = None
+            if cacheDirectory is not None:
+                start = time.perf_counter()
+                key, outcome = fetchCached(inputPath, outputDirectory, settings, cacheDirectory)
+                if outcome is not None:
+                    outcome["seconds"] = time.perf_counter() - start
+                    outcomes[inputPath] = outcome
+                    printOutcome(inputPath, outcome)
+                    continue
+            receiver, sender = multiprocessing.Pipe(duplex = False)
+            # Daemonic processes can't start the processes analysing the components of their network
+            process = multiprocessing.Process(target = runWorker, args = (inputPath, outputDirectory, settings, sender, cacheDirectory, key),
+                                              daemon = settings["partitionWorkers"] <= 1)
+            process.start()
+            joinGroup(process.pid)
+            sender.close() # Only the worker writes, so that its end is closed if it dies
+            running[receiver] = (process, inputPath, time.perf_counter())
+        if not running:
+            continue # Every remaining file was cached
+
+        waitSeconds = None
+        if timeout is not None:
+            firstDeadline = min(start for process, inputPath, start in running.values()) + timeout
+            waitSeconds = max(0, firstDeadline - time.perf_counter())
+
+        for receiver in multiprocessing.connection.wait(list(running), waitSeconds):
+            process, inputPath, start = running.pop(receiver)
+            try:
+                outcome = receiver.recv()
+            except EOFError:
+                outcome = None
+            receiver.close()
+            process.join()
+            if outcome is None:
+                outcome = {"status": "crashed", "error": "The worker process exited with code {0}".format(process.exitcode)}
+            outcome["seconds"] = time.perf_counter() - start
+            outcomes[inputPath] = outcome
+            printOutcome(inputPath, outcome)
+
+        if timeout is not None:
+            now = time.perf_counter()
+            for receiver, (process, inputPath, start) in list(running.items()):
+                if now - start >= timeout:
+                    stopProcess(process)
+                    receiver.close()
+                    del running[receiver]
+                    outcome = {"status": "timeout", "error": "The analysis took more than {0}s".format(timeout), "seconds": now - start}
+                    outcomes[inputPath] = outcome
+                    printOutcome(inputPath, outcome)
+
+def fetchCached(inputPath, outputDirectory, settings, cacheDirectory):
+    """ Returns the cache key of the file and, if its results are cached, the outcome of copying them to outputDirectory
+
+    The outcome is None if the results must be computed, the key is None if the file can't be read
+    """
+    try:
+        key = Cache.computeKey(inputPath, settings)
+    except OSError:
+        return None, None # The worker reports the error
+    outputPath = Cache.fetch(cacheDirectory, key, outputDirectory)
+    if outputPath is None:
+        return key, None
+    network = os.path.basename(outputPath)[:-len("_res.xml")]
+    return key, {"network": network, "output": outputPath, "status": "ok", "cached": True}
+
+def joinGroup(pid):
+    """ Makes the process pid lead its own process group, which the processes it starts join
+
+    Called by both the batch and the worker, so that the group exists whichever runs first
+    """
+    if hasattr(os, "setpgid"):
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            pass # The worker already exited, or already left the group
+
+def stopProcess(process):
+    """ Terminates a worker and the processes it started, such as those of Partition """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (AttributeError, OSError):
+        process.terminate() # Processes have no groups, or the worker has not joined its own yet
+    process.join()
+
+def watchDirectory(directory, searchFiles, outputDirectory = "PythonResults", interval = 1.0, **batchArguments):
+    """ Analyses the files of directory whose name finishes by searchFiles, then those that are new or modified
+
+    The directory is checked every interval seconds. Yields the summary of runBatch, which receives
+    batchArguments, each time files are analysed. A file is analysed again when its modification time or size
+    change, even if it failed before.
+    """
+    signatures = {} # input path -> (modification time, size) when last analysed
+    while True:
+        current = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith(searchFiles) and entry.is_file():
+                stat = entry.stat()
+                current[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        changed = sorted(path for path, signature in current.items() if signatures.get(path) != signature)
+        signatures = current
+        if changed:
+            yield runBatch(changed, outputDirectory, **batchArguments)
+        time.sleep(interval)
+
+def printOutcome(inputPath, outcome):
+    if outcome.get("cached"):
+        print("{0}: copied from the cache to {1} in {2:.3f}s".format(inputPath, outcome["output"], outcome["seconds"]))
+    elif outcome["status"] == "ok":
+        print("{0}: written to {1} in {2:.3f}s".format(inputPath, outcome["output"], outcome["seconds"]))
+    else:
+        print("ERROR: {0}: {1} after {2:.3f}s".format(inputPath, outcome["status"], outcome["seconds"]))
+        Utils.printIfVerbose(outcome["error"])
@@ -0,0 +1,151 @@
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import traceback
+try:
+    import resource
+except ImportError:
+    resource = None # Not available on Windows, peak memory is then not recorded
+import Batch
+import Generator
+from Parser import parseXML, produceXML
+
+# Generator.generateNetwork parameters of the networks benchmarked, by name
+cases = {
+    "small": {"switches": 8, "stationsPerSwitch": 4, "flows": 200, "multicast": 3, "highPriorityShare": 0.2, "transmissionCapacity": "1Gbps"},
+    "medium": {"switches": 24, "stationsPerSwitch": 8, "flows": 2000, "multicast": 4, "highPriorityShare": 0.2, "transmissionCapacity": "10Gbps"},
+    "longPaths": {"switches": 200, "stationsPerSwitch": 2, "flows": 1000, "multicast": 2, "highPriorityShare": 0.2, "transmissionCapacity": "1Gbps"},
+    "large": {"switches": 48, "stationsPerSwitch": 10, "flows": 10000, "multicast": 4, "highPriorityShare": 0.2, "transmissionCapacity": "10Gbps"},
+}
+defaultCases = ["small", "medium", "longPaths"]
+stages = ["parse", "loads", "analysis", "output"]
+minimumSeconds = 0.01 # Time differences below this are never reported as regressions, they are mostly noise
+
+def runBenchmark(caseNames = defaultCases, repeat = 3, seed = 0):
+    """ Times each stage of the analysis of the generated networks of the given cases, returns the measures of each case
+
+    Every case is run in its own process, so that its peak memory is not affected by the others. The stages
+    are parsing, computing the loads and stability, computing the delays and backlogs, and writing the results.
+    Each stage is run repeat times, the network being parsed again every time, and its best time is kept.
+    Returns {case: {stage: seconds, "peakMemoryMB": peak resident memory of the first run}}, or
+    {case: {"error": error}} for the cases that failed.
+    """
+    settings = Batch.getSettings()
+    measures = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for caseName in caseNames:
+            receiver, sender = multiprocessing.Pipe(duplex = False)
+            process = multiprocessing.Process(target = runCase, args = (caseName, directory, repeat, seed, settings, sender))
+            process.start()
+            sender.close()
+            try:
+                measures[caseName] = receiver.recv()
+            except EOFError:
+                process.join()
+                measures[caseName] = {"error": "The benchmark process exited with code {0}".format(process.exitcode)}
+            receiver.close()
+            process.join()
+    return measures
+
+def runCase(caseName, directory, repeat, seed, settings, connection):
+    """ Entry point of the benchmark processes, sends the measures of the case through connection """
+    Batch.applySettings(settings)
+    try:
+        inputPath = os.path.join(directory, caseName + ".xml")
+        outputPath = os.path.join(directory, caseName + "_res.xml")
+        Generator.generateNetwork(inputPath, seed = seed, name = caseName, **cases[caseName])
+        caseMeasures = {stage: float("inf") for stage in stages}
+        for i in range(repeat):
+            times = [time.perf_counter()]
+            net = parseXML(inputPath)
+            times.append(time.perf_counter())
+            net.computeLoads()
+            net.isStable()
+            times.append(time.perf_counter())
+            for flow in net.flows.values():
+                for target in flow.targets.values():
+                    target.computeEndToEndDelay()
+            for switch in net.switches.values():
+                for link in switch.getLinks():
+                    switch.getBacklog(link)
+            times.append(time.perf_counter())
+            produceXML(net, outputPath)
+            times.append(time.perf_counter())
+            for stage, start, end in zip(stages, times, times[1:]):
+                caseMeasures[stage] = min(caseMeasures[stage], end - start)
+            if i == 0 and resource is not None:
+                # Measured on the first run only, memory freed by a run is not always reused by the next one. Kilobytes on Linux
+                caseMeasures["peakMemoryMB"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+            del net
+    except Exception:
+        caseMeasures = {"error": traceback.format_exc()}
+    connection.send(caseMeasures)
+    connection.close()
+
+def findRegressions(measures, baseline, budget = 0.2):
+    """ Returns the measures exceeding their baseline by more than the budget, as (case, measure, baseline value, value) tuples
+
+    budget is a fraction of the baseline value. Measures missing from either side are not compared.
+    """
+    regressions = []
+    for caseName, caseMeasures in measures.items():
+        for measure, value in caseMeasures.items():
+            baselineValue = baseline.get(caseName, {}).get(measure)
+            if measure == "error" or baselineValue is None:
+                continue
+            if measure in stages and value - baselineValue < minimumSeconds:
+                continue
+            if value > baselineValue*(1 + budget):
+                regressions.append((caseName, measure, baselineValue, value))
+    return regressions
+
+def printMeasures(measures):
+    print("{0:<12}".format("case") + "".join("{0:>14}".format(stage + " (s)") for stage in stages) + "{0:>14}".format("peak (MB)"))
+    for caseName, caseMeasures in measures.items():
+        if "error" in caseMeasures:
+            print("ERROR: {0} failed".format(caseName))
+            print(caseMeasures["error"])
+            continue
+        print("{0:<12}".format(caseName) + "".join("{0:>14.4f}".format(caseMeasures[stage]) for stage in stages)
+              + "{0:>14.1f}".format(caseMeasures.get("peakMemoryMB", float("nan"))))
+
+def main(arguments = None):
+    """ Runs the benchmark, compares it with a stored baseline or stores it as the new baseline """
+    parser = argparse.ArgumentParser(description = "Times parsing, loads, analysis and output of generated networks")
+    parser.add_argument("--cases", default = ",".join(defaultCases), help = "comma separated cases among " + ", ".join(cases))
+    parser.add_argument("--repeat", type = int, default = 3, help = "times each stage is run, the best time is kept")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the generated networks")
+    parser.add_argument("--baseline", default = "benchmark_baseline.json", help = "JSON file of the baseline measures")
+    parser.add_argument("--save", action = "store_true", help = "store the measures as the new baseline instead of comparing them")
+    parser.add_argument("--budget", type = float, default = 0.2, help = "fraction by which a measure may exceed its baseline")
+    args = parser.parse_args(arguments)
+
+    caseNames = args.cases.split(",")
+    for caseName in caseNames:
+        if caseName not in cases:
+            print("ERROR: {0} is not a benchmark case!".format(caseName))
+            raise KeyError
+    measures = runBenchmark(caseNames, args.repeat, args.seed)
+    printMeasures(measures)
+
+    regressions = []
+    if args.save:
+        with open(args.baseline, "w") as baselineFile:
+            json.dump(measures, baselineFile, indent = "\t")
+        print("\nBaseline written to " + args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        regressions = findRegressions(measures, baseline, args.budget)
+        for caseName, measure, baselineValue, value in regressions:
+            print("REGRESSION: {0} {1} went from {2:.4f} to {3:.4f}".format(caseName, measure, baselineValue, value))
+        if not regressions:
+            print("\nNo regression beyond {0:.0f}% of the baseline".format(100*args.budget))
+    return regressions
+
+if __name__ == "__main__":
+    if main():
+        raise SystemExit(1)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# Cache of results files, keyed by the hash of the input file, of the settings changing the results and of the analysis code
+cacheDirectory = ".wopanets_cache"
+maxBytes = 256*1024*1024 # Entries used least recently are removed beyond this size
+keySettings = ["checkStability", "digitsPrecision", "solver", "fixedPointTolerance", "fixedPointIterations"] # Batch settings that change the results
+staleSeconds = 3600 # Entries being stored for longer than this are removed by evict
+analysisModules = ["Classes.py", "Engine.py", "Parser.py", "Partition.py", "Utils.py", "Vectorized.py"]
+codeHash = None
+
+def getCodeHash():
+    """ Returns the hash of the source of the analysis modules, so that results of a different version are not reused """
+    global codeHash
+    if codeHash is None:
+        digest = hashlib.sha256()
+        moduleDirectory = os.path.dirname(os.path.abspath(__file__))
+        for module in analysisModules:
+            with open(os.path.join(moduleDirectory, module), "rb") as moduleFile:
+                digest.update(moduleFile.read())
+        codeHash = digest.hexdigest()
+    return codeHash
+
+def computeKey(inputPath, settings):
+    """ Returns the key of the results of the file in inputPath analysed with the given Batch settings """
+    digest = hashlib.sha256()
+    with open(inputPath, "rb") as inputFile:
+        for block in iter(lambda: inputFile.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps({name: settings[name] for name in keySettings}, sort_keys = True).encode())
+    digest.update(getCodeHash().encode())
+    return digest.hexdigest()
+
+def fetch(directory, key, outputDirectory):
+    """ Copies the cached results file of key to outputDirectory, returns its path or None if key is not cached """
+    entry = os.path.join(directory, key)
+    try:
+        filenames = os.listdir(entry)
+    except FileNotFoundError:
+        return None
+    if len(filenames) != 1:
+        return None
+    outputPath = os.path.join(outputDirectory, filenames[0])
+    shutil.copyfile(os.path.join(entry, filenames[0]), outputPath)
+    os.utime(entry) # Marks the entry as recently used
+    return outputPath
+
+def store(directory, key, outputPath):
+    """ Stores a copy of the results file in outputPath as the entry of key
+
+    The entry is written aside and then renamed, so processes storing the same key at the same time never
+    leave a partial entry
+    """
+    entry = os.path.join(directory, key)
+    if os.path.isdir(entry):
+        return
+    temporary = "{0}.{1}.tmp".format(entry, os.getpid())
+    os.makedirs(temporary, exist_ok = True)
+    shutil.copyfile(outputPath, os.path.join(temporary, os.path.basename(outputPath)))
+    try:
+        os.rename(temporary, entry)
+    except OSError:
+        shutil.rmtree(temporary, ignore_errors = True) # Stored by another process in the meantime
+
+def evict(directory, maxBytes = maxBytes):
+    """ Removes the entries used least recently until the cache takes at most maxBytes, returns the number removed """
+    if not os.path.isdir(directory):
+        return 0
+    entries = []
+    totalBytes = 0
+    for entry in os.scandir(directory):
+        if not entry.is_dir():
+            continue
+        if entry.name.endswith(".tmp"):
+            # Left by a process that died while storing it
+            if time.time() - entry.stat().st_mtime > staleSeconds:
+                shutil.rmtree(entry.path, ignore_errors = True)
+            continue
+        entryBytes = sum(item.stat().st_size for item in os.scandir(entry.path))
+        entries.append((entry.stat().st_mtime, entryBytes, entry.path))
+        totalBytes += entryBytes
+    entries.sort()
+    removed = 0
+    for lastUse, entryBytes, path in entries:
+        if totalBytes <= maxBytes:
+            break
+        shutil.rmtree(path, ignore_errors = True)
+        totalBytes -= entryBytes
+        removed += 1
+    return removed
@@ -1,8 +1,14 @@
+from collections import namedtuple
+from types import MappingProxyType
 from Utils import createQuantity, printIfVerbose, computeTheorem1Delay, computeTheorem1Backlog, ceilWithUnit
+import Utils
+import Instrumentation
 
 class AffineCurve():
     """ Represents an affice service or arrival curve """
     #TODO: Implement polynomial representations. Numpy?
+    __slots__ = ("m", "n") # No attribute dictionary, there is a curve per flow and port
+    
     def __init__(self, m, n):
         self.m = m
         self.n = n
@@ -23,6 +29,16 @@ class AffineCurve():
             return AffineCurve(self.m + v.m, self.n + v.n)
         else:
             return AffineCurve(self.m, self.n + v.n)
+    
+    def __iadd__(self, v):
+        """ Adds v to the curve in place, so that sums such as aggregate arrivals don't build a curve per term
+        
+        Curves shared with other objects must not be accumulated into, only new ones
+        """
+        if isinstance(v, AffineCurve):
+            self.m += v.m
+        self.n += v.n
+        return self
     def __mul__(self, v):
         return AffineCurve(self.m*v, self.n*v)    
     def __div__(self, v):
@@ -31,8 +47,30 @@ class AffineCurve():
     def __str__(self):
         return "y = {0}bps*x + {1}b".format(createQuantity(self.m), createQuantity(self.n))
 
+class FlowOutput():
+    """ Result of the computation of a flow at an output port, see Node.computeTargetArrivalAffine
+    
+    Holds the flow's output arrival curve, its delay up to and including the port, and the aggregate arrival
+    curve and backlog of the port. Values can also be read by name as in a dictionary, e.g. output["delay"]
+    """
+    __slots__ = ("outputArrival", "delay", "totalArrival", "backlog")
+    
+    def __init__(self, outputArrival, delay, totalArrival, backlog):
+        self.outputArrival = outputArrival
+        self.delay = delay
+        self.totalArrival = totalArrival
+        self.backlog = backlog
+    
+    def __getitem__(self, key):
+        if key not in FlowOutput.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
 class Target():
     """ This class represents the target of a data flow """
+    __slots__ = ("target", "name", "source", "redundancy", "parentFlow", "path", "network", "linkDirections", "hops", "previousHops",
+                 "nextHops", "hopIndex")
+    
     def __init__(self, target, source, parentFlow, redundancy = "MAIN"):
         self.target = target
         self.name = target
@@ -49,87 +87,99 @@ class Target():
         
     def hasPath(self):
         """ Returns true if the target's path has been correctly created within the network, false otherwise """
+        return self.checkPath()[0] is None
+    
+    def findPathError(self):
+        """ Returns a description of what is wrong with the target's path, None if the path is correct
+        
+        The direction in which each link is traversed is recorded, see checkPath. The parent flow is assigned to
+        the links by Network.registerFlow
+        """
+        error, linkDirections = self.checkPath()
+        if linkDirections is not None:
+            self.linkDirections = linkDirections
+            self.parentFlow.tree = None # Built again from the new directions
+        return error
+    
+    def checkPath(self):
+        """ Returns the description of what is wrong with the target's path, None if the path is correct, and the direction in which each link is traversed
+        
+        Links are followed up to the first error, the directions are None if the path is empty. The target is left
+        unchanged, see findPathError
+        """
+        if not self.path:
+            return "the path is empty", None
+        
         intermediateSource = self.source #This variable will store the current source in any given link
-        hasPath = True
+        linkDirections = {}
+        connectingLinks = self.network.connectingLinks # As getConnectingLink, read once for the whole path
         
         #Is the path propperly connected i.e. are there links between all intermediate steps?
-        for pathElement in self.path: 
-            for link in self.network.links.values():
-                # Check if our current source and destination are connected.
-                if link.connectsSystems(intermediateSource, pathElement):
-                    #printIfVerbose(str(link) + " connects the systems")
-                    link.flows[self.parentFlow.name] = self.parentFlow #Assign myself to the link's flows
-                    hasPath = True
-                    break
-                else:
-                    hasPath = False
+        for pathElement in self.path:
+            link = connectingLinks.get((intermediateSource, pathElement))
             # If the current source and destination are not connected, the path is not propperly connected
-            if not hasPath:
-                return False
+            if link is None:
+                return "there is no link between {0} and {1}".format(intermediateSource, pathElement), linkDirections
+            linkDirections.setdefault(link, "direct" if link.start == intermediateSource else "inverse")
             # If they are connected, set the old destination as new source and check if its connected to the next destination
             intermediateSource = pathElement
         
         # The path is propperly connected. Does it lead to out target?
-        if self.path[-1] == self.target:
-            return True
-        else:
-            return False    
+        if self.path[-1] != self.target:
+            return "the path ends at {0} instead of {1}".format(self.path[-1], self.target), linkDirections
+        return None, linkDirections
+    
+    def freezeRoute(self):
+        """ Builds the tables used to answer position, direction and neighbour questions about the path
+        
+        Must be called again if the path is modified
+        """
+        self.parentFlow.tree = None # Built again from the new route
+        self.hops = tuple([self.source] + self.path) # XML path does not contain the source
+        self.previousHops = (None,) + self.hops[:-1]
+        self.nextHops = self.hops[1:] + (None,)
+        # Only the first appearance of a node counts, as when the path was scanned: the hops are indexed backwards
+        self.hopIndex = dict(zip(reversed(self.hops), range(len(self.hops) - 1, -1, -1)))
 
     def isDirectWith(self, nodeA, nodeB):
         """ Returns true if nodeB comes after nodeA in the target's path, false otherwise """
-        direct = None
-        
         if nodeA == nodeB:
             print("ERROR: Tried to see if {0} was direct with respect to identical nodes {1}".format(self, nodeA))
             raise ValueError
         
-        completePath = [self.source] + self.path # XML path does not contain the source
-        
-        for node in completePath:
-            if node == nodeA:
-                if direct == False:
-                    return False
-                elif direct == True:
-                    print("ERROR: This is a circular path that does not contain node B?")
-                    raise ValueError # Circular path that does not contain nodeB?
-                else:
-                    direct = True
-            elif node == nodeB:
-                if direct == True:
-                    return True
-                elif direct == False:
-                    print("ERROR: This is a circular path that does not contain node B?")
-                    raise ValueError # Circular path that does not contain nodeA?
-                else:
-                    direct = False
-        if direct == True:
+        indexA = self.hopIndex.get(nodeA)
+        indexB = self.hopIndex.get(nodeB)
+        if indexA is not None and indexB is not None:
+            return indexA < indexB
+        
+        if indexA is not None:
             print("ERROR: {0} does not contain node B: {1}".format(self, nodeB))
-            printIfVerbose([str(k) for k in completePath])
-        elif direct == False:
+            printIfVerbose([str(k) for k in self.hops])
+        elif indexB is not None:
             print("ERROR: {0} does not contain node A: {1}".format(self, nodeA))
-            printIfVerbose([str(k) for k in completePath])
+            printIfVerbose([str(k) for k in self.hops])
         else:
             print("ERROR: {0} does not contain neither {1} nor {2}".format(self, nodeA, nodeB))
         raise ValueError 
     
-    def computeEndToEndDelay(self):
-        """ Computes the end to end delay of the target's parent flow through the target's path """
+    def computeEndToEndDelay(self, solver = None, state = None):
+        """ Computes the end to end delay of the target's parent flow through the target's path
+        
+        solver selects the analysis engine and state the AnalysisState holding the results, see Network.getEngine.
+        The network's configuration is used, see Network.getConfig
+        """
         
         destinationNode = self.path[-1]
         priorToDestNode = self.findPreviousNode(destinationNode)
-        delay = priorToDestNode.computeTargetArrivalAffine(self)["delay"]
+        with Utils.ConfigScope(self.network.getConfig()):
+            delay = self.network.getEngine(solver, state).computeTargetArrivalAffine(priorToDestNode, self).delay
 #         return ceilWithUnit(delay, "u")
         return delay
     
     def findPreviousNode(self, node):
         """ Returns the node previous to a given node, None if the node has no previous node or is not in path """
-        prevNode = None
-        for i in range(len(self.path)):
-            if self.path[i] == node:
-                if i == 0:
-                    prevNode = self.source
-                else:
-                    prevNode = self.path[i-1]
+        index = self.hopIndex.get(node)
+        prevNode = None if index is None else self.previousHops[index]
         if prevNode is None:
             print("ERROR: Tried to find the precedent of {0} in {1}'s path yet found none!".format(node, self))
             raise Exception
@@ -138,12 +188,8 @@ class Target():
     
     def findNextNode(self, node):
         """ Find the node after the given node, none if the node is not in the path or is the last one"""
-        endNode = None
-        if node == self.source:
-            endNode = self.path[0]
-        for i in range(len(self.path) - 1):
-            if self.path[i] == node:
-                endNode = self.path[i+1]
+        index = self.hopIndex.get(node)
+        endNode = None if index is None else self.nextHops[index]
         if endNode is None:
             print("ERROR: Tried to find the subsequent of {0} in {1}'s path yet found none!".format(node, self))
             raise Exception
@@ -165,6 +211,8 @@ class Target():
 
 class Node():
     """ This class is a superclass of stations and switches of a network"""
+    __slots__ = ("name", "service_policy", "transmission_capacity", "x", "y", "tech_latency", "flows", "network")
+    
     def __init__(self, name, service_policy, transmission_capacity, x, y, tech_latency = 0):
         self.name = name
         self.service_policy = service_policy
@@ -178,31 +226,11 @@ class Node():
     def setNetwork(self, network):
         self.network = network
         
-    def initAllDicts(self):
-        """ Some dictionaries can only be created when the network is fully initialised """
-        self.initArrivalDict()
-        self.initDelayDict()
-        self.initBacklogDict()
-    
-    def initDelayDict(self):
-        self.delayBoundsPerLink = {}
-        for link in self.getLinks():
-            self.delayBoundsPerLink[link] = -1
-    def initArrivalDict(self):
-        self.totalArrivalsPerLink = {}
-        for link in self.getLinks():
-            self.totalArrivalsPerLink[link] = AffineCurve(-1, 0)
-            
-    def initBacklogDict(self):
-        self.backlogsPerLink = {}
-        for link in self.getLinks():
-            self.backlogsPerLink[link] = -1
-            
     def computeServiceAffine(self):
         return AffineCurve(self.transmission_capacity, -self.transmission_capacity*self.tech_latency)
     
-    def getWorstCaseService(self, target):
-        """ Modifies node's service curve to account for worst-case multiplexing scenario for given flow """
+    def getWorstCaseService(self, target, state = None):
+        """ Modifies node's service curve to account for worst-case multiplexing scenario for given flow, state is the AnalysisState of the analysis """
         
         service = self.computeServiceAffine() # Get the unaltered service curve
         link = target.findOutgoingLink(self) # Find out the outgoing link of this traffic
@@ -222,7 +250,7 @@ class Node():
                 # Find the node previous to this one in the path to said target
                 otherPrevious = otherTarget.findPreviousNode(self) 
                 # Find the arrival curve at the output of the previous node by recursively calling this function
-                otherArrival = otherPrevious.computeTargetArrivalAffine(otherTarget)["outputArrival"]
+                otherArrival = otherPrevious.computeTargetArrivalAffine(otherTarget, state).outputArrival
                 # Modify service curve
                 service.m -= otherArrival.m
                 service.n -= otherArrival.n
@@ -236,7 +264,7 @@ class Node():
         
         return service
     
-    def computeTargetArrivalAffine(self, target):
+    def computeTargetArrivalAffine(self, target, state = None):
         """ Computes target's output arrival affine curve, total delay up to this point, backlog, and total arrival curves incoming to this outgoing port of the node
         
         Relies on theorem 1 calculation to find the delay given a known arrival curve and a know service curve,
@@ -244,17 +272,23 @@ class Node():
         that node and the input arrival curve.
         
         This calculation is highly recursive! It will call itself on all nodes within the paths of all flows using
-        the same output link of this node as the one used by the given target.
+        the same output link of this node as the one used by the given target. The results of the ports are
+        stored in state, the network's AnalysisState if None.
         """
+        if state is None:
+            state = self.network.getState()
         
-        printIfVerbose("Calculating affine output arrival of {0} for flux {1}\n".format(str(self), str(target)))
+        if Utils.getConfig().instrument:
+            Instrumentation.count("recursive.calls")
+        printIfVerbose("Calculating affine output arrival of {0} for flux {1}\n", self, target)
                 
         totalArrival = AffineCurve(0, 0)
         tempArrival = AffineCurve(0, 0)
         totalDelay = 0 # Stores the flow's delay bound up until this node
         
         link = target.findOutgoingLink(self) # Find out the outgoing link of this traffic
-        linkDelayCalculated = self.delayBoundsPerLink[link] >= 0
+        port = (self, link)
+        linkDelayCalculated = state.delayBounds.get(port, -1) >= 0
         flows = link.getFlowsInSameDirection(target)
         
         # If source, 
@@ -271,98 +305,98 @@ class Node():
                 currentTarget = flow.findTargetPassingThroughNode(self)
                 previousNode = currentTarget.findPreviousNode(self)
                 if not linkDelayCalculated or flow == target.parentFlow:
-                    tempOutput = previousNode.computeTargetArrivalAffine(currentTarget)
-                    tempArrival = tempOutput["outputArrival"]
-                    tempDelay = tempOutput["delay"]
+                    tempOutput = previousNode.computeTargetArrivalAffine(currentTarget, state)
+                    tempArrival = tempOutput.outputArrival
+                    tempDelay = tempOutput.delay
                     if flow == target.parentFlow:
                         totalDelay += tempDelay # Add the delay up to this point
                         arrival = tempArrival
                     totalArrival += tempArrival
         
-        printIfVerbose("Looking at node " + str(self.name))
-        printIfVerbose("The input arrival curve to {0} for {1} is {2}".format(self, target.parentFlow, arrival))
+        printIfVerbose("Looking at node {0}", self.name)
+        printIfVerbose("The input arrival curve to {0} for {1} is {2}", self, target.parentFlow, arrival)
         
         # Now we need to factor in how multiplexing flows affects the service curve of the node
-        service = self.getWorstCaseService(target)      
-        printIfVerbose("The adjusted service curve of {0} is {1}".format(link,service))
-        printIfVerbose("The aggregate arrival curve to {0} for {1} is {2}".format(self, link, totalArrival))
+        service = self.getWorstCaseService(target, state)      
+        printIfVerbose("The adjusted service curve of {0} is {1}", link, service)
+        printIfVerbose("The aggregate arrival curve to {0} for {1} is {2}", self, link, totalArrival)
         
         backlog = computeTheorem1Backlog(totalArrival, service)
-        printIfVerbose("Backlog for {0} is {1}".format(self, backlog))
+        printIfVerbose("Backlog for {0} is {1}", self, backlog)
         
         # Next, calculate the incurred delay in this node given the new arrival and service curves 
         if not linkDelayCalculated:
+            if Utils.getConfig().instrument:
+                Instrumentation.count("ports.evaluated")
             delay = computeTheorem1Delay(totalArrival, service)
             # Store values for future reference
-            self.delayBoundsPerLink[link] = delay
-            self.totalArrivalsPerLink[link] = totalArrival
-            self.backlogsPerLink[link] = backlog
+            state.delayBounds[port] = delay
+            state.totalArrivals[port] = totalArrival
+            state.backlogs[port] = backlog
         else:
-            delay = self.delayBoundsPerLink[link]
-            totalArrival = self.totalArrivalsPerLink[link]
-            backlog = self.backlogsPerLink[link] 
+            delay = state.delayBounds[port]
+            totalArrival = state.totalArrivals[port]
+            backlog = state.backlogs[port]
         totalDelay += delay
-        printIfVerbose("Delay at node {0} is {1}s".format(self.name, createQuantity(delay)))
+        printIfVerbose("Delay at node {0} is {1}s", self.name, lambda: createQuantity(delay))
         
         outputArrival = arrival.delayBy(delay)
-        printIfVerbose("The output arrival curve of {0} for {1} is {2} \n".format(self, target.parentFlow, outputArrival))
+        printIfVerbose("The output arrival curve of {0} for {1} is {2} \n", self, target.parentFlow, outputArrival)
         
-        return {"outputArrival": outputArrival, "delay": totalDelay, "totalArrival": totalArrival, "backlog": backlog}
+        return FlowOutput(outputArrival, totalDelay, totalArrival, backlog)
     
     def getLinks(self):
         """ Returns a list containing all Links connected to self """
-        connectingLinks = []
-        for link in self.network.links.values():
-            if link.start == self or link.end == self:
-                connectingLinks.append(link)
-        return connectingLinks
-    
-    def getBacklog(self, link):
-        """ Returns the backlog on flows outgoing on this link """
-        if self.backlogsPerLink[link] >= 0:
-            return self.backlogsPerLink[link]
+        return self.network.linksPerNode.get(self, [])
+    
+    def getBacklog(self, link, solver = None, state = None):
+        """ Returns the backlog on flows outgoing on this link, solver selects the analysis engine and state the AnalysisState, see Network.getEngine """
+        state = self.network.getState(state)
+        backlog = state.backlogs.get((self, link), -1)
+        if backlog >= 0:
+            return backlog
         else:
             anOutgoingTarget = self.getTargetLeavingThroughLink(link)
             if anOutgoingTarget is None:
                 # No links outgoing through this link, so no backlog either
                 return 0
             else:
-                backlog = self.computeTargetArrivalAffine(anOutgoingTarget)["backlog"]
+                with Utils.ConfigScope(self.network.getConfig()):
+                    backlog = self.network.getEngine(solver, state).computeTargetArrivalAffine(self, anOutgoingTarget).backlog
                 return backlog
     
-    def getTotalBacklog(self):
+    def getTotalBacklog(self, solver = None, state = None):
         totalBacklog = 0
         for link in self.getLinks():
-            totalBacklog += self.getBacklog(link)
+            totalBacklog += self.getBacklog(link, solver, state)
         return totalBacklog
        
-    def getDelay(self, link):
-        if self.delayBoundsPerLink[link] >= 0:
-            return self.delayBoundsPerLink[link]
+    def getDelay(self, link, solver = None, state = None):
+        """ Returns the delay of flows outgoing on this link, solver selects the analysis engine and state the AnalysisState, see Network.getEngine """
+        state = self.network.getState(state)
+        delay = state.delayBounds.get((self, link), -1)
+        if delay >= 0:
+            return delay
         else:
             anOutgoingTarget = self.getTargetLeavingThroughLink(link)
             if anOutgoingTarget is None:
                 # No links outgoing through this link, so no delay either
                 return 0
             else:
-                delay = self.computeTargetArrivalAffine(anOutgoingTarget)["delay"]
+                with Utils.ConfigScope(self.network.getConfig()):
+                    delay = self.network.getEngine(solver, state).computeTargetArrivalAffine(self, anOutgoingTarget).delay
 
                 return delay
                
     def getTargetLeavingThroughLink(self, link):
         """ Returns a target leaving through the given link, None if there aren't any """
         # First we must find a target that goes out of the node through the given link to feed to other functions
-        foundTarget = False
-        anOutgoingTarget = None
-        for flow in link.flows.values():
-            for target in flow.targets.values():
-                if target.findOutgoingLink(self) == link:
-                    anOutgoingTarget = target # We just want one such target
-                    foundTarget = True
-                    break
-            if foundTarget:
-                break
-        return anOutgoingTarget
+        direction = "direct" if link.start == self else "inverse"
+        for flow in link.flowsPerDirection[direction].values():
+            target = flow.getTree().linkTargets.get((link, direction))
+            if target is not None:
+                return target # We just want one such target
+        return None
         
     def __str__(self):
         return self.name
@@ -371,11 +405,15 @@ class Node():
         
 class Station(Node):
     """ This class represents a station in the network """
+    __slots__ = ()
+    
     def __init__(self, name, transmission_capacity, x, y, service_policy = "FIRST_IN_FIRST_OUT", tech_latency = 0):
         super().__init__(name, service_policy, transmission_capacity, x, y, tech_latency)
         
 class Switch(Node):
     """ This class represents a switch in the network"""
+    __slots__ = ("switching_technique", "buffer", "redundancy")
+    
     def __init__(self, name, transmission_capacity, x, y, switching_technique = "CUT_THROUGH", service_policy = "FIRST_IN_FIRST_OUT", tech_latency = 0, buffer_size = 65536):
         super().__init__(name, service_policy, transmission_capacity, x, y, tech_latency)
         self.switching_technique = switching_technique
@@ -388,6 +426,8 @@ class Switch(Node):
     
 class Link():
     """ This class represents a link in the network"""
+    __slots__ = ("name", "start", "startPort", "end", "endPort", "transmission_capacity", "flows", "flowsPerDirection", "network")
+    
     def __init__(self, name, start, startPort, end, endPort, transmission_capacity):
         self.name = name
         self.start = start
@@ -396,6 +436,7 @@ class Link():
         self.endPort = endPort
         self.transmission_capacity = transmission_capacity
         self.flows = {}
+        self.flowsPerDirection = {"direct": {}, "inverse": {}}
     
     def setNetwork(self, network):
         self.network = network
@@ -415,48 +456,29 @@ class Link():
         """ Returns an array of targets belonging to flow that pass through the link"""
         targets = []
         for target in flow.targets.values():
-            completePath = [target.source] + target.path
-            if self.start in completePath and self.end in completePath:
+            if self in target.linkDirections:
                 targets.append(target)
         return targets
     
     def getFlowsInSameDirection(self, target):
-        """ Returns a dictionary containing only flows traversing the link in the sense of target"""
+        """ Returns a dictionary containing only flows traversing the link in the sense of target
         
-        sameDirFlows = {}
-        
-        for flow in self.flows.values():
-            otherTargets = self.findFlowTargetsPassingThroughLink(flow)
-            for otherTarget in otherTargets:
-                if self.sameDirection(target, otherTarget):
-                    sameDirFlows[flow.name] = flow
-        return sameDirFlows
+        The dictionary is shared with the link and must not be modified
+        """
+        return self.flowsPerDirection[target.linkDirections[self]]
     
     def sameDirection(self, target, otherTarget):
         """ Returns whether the two targets are flowing in the same direction through link or not"""
-        #print(self)
-        sameDirection = target.isDirectWith(self.start, self.end) == otherTarget.isDirectWith(self.start, self.end)
-        return sameDirection
+        return target.linkDirections[self] == otherTarget.linkDirections[self]
     
     def computeLoad(self, mode):
-        """Computes the total flow across this link. Assumes that flows have been assigned to the link previously. That is done by Target.hasPath()"""
-        result = 0
-        if self.network is None:
-            raise Exception
-        for flow in self.flows.values():
-            for target in flow.targets.values():
-                completePath = [target.source] + target.path # Including source
-                if self.start in completePath and self.end in completePath:
-                    if mode == "direct" and target.isDirectWith(self.start, self.end):
-                        result += flow.maxMessageSize/flow.period
-                    elif mode == "inverse" and not target.isDirectWith(self.start, self.end):
-                        result += flow.maxMessageSize/flow.period
-                    elif mode != "direct" and mode != "inverse":
-                        raise ValueError
-                    else:
-                        continue
-#                         print("ERROR: We should never enter this section. Arguments {0}, {1}".format(target.isDirectWith(self.start, self.end), mode))
-        return result
+        """Computes the total flow across this link in the "direct" or "inverse" direction. Assumes that flows have been assigned to the link previously. That is done by Network.registerFlow()
+        
+        The loads of all links are computed at once, see Network.getLinkStatistics
+        """
+        if mode != "direct" and mode != "inverse":
+            raise ValueError
+        return self.network.getLinkStatistics()[self].loads[mode]
     
     def getPort(self, node):
         """ Returns the port through which the link is connected to node, None if none exists """
@@ -472,8 +494,151 @@ class Link():
     def __str__(self):
         return "Link {0} between {1}, {2} and {3}, {4}".format(self.name, str(self.start), str(self.startPort), str(self.end), str(self.endPort))
         
+class LinkStatistics():
+    """ Statistics of the flows going through a link, see Network.getLinkStatistics """
+    __slots__ = ("loads", "arrivalRate", "largestMessage")
+    
+    def __init__(self, loads, arrivalRate, largestMessage):
+        self.loads = loads # {"direct": load, "inverse": load}
+        self.arrivalRate = arrivalRate # Sum of the slopes of the arrival curves of the flows, in both directions
+        self.largestMessage = largestMessage
+
+# Results of an output port in an AnalysisResult. totalArrival is the (slope, burst) of the aggregate arrival curve,
+# None if no flow leaves through the port, and port is the port number of the node the link is connected to
+PortResult = namedtuple("PortResult", ["delay", "backlog", "totalArrival", "port"])
+
+class AnalysisResult():
+    """ Delays, backlogs, loads and stability of an analysed network, see Network.analyze
+    
+    It is read only: its attributes can't be set and its dictionaries can't be modified. Dictionaries follow
+    the order of the network's dictionaries.
+        - delays: {flow name: {target name: end to end delay}}
+        - ports: {station or switch name: {link name: PortResult}}, for every link of every node
+        - totalBacklogs: {switch name: sum of the backlogs of its ports}
+        - loads and usages: {link name: {"direct": value, "inverse": value}}
+        - stableLinks: {link name: False if the arrivals of its flows exceed its transmission capacity, or if the delay of one of its ports diverged}
+        - stable: True if all links are stable
+    """
+    __slots__ = ("network", "solver", "delays", "ports", "totalBacklogs", "loads", "usages", "stableLinks", "stable")
+    
+    def __init__(self, network, solver, delays, ports, totalBacklogs, loads, usages, stableLinks):
+        values = {"network": network, "solver": solver, "delays": readOnly(delays), "ports": readOnly(ports),
+                  "totalBacklogs": readOnly(totalBacklogs), "loads": readOnly(loads), "usages": readOnly(usages),
+                  "stableLinks": readOnly(stableLinks), "stable": all(stableLinks.values())}
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("An AnalysisResult can't be modified")
+    
+    def __delattr__(self, name):
+        raise AttributeError("An AnalysisResult can't be modified")
+
+def readOnly(dictionary):
+    """ Returns a read only view of the dictionary, and of the dictionaries it contains """
+    return MappingProxyType({key: readOnly(value) if isinstance(value, dict) else value for key, value in dictionary.items()})
+
+class AnalysisState():
+    """ Results of the analyses of a network computed so far: results of the output ports, engines and AnalysisResults
+    
+    The network only holds the topology and the routes, which analyses read, so the same network can be analysed
+    with any number of states, such as one per thread, see Network.createState. Analyses only write to the network
+    the caches built on first use from the routes, Flow.tree and the link members and statistics, which are
+    stored once complete, so threads building them at the same time build the same values. A state
+    is cheap to create, as it starts empty, and fork copies it without copying the network. The network's own
+    state, Network.state, is used when no state is given, and is the one kept up to date when the network is
+    modified, see Network.update. Other states are emptied when they are next used after a modification.
+    
+    Ports are (node, outgoing link) pairs. A port is calculated once its delay bound is stored and not negative.
+    """
+    def __init__(self, network):
+        self.network = network
+        self.revision = network.revision # Revision of the network the results are computed for
+        self.delayBounds = {} # port -> delay bound
+        self.totalArrivals = {} # port -> aggregate arrival curve
+        self.backlogs = {} # port -> backlog
+        self.claims = {} # port -> flow it was computed for, see Engine.MemoizedEngine
+        self.divergedPorts = {} # port -> port whose delay diverged, making it unbounded, see Engine.FixedPointEngine
+        self.engines = {} # solver -> engine, see getEngine
+        self.analysisResults = {} # solver -> AnalysisResult, see Network.analyze
+    
+    def reset(self):
+        """ Discards all the results """
+        self.delayBounds = {}
+        self.totalArrivals = {}
+        self.backlogs = {}
+        self.claims = {}
+        self.divergedPorts = {}
+        self.engines = {}
+        self.analysisResults = {}
+        self.revision = self.network.revision
+    
+    def validate(self):
+        """ Discards the results if the network has been modified since they were computed """
+        if self.revision != self.network.revision:
+            self.reset()
+    
+    def fork(self):
+        """ Returns a copy of the state, whose results are then computed independently of this one's
+        
+        Only the dictionaries are copied, the curves and outputs they hold are never modified once stored
+        """
+        state = AnalysisState(self.network)
+        state.revision = self.revision
+        state.delayBounds = dict(self.delayBounds)
+        state.totalArrivals = dict(self.totalArrivals)
+        state.backlogs = dict(self.backlogs)
+        state.claims = dict(self.claims)
+        state.divergedPorts = dict(self.divergedPorts)
+        state.analysisResults = dict(self.analysisResults)
+        for solver, engine in self.engines.items():
+            state.engines[solver] = engine.fork(state)
+        return state
+    
+    def resetPort(self, node, link):
+        """ Marks the results of the port of node towards link as not calculated """
+        port = (node, link)
+        self.delayBounds.pop(port, None)
+        self.totalArrivals.pop(port, None)
+        self.backlogs.pop(port, None)
+        self.divergedPorts.pop(port, None)
+    
+    def getEngine(self, solver):
+        """ Returns the engine of the given name computing the results of the state, creating it on first use """
+        engine = self.engines.get(solver)
+        if engine is None:
+            import Engine # Imported here as the engines are built on top of this module
+            engine = Engine.createEngine(self, solver)
+            self.engines[solver] = engine
+        return engine
+
+class FlowTree():
+    """ Routing tree of a flow, built from the routes of its targets, see Flow.getTree
+    
+    Each node and each (node, outgoing link) edge of the routes appears once, so questions about the flow at a
+    node or a link are answered without going through its targets. Where routes disagree, the first target in
+    the order of the flow's targets is followed, as when the targets were scanned.
+    """
+    __slots__ = ("upstream", "outgoingLinks", "linkTargets")
+    
+    def __init__(self, flow):
+        self.upstream = {} # node -> (node preceding it, target going through both)
+        self.outgoingLinks = {} # node -> {link the flow leaves node through: first target doing so}
+        self.linkTargets = {} # (link, direction) -> first target going through link in that direction
+        for target in flow.targets.values():
+            for node, index in target.hopIndex.items():
+                if index > 0:
+                    self.upstream.setdefault(node, (target.previousHops[index], target))
+                if target.nextHops[index] is not None:
+                    self.outgoingLinks.setdefault(node, {}).setdefault(target.findOutgoingLink(node), target)
+            for link, direction in target.linkDirections.items():
+                self.linkTargets.setdefault((link, direction), target)
+
 class Flow():
     """ This class represents a data flow in the network"""
+    __slots__ = ("deadline", "jitter", "max_payload", "min_payload", "name", "period", "priority", "source", "targets", "network",
+                 "maxMessageSize", "tree")
+    
     def __init__(self, deadline, jitter, max_payload, name, period, priority, source, min_payload = 0):
         self.deadline = deadline
         self.jitter = jitter
@@ -484,6 +649,7 @@ class Flow():
         self.priority = priority
         self.source = source
         self.targets = {}
+        self.tree = None # See getTree
         if jitter > period:
             print("ERROR: Jitter is larger than period for {0}! Don't you think you can do better mate?".format(self.name))
     
@@ -507,14 +673,24 @@ class Flow():
             
         return AffineCurve(m, n)
     
+    def getTree(self):
+        """ Returns the FlowTree of the flow's routes, built on first use once the paths have been checked """
+        if self.tree is None:
+            self.tree = FlowTree(self)
+        return self.tree
+    
+    def findUpstream(self, node):
+        """ Returns the node preceding node in the flow's routes and a target going through both, raises an exception if node is not reached """
+        # The source is not part of the paths, and has no preceding node
+        upstream = self.getTree().upstream.get(node)
+        if upstream is None:
+            print("ERROR: Tried to find a target of {0} passing through {0} but couldn't find any".format(self, node))
+            raise Exception
+        return upstream
+    
     def findTargetPassingThroughNode(self, node):
         """ Returns the target whose path passes through node, raises an exception if no such path exists """
-        for target in self.targets.values():
-            for otherNode in target.path:
-                if otherNode == node:
-                    return target
-        print("ERROR: Tried to find a target of {0} passing through {0} but couldn't find any".format(self, node))
-        raise Exception
+        return self.findUpstream(node)[1]
     
     def __str__(self):
         return "Flow : " + str(self.name) + " with destinations: " + str([str(s) for s in self.targets])
@@ -532,12 +708,151 @@ class Network():
         self.switches = {}
         self.links = {}
         self.flows = {}
+        self.connectingLinks = {}
+        self.linksPerNode = {}
+        self.linkMembers = None # link -> {direction: flows counted in its load}, see getLinkMembers
+        self.linkStatistics = None # link -> LinkStatistics, see getLinkStatistics
+        self.config = None # AnalysisConfig of the network's analyses, see getConfig
+        self.revision = 0 # Incremented by each modification of the network, see AnalysisState.validate
+        self.state = AnalysisState(self) # State of the analyses given no other, see getState
     
     def initializeNodes(self):
-        for station in self.stations.values():
-            station.initAllDicts()
-        for switch in self.switches.values():
-            switch.initAllDicts()
+        """ Discards the results of every analysis, once the topology and routes are built or have been changed """
+        self.revision += 1
+        self.state.reset()
+        self.invalidateLinkStatistics(True)
+    
+    def getLinkMembers(self):
+        """ Returns for each link the flows counted in its load in each direction, built on first use
+        
+        A flow is counted once for each of its targets whose route contains both ends of the link, in the
+        direction the route goes from one end to the other, in the order the links' flows and the flows'
+        targets are stored. The dictionary is only stored once complete, so that threads analysing the network
+        at the same time never see it partly built.
+        """
+        linkMembers = self.linkMembers
+        if linkMembers is None:
+            linkMembers = {}
+            for link in self.links.values():
+                linkMembers[link] = self.findLinkMembers(link)
+            self.linkMembers = linkMembers
+        return linkMembers
+    
+    def findLinkMembers(self, link):
+        """ Returns the flows counted in the load of link in each direction, see getLinkMembers """
+        members = {"direct": [], "inverse": []}
+        for flow in link.flows.values():
+            for target in flow.targets.values():
+                if link.start in target.hopIndex and link.end in target.hopIndex:
+                    members["direct" if target.isDirectWith(link.start, link.end) else "inverse"].append(flow)
+        return members
+    
+    def getLinkStatistics(self):
+        """ Returns the LinkStatistics of every link, computed for all the links at once on first use
+        
+        The message rate and arrival slope of each flow are computed once, and are summed in the same order
+        as when each link summed them, so the results are the same to the last digit. Stored once complete, see
+        getLinkMembers.
+        """
+        linkStatistics = self.linkStatistics
+        if linkStatistics is None:
+            linkMembers = self.getLinkMembers()
+            rates = {} # flow -> message size/period
+            slopes = {} # flow -> slope of the arrival curve
+            linkStatistics = {}
+            for link in self.links.values():
+                linkStatistics[link] = self.computeLinkStatistics(link, linkMembers[link], rates, slopes)
+            self.linkStatistics = linkStatistics
+        return linkStatistics
+    
+    def computeLinkStatistics(self, link, members, rates, slopes):
+        """ Returns the LinkStatistics of link, members being its getLinkMembers entry, see getLinkStatistics
+        
+        rates and slopes hold the message rates and arrival slopes of the flows already computed, and are
+        completed with the others.
+        """
+        loads = {}
+        for direction, flows in members.items():
+            load = 0
+            for flow in flows:
+                rate = rates.get(flow)
+                if rate is None:
+                    rate = rates[flow] = flow.maxMessageSize/flow.period
+                load += rate
+            loads[direction] = load
+        arrivalRate = 0
+        largestMessage = 0
+        for flow in link.flows.values():
+            slope = slopes.get(flow)
+            if slope is None:
+                slope = slopes[flow] = flow.computeArrivalAffine().m
+            arrivalRate += slope
+            largestMessage = max(largestMessage, flow.maxMessageSize)
+        return LinkStatistics(loads, arrivalRate, largestMessage)
+    
+    def invalidateLinkStatistics(self, routesChanged = False):
+        """ Discards the link statistics after flows have changed, and the flows counted in each load if routesChanged """
+        self.linkStatistics = None
+        if routesChanged:
+            self.linkMembers = None
+    
+    def updateLinkStatistics(self, flow, routesChanged = False):
+        """ Updates the link statistics of the links of flow after it has been modified, and the flows counted in their loads if routesChanged
+        
+        Only these links count the flow, see registerFlow, so the statistics of the others are kept. The flow
+        may have just been added to its links or removed from them.
+        """
+        links = list(dict.fromkeys(link for link, direction in flow.getTree().linkTargets))
+        linkMembers = self.linkMembers
+        if routesChanged and linkMembers is not None:
+            linkMembers = dict(linkMembers)
+            for link in links:
+                linkMembers[link] = self.findLinkMembers(link)
+            self.linkMembers = linkMembers
+        linkStatistics = self.linkStatistics
+        if linkStatistics is not None:
+            linkStatistics = dict(linkStatistics)
+            rates = {}
+            slopes = {}
+            for link in links:
+                linkStatistics[link] = self.computeLinkStatistics(link, linkMembers[link], rates, slopes)
+            self.linkStatistics = linkStatistics
+    
+    def getConfig(self):
+        """ Returns the network's AnalysisConfig, or the one in use when it has none, see Utils.getConfig
+        
+        The computation methods of the network, nodes and targets run with it, so that networks configured
+        differently can be analysed at the same time.
+        """
+        if self.config is not None:
+            return self.config
+        return Utils.getConfig()
+    
+    def configure(self, config):
+        """ Sets the network's AnalysisConfig, None to use the one in use at each analysis, and discards the results of every state """
+        self.config = config
+        self.initializeNodes()
+    
+    def createState(self):
+        """ Returns a new empty AnalysisState of the network, to analyse it without changing the results of the other states """
+        return AnalysisState(self)
+    
+    def getState(self, state = None):
+        """ Returns state, the network's own state if None, once its results are up to date with the network, see AnalysisState.validate """
+        if state is None:
+            state = self.state
+        state.validate()
+        return state
+    
+    def getEngine(self, solver = None, state = None):
+        """ Returns the analysis engine used to compute the network's delays and backlogs, creating it on first use
+        
+        solver is the name of the engine, see Engine.createEngine, the solver of the network's configuration is used if None.
+        Each AnalysisState has its own engines, those of the network's state are used if state is None
+        """
+        if solver is None:
+            solver = self.getConfig().solver
+        return self.getState(state).getEngine(solver)
     
     def getNode(self, nodeName):
         """ Returns the station or switch with name = nodeName, raises a KeyError if none exists """
@@ -553,17 +868,310 @@ class Network():
     
     def getConnectingLink(self, nodeA, nodeB):
         """ Gets the link connecting two given nodes, None if they are not connected """
+        return self.connectingLinks.get((nodeA, nodeB))
+    
+    def buildTopologyIndex(self):
+        """ Indexes the links by the pair of nodes they connect and by the nodes they are connected to
+        
+        Must be called once the links' ends have been resolved to node objects, and again whenever links are
+        added or removed. When several links connect the same pair of nodes, the first one is used.
+        """
+        self.connectingLinks = {}
+        self.linksPerNode = {}
+        for node in self.stations.values():
+            self.linksPerNode[node] = []
+        for node in self.switches.values():
+            self.linksPerNode[node] = []
+        
         for link in self.links.values():
-            if link.connectsSystems(nodeA, nodeB):
-                return link
-        return None
+            # Both orders are stored so that lookups don't care about the direction
+            self.connectingLinks.setdefault((link.start, link.end), link)
+            self.connectingLinks.setdefault((link.end, link.start), link)
+            self.linksPerNode.setdefault(link.start, []).append(link)
+            if link.end != link.start:
+                self.linksPerNode.setdefault(link.end, []).append(link)
+    
+    def resolveFlow(self, flow):
+        """ Assigns the network to the flow and its targets, and replaces node names by nodes in them """
+        flow.setNetwork(self)
+        if isinstance(flow.source, str):
+            flow.source = self.getNode(flow.source)
+        for target in flow.targets.values():
+            target.setNetwork(self)
+            if isinstance(target.target, str):
+                target.target = self.getNode(target.target)
+            if isinstance(target.source, str):
+                target.source = self.getNode(target.source) 
+            for i in range(len(target.path)):
+                if isinstance(target.path[i], str):
+                    target.path[i] = self.getNode(target.path[i])
+            printIfVerbose("Path for target {0} is {1}", target.name, lambda: [str(s) for s in target.path])
+    
+    def validatePaths(self):
+        """ Checks the paths of all targets, returns a dictionary with the error found for each incorrect target
+        
+        The routes of all targets are frozen, and flows are assigned to the links their targets go through, see
+        registerFlow
+        """
+        errors = {}
+        for flow in self.flows.values():
+            for target in flow.targets.values():
+                target.freezeRoute()
+                error = target.findPathError()
+                if error is not None:
+                    errors[target] = error
+            self.registerFlow(flow)
+        return errors
+    
+    def registerFlow(self, flow):
+        """ Assigns the flow to the links its targets go through, in the direction they go through them, see unregisterFlow
+        
+        Paths are followed up to their first missing link, see Target.findPathError
+        """
+        connectingLinks = self.connectingLinks
+        for target in flow.targets.values():
+            for previousNode, node in zip(target.hops, target.nextHops):
+                link = connectingLinks.get((previousNode, node))
+                if link is None:
+                    break
+                link.flows[flow.name] = flow
+                link.flowsPerDirection["direct" if link.start == previousNode else "inverse"][flow.name] = flow
+    
+    def addFlow(self, flow):
+        """ Adds a flow to the analysed network, only the results that depend on it are computed again, see updateFlowLinks
+        
+        The flow's source, targets and paths may be given as node names. Raises a ValueError if a flow with
+        the same name exists or if a path is not correct, in which case the network is left unchanged.
+        """
+        if flow.name in self.flows:
+            print("ERROR: The network already has a flow called {0}!".format(flow.name))
+            raise ValueError
+        self.resolveFlow(flow)
+        
+        errors = {}
+        for target in flow.targets.values():
+            target.freezeRoute()
+            error = target.findPathError()
+            if error is not None:
+                errors[target] = error
+        if errors:
+            for target, error in errors.items():
+                print("ERROR: " + str(target) + " path was not built correctly, " + error + "!")
+            raise ValueError
+        
+        self.registerFlow(flow)
+        self.flows[flow.name] = flow
+        self.updateLinkStatistics(flow, True)
+        self.updateFlowLinks(flow, True)
+    
+    def removeFlow(self, name):
+        """ Removes the flow called name from the network and returns it, only the results that depended on it are computed again """
+        flow = self.getFlow(name)
+        self.unregisterFlow(flow)
+        del self.flows[name]
+        self.updateLinkStatistics(flow, True)
+        self.updateFlowLinks(flow, True)
+        return flow
+    
+    def modifyFlow(self, name, deadline = None, jitter = None, max_payload = None, period = None, priority = None):
+        """ Changes the given parameters of the flow called name, only the results that depend on it are computed again
+        
+        Parameters are given in the units of Flow's constructor, those left to None are not changed. Changing
+        the priority changes which flows interfere at its ports, see updateFlowLinks.
+        """
+        flow = self.getFlow(name)
+        structural = priority is not None and priority != flow.priority
+        if deadline is not None:
+            flow.deadline = deadline
+        if jitter is not None:
+            flow.jitter = jitter
+        if max_payload is not None:
+            flow.max_payload = max_payload
+        if period is not None:
+            flow.period = period
+        if priority is not None:
+            flow.priority = priority
+        flow.setNetwork(self) # Updates the message size
+        self.updateLinkStatistics(flow)
+        if flow.jitter > flow.period:
+            print("ERROR: Jitter is larger than period for {0}! Don't you think you can do better mate?".format(flow.name))
+        self.updateFlowLinks(flow, structural)
+    
+    def setLinkCapacity(self, name, transmission_capacity):
+        """ Changes the transmission capacity of the link called name
+        
+        Only the loads depend on it, and they are computed on request, so nothing has to be computed again
+        """
+        if name not in self.links:
+            print("ERROR: " + name + " is not a valid link!")
+            raise KeyError
+        self.links[name].transmission_capacity = transmission_capacity
+        self.update([]) # Usages and stability
+    
+    def setNodeCapacity(self, name, transmission_capacity):
+        """ Changes the transmission capacity of the station or switch called name, only the results that depend on it are computed again """
+        node = self.getNode(name)
+        node.transmission_capacity = transmission_capacity
+        self.update([(node, link) for link in node.getLinks()])
+    
+    def getFlow(self, name):
+        """ Returns the flow called name, raises a KeyError if none exists """
+        if name not in self.flows:
+            print("ERROR: " + name + " is not a valid flow!")
+            raise KeyError
+        return self.flows[name]
+    
+    def updateFlowLinks(self, flow, structural = False):
+        """ Updates the results after the flow has been modified, see update
+        
+        The ports of both ends of the links the flow goes through are computed again: the flow is part of the
+        aggregate arrival of the ports it leaves through, and of the service of the ports of the links where
+        it has a higher priority. Switches that store and forward also depend on its message size. structural
+        tells that the flow has been added, removed or given another priority, which changes the flows
+        interfering at these ports.
+        """
+        links = list(dict.fromkeys(link for link, direction in flow.getTree().linkTargets))
+        ports = [(link.start, link) for link in links] + [(link.end, link) for link in links]
+        self.update(ports, links, [flow] if structural else ())
+    
+    def update(self, ports, links = (), flows = ()):
+        """ Updates the results after a change of the network that affects the given (node, link) output ports
+        
+        Only the given ports and the ports depending on them are computed again, while the results of the rest
+        of the network are kept, see the update method of the engines. links are the links whose flows have
+        changed, and flows the flows added, removed or given another priority.
+        
+        A port computed again is computed for the same flow as before, which gives the results of a network
+        built with the changes from the start as long as an analysis from the start would compute it for that
+        flow. When flows are given, the ports an analysis from the start would compute for another flow are
+        computed again for it, see Engine.findClaims. Every result is discarded instead, and computed again on
+        request, when a port is not calculated, as such a port is computed again for each flow requesting it,
+        and when flows are given to the recursive solver, which does not record the flow of each port. Only the
+        engine of the solver of the network's configuration is kept. The results of the network's state are
+        updated, other states are emptied when next used, see AnalysisState.validate.
+        """
+        config = self.getConfig()
+        state = self.state
+        upToDate = state.revision == self.revision
+        self.revision += 1
+        if not upToDate or self.hasUncalculatedPorts() or (flows and config.solver == "recursive"):
+            state.reset()
+            return
+        engine = state.getEngine(config.solver)
+        state.engines = {config.solver: engine} # The results kept by the others would be out of date
+        state.analysisResults = {}
+        state.revision = self.revision
+        if flows:
+            import Engine # Imported here as the engines are built on top of this module
+            claims = Engine.findClaims(self)
+            if claims is None:
+                state.reset() # The analysis reports the cycle on request, or the fixedpoint solver solves it
+                return
+            ports = list(ports) + [port for port, claim in state.claims.items() if claims.get(port) is not claim]
+            state.claims = claims
+        with Utils.ConfigScope(config):
+            engine.update(ports, links)
+        for flow in flows:
+            if self.flows.get(flow.name) is not flow:
+                engine.discardFlow(flow)
+        if self.hasUncalculatedPorts():
+            state.reset()
+    
+    def hasUncalculatedPorts(self):
+        """ Returns whether a port of the network's state has a negative delay, see Engine.claimPort """
+        return any(delay < 0 for delay in self.state.delayBounds.values())
+    
+    def analyze(self, solver = None, state = None):
+        """ Computes every result of the network once and returns them as an AnalysisResult
+        
+        The results are computed in the order produceXML used to request them: the end to end delays of the
+        targets, then the ports of the switches and of the stations, then the loads and stability of the links.
+        The result is kept until the network is modified, so printing and writing it compute nothing again.
+        solver selects the analysis engine, the one of the network's configuration if None, see getConfig. The
+        results are computed and kept in state, the network's AnalysisState if None, so that analyses given
+        different states don't interfere.
+        """
+        config = self.getConfig()
+        if solver is None:
+            solver = config.solver
+        state = self.getState(state)
+        result = state.analysisResults.get(solver)
+        if result is not None:
+            return result
+        
+        with Utils.ConfigScope(config):
+            with Instrumentation.Timer("analysis.delays"):
+                delays = self.analyzeDelays(solver, state)
+            
+            with Instrumentation.Timer("analysis.ports"):
+                ports = {}
+                for node in list(self.switches.values()) + list(self.stations.values()):
+                    ports[node.name] = {link.name: self.analyzePort(node, link, solver, state) for link in node.getLinks()}
+            
+            return self.completeAnalysis(solver, delays, ports, state)
+    
+    def analyzeDelays(self, solver, state = None):
+        """ Returns the end to end delays of the targets of every flow, {flow name: {target name: delay}} """
+        delays = {}
+        for flow in self.flows.values():
+            delays[flow.name] = {target.name: target.computeEndToEndDelay(solver, state) for target in flow.targets.values()}
+        return delays
+    
+    def analyzePort(self, node, link, solver, state = None):
+        """ Returns the PortResult of the output port of node towards link """
+        state = self.getState(state)
+        delay = node.getDelay(link, solver, state)
+        backlog = node.getBacklog(link, solver, state)
+        totalArrival = None
+        if state.delayBounds.get((node, link), -1) >= 0:
+            totalArrival = (state.totalArrivals[(node, link)].m, state.totalArrivals[(node, link)].n)
+        return PortResult(delay, backlog, totalArrival, link.getPort(node))
+    
+    def completeAnalysis(self, solver, delays, ports, state = None):
+        """ Adds the total backlogs of the switches and the results of the links to the delays and ports computed by solver
+        
+        delays and ports are given as in AnalysisResult, in the order of analyze. The AnalysisResult is stored
+        in state, the network's state if None, as the one of solver and returned.
+        """
+        totalBacklogs = {}
+        for switch in self.switches.values():
+            # Summed as getTotalBacklog does
+            totalBacklog = 0
+            for portResult in ports[switch.name].values():
+                totalBacklog += portResult.backlog
+            totalBacklogs[switch.name] = totalBacklog
+        
+        with Instrumentation.Timer("analysis.loads"):
+            # Links whose delays diverged are unstable, even when their load is below their capacity
+            divergedLinks = set(link for node, link in self.getState(state).divergedPorts)
+            statistics = self.getLinkStatistics()
+            loads = {}
+            usages = {}
+            stableLinks = {}
+            for link in self.links.values():
+                linkStatistics = statistics[link]
+                loads[link.name] = dict(linkStatistics.loads)
+                usages[link.name] = {direction: load/link.transmission_capacity for direction, load in linkStatistics.loads.items()}
+                stableLinks[link.name] = not linkStatistics.arrivalRate > link.transmission_capacity and link not in divergedLinks
+        
+        result = AnalysisResult(self, solver, delays, ports, totalBacklogs, loads, usages, stableLinks)
+        self.getState(state).analysisResults[solver] = result
+        return result
+    
+    def unregisterFlow(self, flow):
+        """ Removes the flow from the links its targets go through """
+        for link, direction in flow.getTree().linkTargets:
+            link.flows.pop(flow.name, None)
+            for flows in link.flowsPerDirection.values():
+                flows.pop(flow.name, None)
     
     def computeLoads(self):
         """ Computes the load of each link in the target net """
         loads = {}
-        for link in self.links.values():
-            loads[str(link)] = str(createQuantity(link.computeLoad("direct"))) + "b/s, direct. " + str(createQuantity(link.computeLoad("inverse"))) + "b/s, inverse."
-            printIfVerbose(str(link) + " carries " + loads[str(link)] + " over the flows: " + str([str(s) for s in link.flows]))
+        with Utils.ConfigScope(self.getConfig()):
+            for link in self.links.values():
+                loads[str(link)] = str(createQuantity(link.computeLoad("direct"))) + "b/s, direct. " + str(createQuantity(link.computeLoad("inverse"))) + "b/s, inverse."
+                printIfVerbose("{0} carries {1} over the flows: {2}", link, loads[str(link)], lambda: [str(s) for s in link.flows])
         return loads
     
     def isStable(self):
@@ -574,24 +1182,23 @@ class Network():
         or station
         """
         def stabilityPrint(thing, arrival):
-            printIfVerbose("{0} has a transmission capacity {1}b/s and an arrival curve {2}b/s".format(thing, createQuantity(thing.transmission_capacity), createQuantity(arrival)))
+            printIfVerbose("{0} has a transmission capacity {1}b/s and an arrival curve {2}b/s", thing, lambda: createQuantity(thing.transmission_capacity), lambda: createQuantity(arrival))
         
         stable = True
-        arrival = 0
         
         # Verify that all links are capable of processing arrivals. We take advantage
-        # of the fact that flows are assigned to the links they traverse by Link.hasPath()
+        # of the fact that flows are assigned to the links they traverse by Network.registerFlow()
         # upon network creation
-        for link in self.links.values():
-            for flow in link.flows.values():
-                arrival += flow.computeArrivalAffine().m
-            
-            stabilityPrint(link, arrival) 
-            # If the arrival curve exceeds the transmission capacity, the network is unstable
-            if arrival > link.transmission_capacity:
-                stable = False
-                print("{0} is not stable!".format(link)) 
-            arrival = 0 # Reset arrival accumulator for the next station
+        statistics = self.getLinkStatistics()
+        with Utils.ConfigScope(self.getConfig()):
+            for link in self.links.values():
+                arrival = statistics[link].arrivalRate
+                
+                stabilityPrint(link, arrival) 
+                # If the arrival curve exceeds the transmission capacity, the network is unstable
+                if arrival > link.transmission_capacity:
+                    stable = False
+                    print("{0} is not stable!".format(link)) 
         
         
         return stable
@@ -0,0 +1,828 @@
+import heapq
+import itertools
+import math
+from Classes import AffineCurve, FlowOutput, Switch
+from Utils import computeTheorem1Delay, computeTheorem1Backlog, createQuantity, printIfVerbose
+import Utils
+import Instrumentation
+
+class RecursiveEngine():
+    """ Computes arrival curves through the recursion of Node.computeTargetArrivalAffine, kept as a reference """
+    def __init__(self, state):
+        self.state = state
+        self.network = state.network
+
+    def computeTargetArrivalAffine(self, node, target):
+        return node.computeTargetArrivalAffine(target, self.state)
+    
+    def update(self, ports, links):
+        """ Discards the results of the given ports and of all the ports depending on them, they are computed again on request """
+        for node, link in findDownstreamCone(self.state, ports):
+            self.state.resetPort(node, link)
+    
+    def fork(self, state):
+        """ Returns the engine of state, a fork of this engine's state, see AnalysisState.fork """
+        return RecursiveEngine(state)
+
+class MemoizedEngine():
+    """ Computes arrival curves, delays and backlogs like Node.computeTargetArrivalAffine, but only once
+
+    The output of a flow at an output port, i.e. a (node, outgoing link) pair, is the same for all the targets
+    of the flow going through that port, so it is computed on first request and stored. The worst case service
+    of a port only depends on the priority of the flow asking for it, so it is also computed once per priority.
+    The delays, backlogs and aggregate arrivals of the ports are stored in the AnalysisState of the engine, in the
+    same order and with the same values as the recursion would, so both can be used with the same state.
+
+    The flow each port is computed for is recorded, and a port computed again after the network has been
+    modified is computed for the same flow, see update.
+    """
+    def __init__(self, state):
+        self.state = state
+        self.network = state.network
+        self.outputs = {} # (node, link, flow) -> computeTargetArrivalAffine result
+        self.services = {} # (node, link) -> {priority: service curve before the store and forward correction}
+        self.largestMessages = {} # link -> (largest message, its flow, second largest message)
+        self.upstreamKeys = {} # (node, flow) -> key of the flow's output at the node preceding node
+        self.pendingPorts = set() # Ports being computed, used to detect cyclic dependencies
+        self.portRanks = {} # Ports in the order they were first computed, see update
+        self.nextRank = 0
+
+    def computeTargetArrivalAffine(self, node, target):
+        """ Computes target's output arrival affine curve, total delay up to this point, backlog, and total arrival curves incoming to this outgoing port of the node
+
+        See Node.computeTargetArrivalAffine
+        """
+        link = target.findOutgoingLink(node)
+        key = (node, link, target.parentFlow)
+        result = self.outputs.get(key)
+        if result is not None:
+            if Utils.getConfig().instrument:
+                Instrumentation.count("cache.hits")
+            return result
+        if Utils.getConfig().instrument:
+            Instrumentation.count("cache.misses")
+
+        # Going through a port while computing it means that it depends on itself
+        port = (node, link)
+        if port in self.pendingPorts:
+            reportCycle(node, link)
+        self.pendingPorts.add(port)
+        try:
+            result = self.computeOutput(node, link, target)
+        finally:
+            self.pendingPorts.discard(port)
+        self.outputs[key] = result
+        return result
+
+    def computeOutput(self, node, link, target):
+        """ Applies theorems 1 and 2 at the port of node towards link, for the flow of target """
+        flow = target.parentFlow
+        state = self.state
+        port = (node, link)
+        portCalculated = state.delayBounds.get(port, -1) >= 0
+        verbose = Utils.getConfig().verbose
+        if verbose:
+            printIfVerbose("Calculating affine output arrival of {0} for flux {1}\n", node, target)
+        totalArrival = AffineCurve(0, 0)
+        totalDelay = 0 # Stores the flow's delay bound up until this node
+
+        if node == target.source:
+            arrival = flow.computeArrivalAffine()
+            if not portCalculated:
+                for otherFlow in link.getFlowsInSameDirection(target).values():
+                    if otherFlow == flow:
+                        totalArrival += arrival
+                    else:
+                        totalArrival += otherFlow.computeArrivalAffine()
+        else:
+            # Once the port is calculated only the flow's own input arrival is needed
+            upstreamFlows = (flow,) if portCalculated else link.getFlowsInSameDirection(target).values()
+            for otherFlow in upstreamFlows:
+                output = self.computeUpstreamOutput(node, otherFlow)
+                if otherFlow == flow:
+                    totalDelay = output.delay # The delay up to this point
+                    arrival = output.outputArrival
+                totalArrival += output.outputArrival
+
+        # The service must be requested even when the port is calculated, as the recursion would
+        service = self.getWorstCaseService(node, link, flow)
+
+        if not portCalculated:
+            if Utils.getConfig().instrument:
+                Instrumentation.count("ports.evaluated")
+            # A port computed again is computed for the flow it was first computed for
+            claim = state.claims.get(port, flow)
+            if claim != flow:
+                service = self.getWorstCaseService(node, link, claim)
+            backlog = computeTheorem1Backlog(totalArrival, service)
+            delay = computeTheorem1Delay(totalArrival, service)
+            claimPort(state, port, claim, delay)
+            state.delayBounds[port] = delay
+            state.totalArrivals[port] = totalArrival
+            state.backlogs[port] = backlog
+            if port not in self.portRanks:
+                self.portRanks[port] = self.nextRank
+                self.nextRank += 1
+        else:
+            delay = state.delayBounds[port]
+            totalArrival = state.totalArrivals[port]
+            backlog = state.backlogs[port]
+        totalDelay += delay
+        outputArrival = arrival.delayBy(delay)
+
+        # The trace of Node.computeTargetArrivalAffine
+        if verbose:
+            printIfVerbose("Looking at node {0}", node.name)
+            printIfVerbose("The input arrival curve to {0} for {1} is {2}", node, flow, arrival)
+            printIfVerbose("The adjusted service curve of {0} is {1}", link, service)
+            printIfVerbose("The aggregate arrival curve to {0} for {1} is {2}", node, link, totalArrival)
+            printIfVerbose("Backlog for {0} is {1}", node, backlog)
+            printIfVerbose("Delay at node {0} is {1}s", node.name, lambda: createQuantity(delay))
+            printIfVerbose("The output arrival curve of {0} for {1} is {2} \n", node, flow, outputArrival)
+
+        return FlowOutput(outputArrival, totalDelay, totalArrival, backlog)
+
+    def computeUpstreamOutput(self, node, flow):
+        """ Returns the result computed at the node preceding node in flow's path """
+        key = self.upstreamKeys.get((node, flow))
+        if key is not None:
+            result = self.outputs.get(key)
+            if result is not None:
+                if Utils.getConfig().instrument:
+                    Instrumentation.count("cache.hits")
+                return result
+        previousNode, currentTarget = findUpstream(node, flow)
+        result = self.computeTargetArrivalAffine(previousNode, currentTarget)
+        self.upstreamKeys[(node, flow)] = (previousNode, currentTarget.findOutgoingLink(previousNode), flow)
+        return result
+
+    def getWorstCaseService(self, node, link, flow):
+        """ Returns the service of the port of node towards link in the worst-case multiplexing scenario for flow
+
+        See Node.getWorstCaseService. Unlike it, higher priority flows that are emitted by node are accounted
+        for with the arrival curve at their source
+        """
+        portServices = self.services.setdefault((node, link), {})
+        hpService = portServices.get(flow.priority)
+        if hpService is None:
+            hpService = node.computeServiceAffine() # Get the unaltered service curve
+            for otherFlow in link.flows.values():
+                if otherFlow.priority > flow.priority:
+                    if node == otherFlow.source:
+                        otherArrival = otherFlow.computeArrivalAffine()
+                    else:
+                        otherArrival = self.computeUpstreamOutput(node, otherFlow).outputArrival
+                    hpService.m -= otherArrival.m
+                    hpService.n -= otherArrival.n
+            portServices[flow.priority] = hpService
+
+        service = AffineCurve(hpService.m, hpService.n)
+
+        # Switches that store and forward wait for the largest message of the other flows
+        maximumMsgSize = 0
+        if isinstance(node, Switch) and node.switching_technique == "STORE_AND_FORWARD":
+            largest, largestFlow, secondLargest = self.getLargestMessages(link)
+            maximumMsgSize = secondLargest if largestFlow == flow else largest
+        service.n -= maximumMsgSize/node.transmission_capacity*service.m
+
+        return service
+
+    def getLargestMessages(self, link):
+        """ Returns the largest message size on link, the flow sending it and the second largest message size """
+        largestMessages = self.largestMessages.get(link)
+        if largestMessages is None:
+            largest, largestFlow, secondLargest = 0, None, 0
+            for flow in link.flows.values():
+                if flow.maxMessageSize > largest:
+                    largest, largestFlow, secondLargest = flow.maxMessageSize, flow, largest
+                elif flow.maxMessageSize > secondLargest:
+                    secondLargest = flow.maxMessageSize
+            largestMessages = (largest, largestFlow, secondLargest)
+            self.largestMessages[link] = largestMessages
+        return largestMessages
+
+    def getOutputs(self):
+        """ Returns the (node, link, flow) -> output dictionary of every output computed so far """
+        return self.outputs
+
+    def loadOutputs(self, outputs, portRanks, nextRank):
+        """ Takes the outputs and port ranks of a previous analysis of the network, e.g. read from a snapshot
+        
+        The results of the ports must be in the engine's state already
+        """
+        self.outputs.update(outputs)
+        self.portRanks.update(portRanks)
+        self.nextRank = max(self.nextRank, nextRank)
+
+    def fork(self, state):
+        """ Returns the engine of state, a fork of this engine's state, holding a copy of the outputs computed so far, see AnalysisState.fork """
+        engine = type(self)(state)
+        engine.loadOutputs(self.getOutputs(), self.portRanks, self.nextRank)
+        engine.services = {port: dict(portServices) for port, portServices in self.services.items()}
+        engine.largestMessages = dict(self.largestMessages)
+        engine.upstreamKeys = dict(self.upstreamKeys)
+        return engine
+
+    def update(self, ports, links):
+        """ Computes again the given ports after the network has been modified, and the ports depending on them
+        
+        links are the links whose flows have changed. Each port is computed again for the flow it is claimed by
+        in the state, see Network.update, and the outputs of the flows leaving through it are compared with the
+        previous ones: the ports depending on an output are only computed again if it has changed. Ports are
+        processed in the order they were first computed, so that a port is usually computed again once all the
+        ports it depends on are up to date. Ports not calculated yet are left to be computed on request, as are
+        the outputs of the flows added to a port.
+        """
+        with Instrumentation.Timer("engine.update"):
+            self.refreshPorts(ports, links)
+    
+    def refreshPorts(self, ports, links):
+        """ See update """
+        for link in links:
+            self.largestMessages.pop(link, None)
+        
+        queue = []
+        queued = {} # port -> rank it is queued with
+        sequence = itertools.count() # Ports of the same rank are processed in the order they are queued
+        def push(port, rank):
+            if self.state.delayBounds.get(port, -1) >= 0 and queued.get(port, rank + 1) > rank:
+                queued[port] = rank
+                heapq.heappush(queue, (rank, next(sequence), port))
+        for port in ports:
+            push(port, self.portRanks.get(port, 0))
+        
+        updates = {}
+        portCount = sum(len(node.getLinks()) for node in self.network.stations.values()) + sum(len(node.getLinks()) for node in self.network.switches.values())
+        while queue:
+            rank, order, port = heapq.heappop(queue)
+            if queued.get(port) != rank:
+                continue
+            del queued[port]
+            node, link = port
+            # A port that keeps changing depends on itself
+            updates[port] = updates.get(port, 0) + 1
+            if updates[port] > portCount:
+                reportCycle(node, link)
+            
+            self.pendingPorts.add(port)
+            try:
+                changedFlows = self.refreshPort(node, link)
+            finally:
+                self.pendingPorts.discard(port)
+            for flow in changedFlows:
+                for consumer in findConsumers(self.state, node, link, flow):
+                    # Ranks are kept consistent with the dependencies found
+                    self.portRanks[consumer] = max(self.portRanks.get(consumer, 0), self.portRanks.get(port, 0) + 1)
+                    push(consumer, self.portRanks[consumer])
+    
+    def refreshPort(self, node, link):
+        """ Computes again a calculated port and the stored outputs leaving through it, returns the flows whose output changed
+        
+        Same computations as computeOutput, for the flow the port was computed for
+        """
+        if Utils.getConfig().instrument:
+            Instrumentation.count("ports.refreshed")
+        direction = "direct" if link.start == node else "inverse"
+        flows = link.flowsPerDirection[direction]
+        previousOutputs = {}
+        for flow in flows.values():
+            output = self.outputs.get((node, link, flow))
+            if output is not None:
+                previousOutputs[flow] = output
+        self.services.pop((node, link), None)
+        state = self.state
+        port = (node, link)
+        if not previousOutputs:
+            # Nothing to compare its results with, the ports depending on it are computed again on request too
+            self.resetPorts([port])
+            return []
+        claim = state.claims.get(port, next(iter(previousOutputs)))
+        
+        totalArrival = AffineCurve(0, 0)
+        upstreamOutputs = {}
+        for flow in flows.values():
+            if node == claim.source:
+                totalArrival += flow.computeArrivalAffine()
+            else:
+                upstreamOutputs[flow] = self.computeUpstreamOutput(node, flow)
+                totalArrival += upstreamOutputs[flow].outputArrival
+        service = self.getWorstCaseService(node, link, claim)
+        backlog = computeTheorem1Backlog(totalArrival, service)
+        delay = computeTheorem1Delay(totalArrival, service)
+        claimPort(state, port, claim, delay)
+        state.delayBounds[port] = delay
+        state.totalArrivals[port] = totalArrival
+        state.backlogs[port] = backlog
+        
+        changedFlows = []
+        for flow, previousOutput in previousOutputs.items():
+            totalDelay = 0
+            if node == flow.source:
+                arrival = flow.computeArrivalAffine()
+            else:
+                upstreamOutput = upstreamOutputs.get(flow) or self.computeUpstreamOutput(node, flow)
+                totalDelay = upstreamOutput.delay
+                arrival = upstreamOutput.outputArrival
+            totalDelay += delay
+            output = FlowOutput(arrival.delayBy(delay), totalDelay, totalArrival, backlog)
+            self.outputs[(node, link, flow)] = output
+            if (output.delay != previousOutput.delay or output.outputArrival.m != previousOutput.outputArrival.m
+                    or output.outputArrival.n != previousOutput.outputArrival.n):
+                changedFlows.append(flow)
+        return changedFlows
+    
+    def resetPorts(self, ports):
+        """ Discards the results of the given ports and of the ports depending on them, with the outputs leaving through them """
+        for node, link in findDownstreamCone(self.state, ports):
+            direction = "direct" if link.start == node else "inverse"
+            for flow in link.flowsPerDirection[direction].values():
+                self.outputs.pop((node, link, flow), None)
+            self.services.pop((node, link), None)
+            self.state.resetPort(node, link)
+
+    def discardFlow(self, flow):
+        """ Discards the outputs of a flow removed from the network, after update, so that they are computed again if it is added back """
+        for link, direction in flow.getTree().linkTargets:
+            for node in (link.start, link.end):
+                self.outputs.pop((node, link, flow), None)
+                self.upstreamKeys.pop((node, flow), None)
+
+class TopologicalEngine(MemoizedEngine):
+    """ Computes the whole network without recursion, processing the output ports in topological order
+
+    The dependencies between the outputs of the flows at the ports are followed with an explicit stack, in
+    the order the recursion would follow them for the targets in the order produceXML analyses them. Each
+    output is then computed once all the outputs it depends on are known, which gives the same delays as the
+    memoized engine, however long the chains of interfering flows are.
+    """
+    def __init__(self, state):
+        super().__init__(state)
+        self.solving = False
+
+    def computeTargetArrivalAffine(self, node, target):
+        """ Computes target's output arrival affine curve, total delay up to this point, backlog, and total arrival curves incoming to this outgoing port of the node
+
+        See Node.computeTargetArrivalAffine. The whole network is solved on the first request
+        """
+        key = (node, target.findOutgoingLink(node), target.parentFlow)
+        result = self.outputs.get(key)
+        if result is None:
+            if self.solving:
+                print("ERROR: The output of {0} at {1} was needed before it was computed!".format(target.parentFlow, key[1]))
+                raise ValueError
+            if self.pendingPorts:
+                # Requested while ports are computed again, see update, these ports can't be planned
+                return MemoizedEngine.computeTargetArrivalAffine(self, node, target)
+            with Instrumentation.Timer("engine.solve"):
+                self.solve(self.getAnalysisOrder() + [(node, target)])
+            result = self.outputs[key]
+        elif Utils.getConfig().instrument:
+            Instrumentation.count("cache.hits")
+        return result
+
+    def getAnalysisOrder(self):
+        """ Returns the (node, target) pairs giving the end to end delay of each target, in produceXML order """
+        roots = []
+        for flow in self.network.flows.values():
+            for target in flow.targets.values():
+                roots.append((target.findPreviousNode(target.path[-1]), target))
+        return roots
+
+    def solve(self, roots):
+        """ Computes the outputs needed by the given (node, target) pairs and everything they depend on """
+        with Instrumentation.Timer("engine.plan"):
+            order = self.planOrder(roots)
+        self.solving = True
+        try:
+            for node, target in order:
+                MemoizedEngine.computeTargetArrivalAffine(self, node, target)
+        finally:
+            self.solving = False
+
+    def planOrder(self, roots, closedCycles = None):
+        """ Returns the (node, target) pairs whose output has to be computed, each one after those it depends on
+
+        The dependency graph is walked depth first with an explicit stack, and every output is added once all
+        of its dependencies have been added. Raises a ValueError if a port depends on itself, unless closedCycles
+        is a list: the (node, target) dependencies closing a cycle are then appended to it and left out, see
+        FixedPointEngine.
+        """
+        order = []
+        visited = set(self.outputs)
+        planned = set(self.outputs) # Visited outputs that are not in the stack anymore
+        calculatedPorts = set() # Ports that will be calculated by an output planned before
+        plannedServices = set((node, link, priority) for (node, link), portServices in self.services.items() for priority in portServices)
+
+        for rootNode, rootTarget in roots:
+            rootLink = rootTarget.findOutgoingLink(rootNode)
+            rootKey = (rootNode, rootLink, rootTarget.parentFlow)
+            if rootKey in visited:
+                continue
+            visited.add(rootKey)
+            stack = [(rootNode, rootTarget, self.iterateDependencies(rootNode, rootLink, rootTarget, calculatedPorts, plannedServices))]
+            portsInStack = {(rootNode, rootLink)}
+
+            while stack:
+                node, target, dependencies = stack[-1]
+                for upstreamNode, upstreamTarget in dependencies:
+                    upstreamLink = upstreamTarget.findOutgoingLink(upstreamNode)
+                    upstreamKey = (upstreamNode, upstreamLink, upstreamTarget.parentFlow)
+                    if upstreamKey in visited:
+                        if upstreamKey not in planned:
+                            if closedCycles is None:
+                                reportCycle(upstreamNode, upstreamLink)
+                            closedCycles.append((upstreamNode, upstreamTarget))
+                        continue
+                    if (upstreamNode, upstreamLink) in portsInStack:
+                        if closedCycles is None:
+                            reportCycle(upstreamNode, upstreamLink)
+                        closedCycles.append((upstreamNode, upstreamTarget))
+                        continue
+                    visited.add(upstreamKey)
+                    portsInStack.add((upstreamNode, upstreamLink))
+                    stack.append((upstreamNode, upstreamTarget, self.iterateDependencies(upstreamNode, upstreamLink, upstreamTarget, calculatedPorts, plannedServices)))
+                    break
+                else:
+                    # All dependencies are planned, this output can be computed
+                    stack.pop()
+                    link = target.findOutgoingLink(node)
+                    portsInStack.discard((node, link))
+                    planned.add((node, link, target.parentFlow))
+                    order.append((node, target))
+        return order
+
+    def iterateDependencies(self, node, link, target, calculatedPorts, plannedServices):
+        """ Yields the (node, target) pairs whose output is needed to compute target's output at node towards link
+
+        Mirrors computeOutput and getWorstCaseService. It is a generator so that the state of the port is checked
+        when the output is reached by the walk, as the recursion would.
+        """
+        flow = target.parentFlow
+        portCalculated = self.state.delayBounds.get((node, link), -1) >= 0 or (node, link) in calculatedPorts
+        calculatedPorts.add((node, link))
+
+        if node != target.source:
+            upstreamFlows = (flow,) if portCalculated else link.getFlowsInSameDirection(target).values()
+            for otherFlow in upstreamFlows:
+                yield findUpstream(node, otherFlow)
+
+        priorities = [flow.priority]
+        claim = self.state.claims.get((node, link))
+        if not portCalculated and claim is not None:
+            priorities.append(claim.priority) # Recomputed for the flow it was first computed for
+        for priority in priorities:
+            serviceKey = (node, link, priority)
+            if serviceKey not in plannedServices:
+                plannedServices.add(serviceKey)
+                for otherFlow in link.flows.values():
+                    if otherFlow.priority > priority and node != otherFlow.source:
+                        yield findUpstream(node, otherFlow)
+
+class FixedPointEngine(TopologicalEngine):
+    """ Computes networks whose ports depend on each other in cycles, as ring and meshed topologies give, by iterating to a fixed point
+
+    The outputs are planned as the topological engine does, leaving out the dependencies closing a cycle, and
+    each port is computed once for all the flows leaving through it, in the order its first output was planned
+    and for the flow of that output. An output that is not computed yet, i.e. one closing a cycle, starts as
+    the arrival curve of the flow at its source, with no delay. The ports depending on an output that changed,
+    see findConsumers, are then computed again, until no delay or burst changes by more than the
+    fixedPointTolerance of the configuration, relatively. Outputs planned without leaving out any dependency
+    are computed as the topological engine does, so networks without cycles get the results of the memoized
+    engine, including for the ports whose delay is negative, which are computed again for each flow.
+
+    Starting from the smallest bursts, the delays and bursts of a cycle can only grow. A port computed more than
+    fixedPointIterations times, or whose bursts grow until they are no longer finite, diverges: it is given an infinite delay and backlog, as an unstable port, and so
+    are the ports depending on it. They are recorded in the divergedPorts of the state, which makes their links
+    unstable in the AnalysisResult, see Network.completeAnalysis.
+    """
+    def __init__(self, state):
+        super().__init__(state)
+        self.divergedInput = None # Diverged port an output requested by the port being computed comes from
+        self.cyclic = None # Whether a dependency closing a cycle has been planned, None until solved, see update
+
+    def computeTargetArrivalAffine(self, node, target):
+        """ Computes target's output arrival affine curve, total delay up to this point, backlog, and total arrival curves incoming to this outgoing port of the node
+
+        See Node.computeTargetArrivalAffine. The whole network is solved on the first request
+        """
+        key = (node, target.findOutgoingLink(node), target.parentFlow)
+        result = self.outputs.get(key)
+        if result is None:
+            with Instrumentation.Timer("engine.solve"):
+                self.solve(self.getAnalysisOrder() + [(node, target)])
+            result = self.outputs[key]
+        elif Utils.getConfig().instrument:
+            Instrumentation.count("cache.hits")
+        return result
+
+    def solve(self, roots):
+        """ Computes the ports of the outputs needed by the given (node, target) pairs, and of every flow of the network not computed yet """
+        closedCycles = []
+        with Instrumentation.Timer("engine.plan"):
+            order = self.planOrder(roots, closedCycles)
+        self.cyclic = self.cyclic or bool(closedCycles)
+        if not closedCycles:
+            for node, target in order:
+                MemoizedEngine.computeTargetArrivalAffine(self, node, target)
+            return
+        ports = {}
+        for node, target in order:
+            port = (node, target.findOutgoingLink(node))
+            if port not in ports:
+                ports[port] = True
+                self.state.claims.setdefault(port, target.parentFlow)
+        # Ports only reached through dependencies closing a cycle
+        for flow in self.network.flows.values():
+            for node, links in flow.getTree().outgoingLinks.items():
+                for link in links:
+                    if (node, link, flow) not in self.outputs:
+                        ports[(node, link)] = True
+        for port in ports:
+            if port not in self.portRanks:
+                self.portRanks[port] = self.nextRank
+                self.nextRank += 1
+        self.iterate(ports)
+
+    def fork(self, state):
+        engine = super().fork(state)
+        engine.cyclic = self.cyclic
+        return engine
+
+    def update(self, ports, links):
+        """ Computes again the given ports after the network has been modified, and the ports depending on them
+
+        See MemoizedEngine.update. Once cycles have been computed, iterating again from the previous results, or
+        from the first estimates of the ports depending on the change only, can reach another fixed point than an
+        analysis from the start: all the results are discarded instead, and the network is solved again on request,
+        as they are when the results of the state were not computed by this engine.
+        """
+        if self.cyclic is False:
+            super().update(ports, links)
+        else:
+            self.state.reset()
+
+    def iterate(self, ports):
+        """ Computes the given ports, then the ports whose inputs changed, until no output changes, see the class """
+        config = Utils.getConfig()
+        queue = []
+        queued = {} # port -> rank it is queued with
+        sequence = itertools.count() # Ports of the same rank are processed in the order they are queued
+        def push(port, rank):
+            if queued.get(port, rank + 1) > rank:
+                queued[port] = rank
+                heapq.heappush(queue, (rank, next(sequence), port))
+        for port in ports:
+            push(port, self.portRanks.get(port, 0))
+
+        computations = {} # port -> times it has been computed
+        while queue:
+            rank, order, port = heapq.heappop(queue)
+            if queued.get(port) != rank:
+                continue
+            del queued[port]
+            if port in self.state.divergedPorts:
+                continue
+            node, link = port
+            computations[port] = computations.get(port, 0) + 1
+            if computations[port] > config.fixedPointIterations:
+                diverged = True
+            else:
+                changedFlows = self.computePort(node, link, config.fixedPointTolerance)
+                # Bursts growing until they are no longer finite diverge before reaching the limit
+                diverged = computations[port] > 1 and any(not math.isfinite(self.outputs[(node, link, flow)].delay) for flow in changedFlows)
+            if diverged:
+                print("ERROR: The delay of the port of {0} towards {1} has not converged after {2} iterations, the flows of its cycle are not stable!".format(node, link, computations[port] - 1))
+                changedFlows = self.diverge(node, link, port)
+            for flow in changedFlows:
+                for consumer in findConsumers(self.state, node, link, flow):
+                    self.portRanks[consumer] = max(self.portRanks.get(consumer, 0), self.portRanks.get(port, 0) + 1)
+                    push(consumer, self.portRanks[consumer])
+
+    def computePort(self, node, link, tolerance):
+        """ Computes the port of node towards link and the outputs of the flows leaving through it, returns the flows whose output changed
+
+        Same computations as MemoizedEngine.refreshPort, for every flow leaving through the port
+        """
+        if Utils.getConfig().instrument:
+            Instrumentation.count("ports.evaluated")
+        direction = "direct" if link.start == node else "inverse"
+        flows = link.flowsPerDirection[direction]
+        state = self.state
+        port = (node, link)
+        if not flows:
+            state.resetPort(node, link)
+            return []
+        self.services.pop(port, None)
+        claim = state.claims.setdefault(port, next(iter(flows.values())))
+
+        self.divergedInput = None
+        try:
+            totalArrival = AffineCurve(0, 0)
+            upstreamOutputs = {}
+            for flow in flows.values():
+                if node == claim.source:
+                    totalArrival += flow.computeArrivalAffine()
+                else:
+                    upstreamOutputs[flow] = self.computeUpstreamOutput(node, flow)
+                    totalArrival += upstreamOutputs[flow].outputArrival
+            service = self.getWorstCaseService(node, link, claim)
+            divergedInput = self.divergedInput
+        finally:
+            self.divergedInput = None
+        if divergedInput is not None:
+            return self.diverge(node, link, divergedInput)
+        backlog = computeTheorem1Backlog(totalArrival, service)
+        delay = computeTheorem1Delay(totalArrival, service)
+        state.delayBounds[port] = delay
+        state.totalArrivals[port] = totalArrival
+        state.backlogs[port] = backlog
+
+        changedFlows = []
+        for flow in flows.values():
+            key = (node, link, flow)
+            totalDelay = 0
+            if node == flow.source:
+                arrival = flow.computeArrivalAffine()
+            else:
+                upstreamOutput = upstreamOutputs.get(flow) or self.computeUpstreamOutput(node, flow)
+                totalDelay = upstreamOutput.delay
+                arrival = upstreamOutput.outputArrival
+            totalDelay += delay
+            output = FlowOutput(arrival.delayBy(delay), totalDelay, totalArrival, backlog)
+            previousOutput = self.outputs.get(key) or self.estimateOutput(flow)
+            self.outputs[key] = output
+            if (hasChanged(output.delay, previousOutput.delay, tolerance) or hasChanged(output.outputArrival.m, previousOutput.outputArrival.m, tolerance)
+                    or hasChanged(output.outputArrival.n, previousOutput.outputArrival.n, tolerance)):
+                changedFlows.append(flow)
+        return changedFlows
+
+    def diverge(self, node, link, origin):
+        """ Gives the port of node towards link and the outputs leaving through it infinite delays and bursts, returns the flows leaving through it
+
+        origin is the port whose delay diverged, this one or a port it depends on
+        """
+        direction = "direct" if link.start == node else "inverse"
+        flows = link.flowsPerDirection[direction].values()
+        state = self.state
+        port = (node, link)
+        state.divergedPorts[port] = origin
+        totalArrival = AffineCurve(sum(flow.computeArrivalAffine().m for flow in flows), float("inf"))
+        state.delayBounds[port] = float("inf")
+        state.totalArrivals[port] = totalArrival
+        state.backlogs[port] = float("inf")
+        for flow in flows:
+            arrival = AffineCurve(flow.computeArrivalAffine().m, float("inf"))
+            self.outputs[(node, link, flow)] = FlowOutput(arrival, float("inf"), totalArrival, float("inf"))
+        return list(flows)
+
+    def computeUpstreamOutput(self, node, flow):
+        """ Returns the output computed at the node preceding node in flow's path, its first estimate if it is not computed yet """
+        key = self.upstreamKeys.get((node, flow))
+        if key is None:
+            previousNode, currentTarget = findUpstream(node, flow)
+            key = (previousNode, currentTarget.findOutgoingLink(previousNode), flow)
+            self.upstreamKeys[(node, flow)] = key
+        origin = self.state.divergedPorts.get(key[:2])
+        if origin is not None:
+            self.divergedInput = origin
+        result = self.outputs.get(key)
+        if result is None:
+            if self.pendingPorts:
+                # Requested while ports are computed again, see update, the network has no cycle
+                return MemoizedEngine.computeTargetArrivalAffine(self, key[0], findUpstream(node, flow)[1])
+            return self.estimateOutput(flow)
+        if Utils.getConfig().instrument:
+            Instrumentation.count("cache.hits")
+        return result
+
+    def estimateOutput(self, flow):
+        """ Returns the first estimate of the outputs of flow, its arrival curve at its source """
+        return FlowOutput(flow.computeArrivalAffine(), 0, AffineCurve(0, 0), 0)
+
+def hasChanged(value, previous, tolerance):
+    """ Returns True if value differs from previous by more than tolerance, relatively. Undefined values are equal to each other """
+    if value == previous:
+        return False
+    if math.isfinite(value) and math.isfinite(previous):
+        return abs(value - previous) > tolerance*abs(previous)
+    return not (math.isnan(value) and math.isnan(previous))
+
+def claimPort(state, port, flow, delay):
+    """ Records that the port has been computed for flow, see MemoizedEngine
+
+    A port whose delay is negative is not calculated, and is computed again for the next flow requesting it, as
+    the recursion does, so it is not claimed
+    """
+    if delay >= 0:
+        state.claims[port] = flow
+    else:
+        state.claims.pop(port, None)
+
+def findUpstream(node, flow):
+    """ Returns the node preceding node in flow's path, and a target of flow going through both """
+    return flow.findUpstream(node)
+
+def findConsumers(state, node, link, flow):
+    """ Returns the calculated ports of state whose results depend on the output of flow at the port of node towards link
+    
+    These are the ports the flow goes through next, and the ports of the next node where the flow has a higher
+    priority than the flow the port was computed for. Ports depending on a flow through several targets may be
+    returned even if only one of them is used.
+    """
+    nextNode = link.end if link.start == node else link.start
+    consumers = [(nextNode, nextLink) for nextLink in flow.getTree().outgoingLinks.get(nextNode, ())]
+    # Higher priority flows are accounted for in the service of the ports of the links they go through
+    for otherLink in [link] + [port[1] for port in consumers]:
+        if state.delayBounds.get((nextNode, otherLink), -1) >= 0:
+            claim = state.claims.get((nextNode, otherLink))
+            if claim is None or claim.priority < flow.priority:
+                consumers.append((nextNode, otherLink))
+    return [port for port in dict.fromkeys(consumers) if state.delayBounds.get(port, -1) >= 0]
+
+def findDownstreamCone(state, ports):
+    """ Returns the given ports and all the ports of state whose results depend on them, see findConsumers """
+    cone = set()
+    pending = list(ports)
+    while pending:
+        port = pending.pop()
+        if port in cone:
+            continue
+        cone.add(port)
+        node, link = port
+        direction = "direct" if link.start == node else "inverse"
+        for flow in link.flowsPerDirection[direction].values():
+            pending.extend(findConsumers(state, node, link, flow))
+    return cone
+
+def findClaims(network):
+    """ Returns the flow each port of network is computed for by an analysis from the start, see claimPort
+
+    A port is computed for the first flow requesting its output, so the requests of computeOutput and
+    getWorstCaseService are followed in the analysis order, without computing anything. The ports are assumed
+    to be calculated once computed, which holds when no delay is negative. Returns None if a port depends on
+    itself, as the analysis would then raise a ValueError, see reportCycle.
+    """
+    claims = {}
+    computed = set() # (port, flow) outputs whose requests have been followed
+    pendingPorts = set()
+    services = set() # (port, priority) services already requested
+    upstreamPorts = {} # (node, flow) -> port of the node preceding node in flow's path
+    cycles = []
+
+    def request(port, flow):
+        if port in pendingPorts:
+            cycles.append(port)
+            return
+        pendingPorts.add(port)
+        node, link = port
+        portCalculated = port in claims
+        if not portCalculated:
+            claims[port] = flow
+        if node != flow.source:
+            direction = "direct" if link.start == node else "inverse"
+            for otherFlow in (flow,) if portCalculated else link.flowsPerDirection[direction].values():
+                requestUpstream(node, otherFlow)
+        if (port, flow.priority) not in services:
+            services.add((port, flow.priority))
+            for otherFlow in link.flows.values():
+                if otherFlow.priority > flow.priority and node != otherFlow.source:
+                    requestUpstream(node, otherFlow)
+        pendingPorts.discard(port)
+        computed.add((port, flow))
+
+    def requestUpstream(node, flow):
+        upstreamPort = upstreamPorts.get((node, flow))
+        if upstreamPort is None:
+            previousNode = findUpstream(node, flow)[0]
+            upstreamPort = upstreamPorts[(node, flow)] = (previousNode, network.getConnectingLink(previousNode, node))
+        if (upstreamPort, flow) not in computed:
+            request(upstreamPort, flow)
+
+    with Utils.CollectionPause(): # The sets only grow until the walk ends
+        for flow in network.flows.values():
+            for target in flow.targets.values():
+                node = target.findPreviousNode(target.path[-1])
+                port = (node, target.findOutgoingLink(node))
+                if (port, flow) not in computed:
+                    request(port, flow)
+                if cycles:
+                    return None
+    return claims
+
+def reportCycle(node, link):
+    print("ERROR: The port of {0} towards {1} depends on itself, the flows have a cyclic dependency! The fixedpoint solver computes such networks".format(node, link))
+    raise ValueError
+
+# Engines that can be selected by name, see Utils.AnalysisConfig
+solvers = {"recursive": RecursiveEngine, "memoized": MemoizedEngine, "topological": TopologicalEngine, "fixedpoint": FixedPointEngine}
+optionalSolvers = ["vectorized"] # Need numpy
+
+def createEngine(state, solver):
+    """ Returns a new engine of the given name computing the results of state, an AnalysisState """
+    if solver == "vectorized":
+        from Vectorized import VectorizedEngine
+        return VectorizedEngine(state)
+    if solver not in solvers:
+        print("ERROR: {0} is not a valid solver, use one of {1}".format(solver, list(solvers) + optionalSolvers))
+        raise ValueError
+    return solvers[solver](state)
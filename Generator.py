@@ -0,0 +1,128 @@
+import argparse
+import random
+from Parser import XMLWriter
+
+def generateNetwork(path, seed = 0, switches = 4, stationsPerSwitch = 3, flows = 20, multicast = 1, highPriorityShare = 0.0,
+                    maxPathLength = None, transmissionCapacity = "100Mbps", name = None):
+    """ Writes a random AFDX network in the WoPANets input format to the file given by path, the same seed gives the same file
+
+    The switches form a random tree, switch 0 being its root, and every switch has stationsPerSwitch stations.
+    Each flow goes from a random station to 1 to multicast other stations whose routes cross at most
+    maxPathLength switches, any number if None. A share highPriorityShare of the stations send high priority
+    flows, which only go to other such stations and towards the root of the tree: flows of both priorities
+    crossing the same link in both directions make the ports depend on each other, which the engines can't
+    analyse. The share of high priority flows is therefore approximate, as the high priority stations that
+    can't reach any other one send no flow.
+    """
+    if switches < 1 or stationsPerSwitch < 1 or switches*stationsPerSwitch < 2:
+        print("ERROR: A network needs at least one switch and two stations!")
+        raise ValueError
+    generator = random.Random(seed)
+    if name is None:
+        name = "generated{0}".format(seed)
+
+    # Each switch is connected to a random switch before it, so the root is an ancestor of all of them
+    parents = [None] + [generator.randrange(i) for i in range(1, switches)]
+    depths = [0]
+    for i in range(1, switches):
+        depths.append(depths[parents[i]] + 1)
+    stations = [(i, j) for i in range(switches) for j in range(stationsPerSwitch)]
+    highPriority = {station: generator.random() < highPriorityShare for station in stations}
+
+    def switchName(i):
+        return "S{0}".format(i)
+
+    def stationName(station):
+        return "ES{0}_{1}".format(*station)
+
+    routes = {}
+    def switchRoute(a, b):
+        """ Returns the switches from a to b, both included """
+        if (a, b) in routes:
+            return routes[(a, b)]
+        up = [a]
+        down = [b]
+        while up[-1] != down[-1]:
+            if depths[up[-1]] >= depths[down[-1]]:
+                up.append(parents[up[-1]])
+            else:
+                down.append(parents[down[-1]])
+        routes[(a, b)] = up + down[-2::-1]
+        return routes[(a, b)]
+
+    def findDestinations(source):
+        """ Returns the stations a flow of source may go to """
+        return [station for station in stations if station != source and
+                (maxPathLength is None or len(switchRoute(source[0], station[0])) <= maxPathLength) and
+                (not highPriority[source] or (highPriority[station] and isAncestor(station[0], source[0])))]
+
+    def isAncestor(a, b):
+        """ Returns True if switch a is b or one of its ancestors """
+        while b is not None and b != a:
+            b = parents[b]
+        return b == a
+
+    with open(path, "w", encoding = "utf-8") as networkFile:
+        writer = XMLWriter(networkFile)
+        writer.start("elements")
+        writer.element("network", {"name": name, "overhead": "67", "transmission-capacity": transmissionCapacity, "x-type": "AFDX"})
+        for station in stations:
+            writer.element("station", {"name": stationName(station), "transmission-capacity": transmissionCapacity, "x": "0", "y": "0"})
+        for i in range(switches):
+            writer.element("switch", {"name": switchName(i), "transmission-capacity": transmissionCapacity, "x": "0", "y": "0"})
+
+        ports = [0]*switches
+        linkCount = 0
+        for i in range(1, switches):
+            writer.element("link", {"name": "L{0}".format(linkCount), "from": switchName(parents[i]), "fromPort": str(ports[parents[i]]),
+                                    "to": switchName(i), "toPort": str(ports[i]), "transmission-capacity": transmissionCapacity})
+            ports[parents[i]] += 1
+            ports[i] += 1
+            linkCount += 1
+        for station in stations:
+            writer.element("link", {"name": "L{0}".format(linkCount), "from": stationName(station), "fromPort": "0",
+                                    "to": switchName(station[0]), "toPort": str(ports[station[0]]), "transmission-capacity": transmissionCapacity})
+            ports[station[0]] += 1
+            linkCount += 1
+
+        destinations = {station: findDestinations(station) for station in stations}
+        sources = [station for station in stations if destinations[station]]
+        if flows > 0 and not sources:
+            print("ERROR: No station can send a flow with the given maximum path length and priorities!")
+            raise ValueError
+        for flowIndex in range(flows):
+            source = generator.choice(sources)
+            candidates = destinations[source]
+            flowDestinations = generator.sample(candidates, min(len(candidates), generator.randint(1, multicast)))
+            priority = "High" if highPriority[source] else "Low"
+
+            writer.start("flow", {"deadline": str(generator.choice([1, 2, 4, 8])), "jitter": "0", "max-payload": str(generator.randint(64, 1471)),
+                                  "name": "VL{0}".format(flowIndex), "period": str(generator.choice([2, 4, 8, 16, 32, 64, 128])),
+                                  "priority": priority, "source": stationName(source)})
+            for destination in flowDestinations:
+                writer.start("target", {"name": stationName(destination)})
+                for switch in switchRoute(source[0], destination[0]):
+                    writer.element("path", {"node": switchName(switch)})
+                writer.element("path", {"node": stationName(destination)})
+                writer.end()
+            writer.end()
+        writer.end()
+
+def main(arguments = None):
+    """ Writes a generated network to the file given in the command line """
+    parser = argparse.ArgumentParser(description = "Generates a random AFDX network in the WoPANets input format")
+    parser.add_argument("path", help = "file the network is written to")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--switches", type = int, default = 4)
+    parser.add_argument("--stations-per-switch", type = int, default = 3)
+    parser.add_argument("--flows", type = int, default = 20)
+    parser.add_argument("--multicast", type = int, default = 1, help = "maximum number of targets of a flow")
+    parser.add_argument("--high-priority-share", type = float, default = 0.0, help = "share of the stations sending high priority flows")
+    parser.add_argument("--max-path-length", type = int, default = None, help = "maximum number of switches crossed by a flow")
+    parser.add_argument("--transmission-capacity", default = "100Mbps")
+    args = parser.parse_args(arguments)
+    generateNetwork(args.path, args.seed, args.switches, args.stations_per_switch, args.flows, args.multicast,
+                    args.high_priority_share, args.max_path_length, args.transmission_capacity)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import json
+import time
+import Utils
+
+# Counters and timers are only updated when instrument is True in the configuration in use, see Utils.getConfig. They are shared by all the analyses of the process
+counters = {} # name -> count
+timers = {} # name -> [seconds, calls]
+
+def count(name, amount = 1):
+    """ Adds amount to the counter called name """
+    counters[name] = counters.get(name, 0) + amount
+
+class Timer():
+    """ Context manager adding the time spent in its block to the timer called name, when instrument is True in the configuration in use """
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if Utils.getConfig().instrument:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        if self.start is not None:
+            timer = timers.setdefault(self.name, [0, 0])
+            timer[0] += time.perf_counter() - self.start
+            timer[1] += 1
+            self.start = None
+        return False
+
+def reset():
+    """ Sets all counters and timers back to zero """
+    counters.clear()
+    timers.clear()
+
+def getReport():
+    """ Returns the counters and timers as a dictionary that can be written as JSON """
+    return {"counters": dict(sorted(counters.items())),
+            "timers": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in sorted(timers.items())}}
+
+def mergeReports(reports):
+    """ Returns the report adding up the counters and timers of the given reports, such as those of the files of a batch """
+    merged = {"counters": {}, "timers": {}}
+    for report in reports:
+        for name, value in report["counters"].items():
+            merged["counters"][name] = merged["counters"].get(name, 0) + value
+        for name, timer in report["timers"].items():
+            mergedTimer = merged["timers"].setdefault(name, {"seconds": 0, "calls": 0})
+            mergedTimer["seconds"] += timer["seconds"]
+            mergedTimer["calls"] += timer["calls"]
+    merged["counters"] = dict(sorted(merged["counters"].items()))
+    merged["timers"] = dict(sorted(merged["timers"].items()))
+    return merged
+
+def formatReport(report = None, format = "text"):
+    """ Returns the report, the current one if None, as text or as JSON """
+    if report is None:
+        report = getReport()
+    if format == "json":
+        return json.dumps(report, indent = "\t")
+    lines = ["Counters:"]
+    for name, value in report["counters"].items():
+        lines.append("\t{0}: {1}".format(name, value))
+    lines.append("Timers:")
+    for name, timer in report["timers"].items():
+        lines.append("\t{0}: {1:.6f}s in {2} calls".format(name, timer["seconds"], timer["calls"]))
+    return "\n".join(lines)
@@ -1,61 +1,60 @@
-from Parser import parseXML, produceXML
-import Utils
+import argparse
 import os
+import Batch
+import Cache
+import Instrumentation
+import Utils
 
 searchFiles = "xml" # Analyze all files in current folder whose name finishes by this string
 directory = 'XMLsamples/Inputs'
+outputDirectory = "PythonResults"
+
+def main(arguments = None):
+    """ Analyses all matching files of the input directory in parallel, writing their results and a summary """
+    parser = argparse.ArgumentParser(description = "Computes end to end delays, backlogs and loads of WoPANets networks")
+    parser.add_argument("directory", nargs = "?", default = directory, help = "folder containing the input files")
+    parser.add_argument("--output", default = outputDirectory, help = "folder where results are written")
+    parser.add_argument("--workers", type = int, default = None, help = "files analysed at the same time, the number of cores by default")
+    parser.add_argument("--partition", nargs = "?", type = int, const = 0, default = None,
+                        help = "analyse the independent components of each network in this many processes, the number of cores by default")
+    parser.add_argument("--timeout", type = float, default = None, help = "seconds after which the analysis of a file is stopped")
+    parser.add_argument("--summary", default = None, help = "JSON summary of the batch, <output>/summary.json by default")
+    parser.add_argument("--instrument", choices = ["text", "json"], default = None, help = "count calls, cache hits and ports evaluated and time each phase, "
+                        "the totals are printed in this format and every file's are added to the summary")
+    parser.add_argument("--cache", nargs = "?", const = Cache.cacheDirectory, default = None,
+                        help = "reuse the results of files analysed before with the same contents and settings, stored in this folder, "
+                        + Cache.cacheDirectory + " by default")
+    parser.add_argument("--cache-size", type = float, default = Cache.maxBytes/(1024*1024), help = "MB kept in the cache, the entries used least recently are removed")
+    parser.add_argument("--watch", nargs = "?", type = float, const = 1.0, default = None,
+                        help = "keep analysing the files of the directory that are new or modified, checking every this many seconds")
+    args = parser.parse_args(arguments)
+    if args.instrument is not None:
+        Utils.instrument = True
+    if args.partition is not None:
+        Utils.partitionWorkers = args.partition if args.partition > 0 else os.cpu_count() or 1
+
+    summaryPath = args.summary if args.summary is not None else os.path.join(args.output, "summary.json")
+    batchArguments = {"workers": args.workers, "timeout": args.timeout, "summaryPath": summaryPath,
+                      "cacheDirectory": args.cache, "cacheBytes": int(args.cache_size*1024*1024)}
+    if args.watch is not None:
+        print("Watching {0}, press Ctrl+C to stop".format(args.directory))
+        try:
+            for summary in Batch.watchDirectory(args.directory, searchFiles, args.output, args.watch, **batchArguments):
+                printSummary(summary, args.instrument)
+        except KeyboardInterrupt:
+            pass
+        return None
+
+    inputPaths = [os.path.join(args.directory, filename) for filename in sorted(os.listdir(args.directory)) if filename.endswith(searchFiles)]
+    summary = Batch.runBatch(inputPaths, args.output, **batchArguments)
+    printSummary(summary, args.instrument)
+    return summary
+
+def printSummary(summary, instrument):
+    print("\nAnalysed {0} files in {1:.3f}s: {2}".format(len(summary["files"]), summary["seconds"], summary["counts"]))
+    if instrument is not None:
+        reports = [outcome["instrumentation"] for outcome in summary["files"] if "instrumentation" in outcome]
+        print(Instrumentation.formatReport(Instrumentation.mergeReports(reports), instrument))
 
-for filename in os.listdir(directory):
-    if filename.endswith(searchFiles):
-        # Analyze each matching network, prints the results on top of writing the XML
-        print("-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+")
-        print(filename)
-        print("-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+")
-        net = parseXML(directory + "/" + filename)
-        if Utils.verbose:
-            Utils.printIfVerbose("----------------------------------------")
-            print("\n------------LOADS------------------")
-            loads = net.computeLoads()
-            print(loads)
-            print("\n------------STABILITY------------------")
-            isStable = net.isStable()
-            if isStable:
-                print(net.name + " is stable")
-            else:
-                print(net.name + " is NOT! stable")
-                
-            print("\n------------AFFINE CURVES------------------")
-            print("Flow arrival curves:")
-            for flow in net.flows.values():
-                arrival = flow.computeArrivalAffine()
-                Utils.affineCurvePrint(flow, arrival)
-            print("Nodes service curves:")
-            for station in net.stations.values():
-                service = station.computeServiceAffine()
-                Utils.affineCurvePrint(station.name, service)
-            for switch in net.switches.values():
-                service = switch.computeServiceAffine()
-                Utils.affineCurvePrint(flow.name, service)
-                
-            print("\n---------End to End Delay -----------------")
-            for flow in net.flows.values():
-                for target in flow.targets.values():
-                    print("{0}, target {1} has an end to end delay of {2}s".format(str(target.parentFlow.name), \
-                    str(target.path[-1]), Utils.createQuantity(target.computeEndToEndDelay(), digits = 4)))  
-            
-            print("\n--------- Backlogs -----------------")
-            for switch in net.switches.values():
-                for outLink in switch.getLinks():
-                    delay = str(Utils.createQuantity(switch.getDelay(outLink)))
-                    backlog = str(Utils.createQuantity(switch.getBacklog(outLink), digits = 0))   
-                    print("{0} leaving from {1} has backlog {2}b and delay {3}s".format(outLink, switch, backlog, delay))
-        print("\n---------Producing XML-----------------")
-        name = "PythonResults/" + net.name + "_res.xml"
-        print("done")
-        produceXML(net, name)
-        
-#         print("\n---------Comparing XML-----------------")
-#         compareResults(net.name)
-        print("\n\n\n\n")
-    else:
-        continue
\ No newline at end of file
+if __name__ == "__main__":
+    main()
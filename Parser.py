@@ -1,250 +1,417 @@
-from xml.etree.ElementTree import Element, SubElement, parse, ElementTree
+import os
+from xml.parsers import expat
 import Classes
+import Instrumentation
+import Utils
 from Utils import createQuantity, printIfVerbose, interpretQuantity
 
-digitsPrecision = 2 # Number of decimal places included in results
-
-def indent(elem, level=0):
-    i = "\n" + level*"\t"
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "\t"
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-        for elem in elem:
-            indent(elem, level+1)
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-    else:
-        if level and (not elem.tail or not elem.tail.strip()):
-                elem.tail = i
-
-def produceXML(net, name):
-    """" Writes the results XML object to the file given by name following the results file standard"""
-    resultsXML = Element('results')
-    
-    delaysXML = SubElement(resultsXML, "delays")
-    for flow in net.flows.values():
-        flowXML = SubElement(delaysXML, "flow", {"name":flow.name})
-        for target in flow.targets.values():
-            delay = str(createQuantity(target.computeEndToEndDelay(), digitsPrecision, omitUnit = True, selectUnit = "u"))
-            SubElement(flowXML, "target", {"name": target.name, "value": delay})
-    
-    jittersXML = SubElement(resultsXML, "jitters")
-    for flow in net.flows.values():
-        flowXML = SubElement(jittersXML, "flow", {"name":flow.name})
-        for target in flow.targets.values():
-            delay = "0"
-            target = SubElement(flowXML, "target", {"name": target.name, "value": delay})
-
-    backlogsXML = SubElement(resultsXML, "backlogs")
-    for switch in net.switches.values():
-        switchXML = SubElement(backlogsXML, "switch", {"name": switch.name})
-        for outLink in switch.getLinks():
-            delay = str(createQuantity(switch.getDelay(outLink), digitsPrecision, omitUnit = True, selectUnit = "u"))
-            backlog = str(createQuantity(switch.getBacklog(outLink), digitsPrecision))
-            if (backlog == "0"):
-                continue
-            SubElement(switchXML, "port", {"backlog": str(backlog + "b"), "delay": delay, "num": str(outLink.getPort(switch))})
-        SubElement(switchXML, "total", {"backlog": str(createQuantity(switch.getTotalBacklog(), digitsPrecision) + "b"), "buffer": str(switch.buffer), "percent": "{:.1f}%".format(100 * switch.getTotalBacklog()/switch.buffer)})
-    
-    loadsXML = SubElement(resultsXML, "loads")
-    for link in net.links.values():
-        edgeXML = SubElement(loadsXML, "edge", {"name": link.name})
-        SubElement(edgeXML, "usage", {"percent": str(round(100 * link.getUsage("direct"), digitsPrecision)) + "%", "type": "direct", "value": str(link.computeLoad("direct"))})
-        SubElement(edgeXML, "usage", {"percent": str(round(100 * link.getUsage("inverse"), digitsPrecision)) + "%", "type": "inverse", "value": str(link.computeLoad("inverse"))})
-    
-    
-    indent(resultsXML)
-    tree = ElementTree(resultsXML)
-    
-    tree.write(name, xml_declaration=True, encoding='utf-8', method="xml")
-    
-    return resultsXML
-    
-def parseXML(XMLPath):
-    """ Parses an XML file with the appropriat format for the exercice and creates its data structure, returning a network object """
-    tree = parse(XMLPath)
-    root = tree.getroot()
-    
-    for child in root:
-        
-        # Parse the network first
-        if child.tag == "network":
-            printIfVerbose("Building a " + child.tag + " called " + child.attrib["name"])
-            name = ""
-            overhead = 0
-            transmission_capacity = 0
-            x_type = ""
-            for attributeName in child.attrib:
-                if attributeName == "name":
-                    name = child.attrib[attributeName]
-                elif attributeName == "overhead":
-                    overhead = 8* interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "transmission-capacity":
-                    transmission_capacity = interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "x-type":
-                    x_type = child.attrib[attributeName]
-            net = Classes.Network(name, overhead, transmission_capacity, x_type)
-            break
+class XMLWriter():
+    """ Writes an XML document to a file one element at a time, indented with tabs
+    
+    The output is the same as ElementTree.write gives for the whole document once indented, but only the
+    elements being written are kept in memory
+    """
+    def __init__(self, file):
+        self.file = file
+        self.openTags = []
+        self.tagPending = False # The last start tag is not closed yet, as it may be empty
+        self.file.write("<?xml version='1.0' encoding='utf-8'?>\n")
+    
+    def start(self, tag, attributes = {}):
+        """ Opens an element, which is closed by the next call to end """
+        if self.openTags:
+            if self.tagPending:
+                self.file.write(">")
+            self.file.write("\n" + len(self.openTags)*"\t")
+        self.file.write("<" + tag)
+        for name, value in attributes.items():
+            self.file.write(" " + name + "=\"" + escapeAttribute(value) + "\"")
+        self.openTags.append(tag)
+        self.tagPending = True
+    
+    def end(self):
+        """ Closes the last opened element """
+        tag = self.openTags.pop()
+        if self.tagPending:
+            self.file.write(" />")
         else:
-            print("ERROR: Could not find a network node!")
-    
-    # All attribute assignation referring to network nodes are first done as strings, and then
-    # the corresponding nodes are assigned AFTER we've ensured all the nodes have been created.
-    for child in root:
-        printIfVerbose("Building a " + child.tag + " called " + child.attrib["name"])
-        if child.tag == "station":
-            name = ""
-            transmission_capacity = 0
-            x = 0
-            y = 0
-            for attributeName in child.attrib:
-                if attributeName == "name":
-                    name = child.attrib[attributeName]
-                elif attributeName == "transmission-capacity":
-                    transmission_capacity = interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "x":
-                    x = child.attrib[attributeName]
-                elif attributeName == "y":
-                    y = child.attrib[attributeName]
-            
-            newStation = Classes.Station(name, transmission_capacity, x, y)
-            newStation.setNetwork(net)
-            net.stations[name] = newStation
+            self.file.write("\n" + len(self.openTags)*"\t" + "</" + tag + ">")
+            if not self.openTags:
+                self.file.write("\n")
+        self.tagPending = False
+    
+    def element(self, tag, attributes = {}):
+        """ Writes an element without children """
+        self.start(tag, attributes)
+        self.end()
+
+def escapeAttribute(value):
+    """ Escapes an attribute value as ElementTree does """
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    if "\"" in value:
+        value = value.replace("\"", "&quot;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    if "\t" in value:
+        value = value.replace("\t", "&#09;")
+    return value
+
+def produceXML(net, name, config = None):
+    """" Writes the results XML object to the file given by name following the results file standard
+    
+    The results are read from Network.analyze, and written one element at a time, the results document is never
+    held in memory. The results are written to a temporary file first, so that name is only created once the
+    whole analysis has succeeded. Numbers are written with the digitsPrecision of config, of the network's
+    configuration if None, see Network.getConfig
+    """
+    temporaryName = name + ".part"
+    try:
+        with Utils.ConfigScope(config or net.getConfig()):
+            writeResults(net.analyze(), temporaryName)
+    except:
+        if os.path.exists(temporaryName):
+            os.remove(temporaryName)
+        raise
+    os.replace(temporaryName, name)
+
+def writeResults(result, name):
+    """ Writes an AnalysisResult to the file given by name, with the digitsPrecision of the configuration in use """
+    net = result.network
+    digitsPrecision = Utils.getConfig().digitsPrecision
+    with open(name, "w", encoding = "utf-8", errors = "xmlcharrefreplace") as resultsFile:
+        writer = XMLWriter(resultsFile)
+        writer.start("results")
         
-        elif child.tag == "switch":
-            name = ""
-            transmission_capacity = 0
-            x = 0
-            y = 0
-            redundancy = "Unspecified"
-            for attributeName in child.attrib:
-                if attributeName == "name":
-                    name = child.attrib[attributeName]
-                elif attributeName == "transmission-capacity":
-                    transmission_capacity = interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "x":
-                    x = child.attrib[attributeName]
-                elif attributeName == "y":
-                    y = child.attrib[attributeName]
-                elif attributeName == "redundancy":
-                    redundancy = child.attrib[attributeName]
-           
-            newSwitch = Classes.Switch(name, transmission_capacity, x, y)
-            if redundancy != "Unspecified":
-                newSwitch.setRedundancy(redundancy)
-            newSwitch.setNetwork(net)
-            net.switches[name] = newSwitch
+        with Instrumentation.Timer("results.delays"):
+            writer.start("delays")
+            for flow in net.flows.values():
+                writer.start("flow", {"name":flow.name})
+                flowDelays = result.delays[flow.name]
+                for target in flow.targets.values():
+                    delay = str(createQuantity(flowDelays[target.name], digitsPrecision, omitUnit = True, selectUnit = "u"))
+                    writer.element("target", {"name": target.name, "value": delay})
+                writer.end()
+            writer.end()
         
-        elif child.tag == "link":
-            name = ""
-            start = ""
-            startPort = ""
-            end = ""
-            endPort = ""
-            transmission_capacity = 0
-            for attributeName in child.attrib:
-                if attributeName == "name":
-                    name = child.attrib[attributeName]
-                elif attributeName == "from":
-                    start = child.attrib[attributeName]
-                elif attributeName == "fromPort":
-                    startPort = child.attrib[attributeName]
-                elif attributeName == "to":
-                    end = child.attrib[attributeName]
-                elif attributeName == "toPort":
-                    endPort = child.attrib[attributeName]
-                elif attributeName == "transmission-capacity":
-                    transmission_capacity = interpretQuantity(child.attrib[attributeName])
-            
-            newLink = Classes.Link(name, start, startPort, end, endPort, transmission_capacity)
-            newLink.setNetwork(net)
-            net.links[name] = newLink
+        with Instrumentation.Timer("results.jitters"):
+            writer.start("jitters")
+            for flow in net.flows.values():
+                writer.start("flow", {"name":flow.name})
+                for target in flow.targets.values():
+                    delay = "0"
+                    writer.element("target", {"name": target.name, "value": delay})
+                writer.end()
+            writer.end()
         
-        elif child.tag == "flow":
-            deadline = 0
-            jitter = 0
-            max_payload = 0
-            name = ""
-            period = 0
-            priority = 0
-            source = ""
-            redundancy = "MAIN"
-            for attributeName in child.attrib:
-                if attributeName == "deadline":
-                    deadline = interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "jitter":
-                    jitter = interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "max-payload":
-                    max_payload = 8*interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "name":
-                    name = child.attrib[attributeName]
-                elif attributeName == "period":
-                    period = 1e-3*interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "priority":
-                    priorityString = child.attrib[attributeName]
-                    if priorityString == "Low":
-                        priority = 0
-                    elif priorityString == "High":
-                        priority = 1
-                    else:
-                        print("ERROR: The priority string for {0} is not admitted!".format(name))
-                elif attributeName == "transmission-capacity":
-                    transmission_capacity = interpretQuantity(child.attrib[attributeName])
-                elif attributeName == "source":
-                    source = child.attrib[attributeName]
-                    #Find the end system and add it to the targets list
-            newFlow = Classes.Flow(deadline, jitter, max_payload, name, period, priority, source)
-            newFlow.setNetwork(net)
-            net.flows[name] = newFlow
-            
-            
-            for targetElement in child:
-                # Gather attributes
-                targetStationName = targetElement.attrib["name"]
-                sourceStationName = child.attrib["source"]
-                try:
-                    redundancy = child.attrib["redundancy"]
-                except:
-                    redundancy = "Unspecified"
-                # Create target
-                target = Classes.Target(targetStationName, sourceStationName, newFlow)
-                # Assign redundancy
-                if redundancy != "Unspecified":
-                    target.setRedundancy(redundancy)
-                
-                # Add target to flow targets
-                newFlow.targets[targetStationName] = target
-                
-                # Build target's path
-                for pathComponent in targetElement:
-                    pathNodeName = pathComponent.attrib["node"]
-                    target.path.append(pathNodeName)
-                    
-                target.setNetwork(net)
-                
+        with Instrumentation.Timer("results.backlogs"):
+            writer.start("backlogs")
+            for switch in net.switches.values():
+                writer.start("switch", {"name": switch.name})
+                for port in result.ports[switch.name].values():
+                    delay = str(createQuantity(port.delay, digitsPrecision, omitUnit = True, selectUnit = "u"))
+                    backlog = str(createQuantity(port.backlog, digitsPrecision))
+                    if (backlog == "0"):
+                        continue
+                    writer.element("port", {"backlog": str(backlog + "b"), "delay": delay, "num": str(port.port)})
+                totalBacklog = result.totalBacklogs[switch.name]
+                writer.element("total", {"backlog": str(createQuantity(totalBacklog, digitsPrecision)) + "b", "buffer": str(switch.buffer), "percent": "{:.1f}%".format(100 * totalBacklog/switch.buffer)})
+                writer.end()
+            writer.end()
+        
+        with Instrumentation.Timer("results.loads"):
+            writer.start("loads")
+            for link in net.links.values():
+                writer.start("edge", {"name": link.name})
+                loads = result.loads[link.name]
+                usages = result.usages[link.name]
+                writer.element("usage", {"percent": str(round(100 * usages["direct"], digitsPrecision)) + "%", "type": "direct", "value": str(loads["direct"])})
+                writer.element("usage", {"percent": str(round(100 * usages["inverse"], digitsPrecision)) + "%", "type": "inverse", "value": str(loads["inverse"])})
+                writer.end()
+            writer.end()
+        
+        writer.end()
+    
+def parseXML(XMLPath, config = None):
+    """ Parses an XML file with the appropriat format for the exercice and creates its data structure, returning a network object
+    
+    The file is read incrementally: each element is turned into its object as soon as it is read, and is
+    never held in memory. Node names are resolved to objects once all the nodes have been read. Every
+    malformed or missing attribute, unknown node and incorrect path found in the file is printed with its line,
+    and then a ValueError is raised. Paths are only checked when all the nodes are known.
+    
+    config is the Utils.AnalysisConfig of the network's parsing and analyses, see Network.getConfig. If None
+    the configuration in use at each step is used, the module settings by default.
+    """
+    with Utils.CollectionPause(), Utils.ConfigScope(config):
+        net = readXML(XMLPath)
+        printIfVerbose("The network has been fully built!")
+    net.config = config
+    return net
+
+def readXML(XMLPath):
+    """ Reads and builds the network of an XML file, see parseXML """
+    parser = expat.ParserCreate()
+    reader = NetworkReader(parser)
+    try:
+        with open(XMLPath, "rb") as XMLFile:
+            parser.ParseFile(XMLFile)
+    except expat.ExpatError as error:
+        reader.addError(expat.ErrorString(error.code), error.lineno)
     
+    net = reader.net
+    if net is None and not reader.errors:
+        print("ERROR: Could not find a network node!")
+        raise ValueError
     # Nodes have been asigned as names, correct to objects
-    for link in net.links.values():
-        link.start = net.getNode(link.start)
-        link.end = net.getNode(link.end)
-    
-    for flow in net.flows.values():
-        source = net.getNode(flow.source)
-        flow.source = source
-        for target in flow.targets.values():
-            target.target = net.getNode(target.target)
-            target.source = net.getNode(target.source) 
-            for i in range(len(target.path)):
-                target.path[i] = net.getNode(target.path[i])
-            printIfVerbose("Path for target " + target.name + " is " + str([str(s) for s in target.path]))
-            if not target.hasPath():
-                print("ERROR: " + str(target) + " path was not built correctly!")
-                
+    reader.resolveNodes()
+    # Paths can only be checked once all their nodes are known
+    if not reader.errors:
+        net.stations = reader.stations
+        net.switches = reader.switches
+        net.links = reader.links
+        net.flows = reader.flows
+        for station in net.stations.values():
+            station.setNetwork(net)
+        for switch in net.switches.values():
+            switch.setNetwork(net)
+        for link in net.links.values():
+            link.setNetwork(net)
+        for flow in net.flows.values():
+            net.resolveFlow(flow)
+        
+        # Index the topology so that links can be found without scanning, then check all paths against it
+        net.buildTopologyIndex()
+        for target, error in net.validatePaths().items():
+            reader.addError("the path of {0} to {1} was not built correctly, {2}".format(target.parentFlow.name, target.name, error), reader.lines[target])
+    
+    if reader.errors:
+        reader.errors.sort(key = lambda error: error[0])
+        for line, message in reader.errors:
+            print("ERROR: line {0}: {1}".format(line, message))
+        raise ValueError("{0} errors found in {1}, the first at line {2}".format(len(reader.errors), XMLPath, reader.errors[0][0]))
+    
     # Initializes some variables
     net.initializeNodes()
+    return net
+
+def decodeText(value):
+    return value
+
+def decodeBits(value):
+    """ Decodes a quantity of bytes as bits """
+    return 8*interpretQuantity(value)
+
+def decodeMilliseconds(value):
+    """ Decodes a quantity of milliseconds as seconds """
+    return 1e-3*interpretQuantity(value)
+
+priorities = {"Low": 0, "High": 1}
+
+def decodePriority(value):
+    if value not in priorities:
+        raise ValueError
+    return priorities[value]
+
+# Attributes read from each element: attribute -> (argument of the object built, decoder, default value, required).
+# Other attributes are ignored. A None argument means the attribute is checked but not used
+schemas = {
+    "network": {
+        "name": ("name", decodeText, "", True),
+        "overhead": ("overhead", decodeBits, 0, False),
+        "transmission-capacity": ("transmission_capacity", interpretQuantity, 0, False),
+        "x-type": ("x_type", decodeText, "", False),
+    },
+    "station": {
+        "name": ("name", decodeText, "", True),
+        "transmission-capacity": ("transmission_capacity", interpretQuantity, 0, True),
+        "x": ("x", decodeText, 0, False),
+        "y": ("y", decodeText, 0, False),
+    },
+    "switch": {
+        "name": ("name", decodeText, "", True),
+        "transmission-capacity": ("transmission_capacity", interpretQuantity, 0, True),
+        "x": ("x", decodeText, 0, False),
+        "y": ("y", decodeText, 0, False),
+        "redundancy": ("redundancy", decodeText, "Unspecified", False),
+    },
+    "link": {
+        "name": ("name", decodeText, "", True),
+        "from": ("start", decodeText, "", True),
+        "fromPort": ("startPort", decodeText, "", False),
+        "to": ("end", decodeText, "", True),
+        "toPort": ("endPort", decodeText, "", False),
+        "transmission-capacity": ("transmission_capacity", interpretQuantity, 0, True),
+    },
+    "flow": {
+        "deadline": ("deadline", decodeMilliseconds, 0, False),
+        "jitter": ("jitter", interpretQuantity, 0, False),
+        "max-payload": ("max_payload", decodeBits, 0, False),
+        "name": ("name", decodeText, "", True),
+        "period": ("period", decodeMilliseconds, 0, True),
+        "priority": ("priority", decodePriority, 0, False),
+        "transmission-capacity": (None, interpretQuantity, 0, False),
+        "source": ("source", decodeText, "", True),
+        "redundancy": ("redundancy", decodeText, "Unspecified", False), # Of the flow's targets
+    },
+    "target": {
+        "name": ("name", decodeText, "", True),
+    },
+    "path": {
+        "node": ("node", decodeText, "", True),
+    },
+}
+
+def compileSchema(schema):
+    """ Returns the attributes of a schema as (attribute, argument, decoder, default, required) tuples, text is not decoded """
+    return [(attributeName, argument, None if decoder is decodeText else decoder, default, required)
+            for attributeName, (argument, decoder, default, required) in schema.items()]
+
+compiledSchemas = {tag: compileSchema(schema) for tag, schema in schemas.items()}
+
+class NetworkReader():
+    """ Builds the objects of a network as an expat parser reads the elements describing them
     
-    printIfVerbose("The network has been fully built!")
+    Only the children of the root are built, and the targets and path nodes of flows. Nodes are left as names
+    until resolveNodes is called. Errors are recorded in errors with the line where they were found, so that
+    all the errors of a file are reported at once.
+    """
+    def __init__(self, parser):
+        self.parser = parser
+        self.net = None
+        self.stations = {}
+        self.switches = {}
+        self.links = {}
+        self.flows = {}
+        self.errors = [] # (line, message)
+        self.lines = {} # Link, flow or target -> line of its element
+        self.depth = 0
+        self.flow = None # Flow being read
+        self.redundancy = None # Redundancy of the targets of the flow being read
+        self.target = None # Target being read
+        parser.StartElementHandler = self.startElement
+        parser.EndElementHandler = self.endElement
     
-    return net
+    def addError(self, message, line = None):
+        if line is None:
+            line = self.parser.CurrentLineNumber
+        self.errors.append((line, message))
+    
+    def decode(self, tag, attributes):
+        """ Returns the arguments described by the attributes of an element, decoded with the schema of tag """
+        arguments = {}
+        for attributeName, argument, decoder, default, required in compiledSchemas[tag]:
+            value = attributes.get(attributeName)
+            if value is None:
+                if required:
+                    self.addError("{0} has no {1}".format(tag, attributeName))
+                value = default
+            elif decoder is not None:
+                try:
+                    value = decoder(value)
+                except ValueError:
+                    self.addError("\"{0}\" is not a valid {1} for a {2}".format(value, attributeName, tag))
+                    value = default
+            if argument is not None:
+                arguments[argument] = value
+        return arguments
+    
+    def startElement(self, tag, attributes):
+        self.depth += 1
+        if self.depth == 4:
+            # Any child of a target is the next node of its path
+            if self.target is not None:
+                self.target.path.append(self.decode("path", attributes)["node"])
+        elif self.depth == 3:
+            # Any child of a flow is one of its targets
+            if self.flow is not None:
+                self.startTarget(attributes)
+        elif self.depth == 2:
+            printIfVerbose("Building a {0} called {1}", tag, lambda: attributes.get("name"))
+            if tag == "network":
+                if self.net is None:
+                    self.net = buildNetwork(self.decode(tag, attributes))
+            elif tag == "station":
+                newStation = buildStation(self.decode(tag, attributes))
+                self.stations[newStation.name] = newStation
+            elif tag == "switch":
+                newSwitch = buildSwitch(self.decode(tag, attributes))
+                self.switches[newSwitch.name] = newSwitch
+            elif tag == "link":
+                newLink = buildLink(self.decode(tag, attributes))
+                self.links[newLink.name] = newLink
+                self.lines[newLink] = self.parser.CurrentLineNumber
+            elif tag == "flow":
+                arguments = self.decode(tag, attributes)
+                self.flow = buildFlow(arguments)
+                self.redundancy = arguments["redundancy"]
+                self.flows[self.flow.name] = self.flow
+                self.lines[self.flow] = self.parser.CurrentLineNumber
+    
+    def startTarget(self, attributes):
+        targetStationName = self.decode("target", attributes)["name"]
+        self.target = Classes.Target(targetStationName, self.flow.source, self.flow)
+        if self.redundancy != "Unspecified":
+            self.target.setRedundancy(self.redundancy)
+        self.flow.targets[targetStationName] = self.target
+        self.lines[self.target] = self.parser.CurrentLineNumber
+    
+    def endElement(self, tag):
+        if self.depth == 2:
+            self.flow = None
+        elif self.depth == 3:
+            self.target = None
+        self.depth -= 1
+    
+    def resolveNodes(self):
+        """ Replaces the node names of links and flows by their nodes, recording an error for every unknown name """
+        # As Network.getNode, stations are preferred to switches of the same name
+        nodes = dict(self.switches)
+        nodes.update(self.stations)
+        def resolve(name, line, owner):
+            node = nodes.get(name)
+            if node is None:
+                self.addError("{0} of {1} is not a valid switch or station".format(name, owner), line)
+                return name
+            return node
+        for link in self.links.values():
+            line = self.lines[link]
+            link.start = resolve(link.start, line, link.name)
+            link.end = resolve(link.end, line, link.name)
+        for flow in self.flows.values():
+            flow.source = resolve(flow.source, self.lines[flow], flow.name)
+            for target in flow.targets.values():
+                line = self.lines[target]
+                owner = "the path of {0} to {1}".format(flow.name, target.name)
+                target.target = resolve(target.target, line, owner)
+                target.source = flow.source
+                target.path = [resolve(name, line, owner) for name in target.path]
+
+def buildNetwork(arguments):
+    """ Returns the network described by the arguments of a network element, without any node """
+    return Classes.Network(arguments["name"], arguments["overhead"], arguments["transmission_capacity"], arguments["x_type"])
+
+def buildStation(arguments):
+    """ Returns the station described by the arguments of a station element """
+    return Classes.Station(arguments["name"], arguments["transmission_capacity"], arguments["x"], arguments["y"])
+
+def buildSwitch(arguments):
+    """ Returns the switch described by the arguments of a switch element """
+    newSwitch = Classes.Switch(arguments["name"], arguments["transmission_capacity"], arguments["x"], arguments["y"])
+    if arguments["redundancy"] != "Unspecified":
+        newSwitch.setRedundancy(arguments["redundancy"])
+    return newSwitch
+
+def buildLink(arguments):
+    """ Returns the link described by the arguments of a link element, its ends are left as node names """
+    return Classes.Link(arguments["name"], arguments["start"], arguments["startPort"], arguments["end"], arguments["endPort"], arguments["transmission_capacity"])
+
+def buildFlow(arguments):
+    """ Returns the flow described by the arguments of a flow element, without targets and with its source left as a name """
+    return Classes.Flow(arguments["deadline"], arguments["jitter"], arguments["max_payload"], arguments["name"], arguments["period"], arguments["priority"], arguments["source"])
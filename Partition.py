@@ -0,0 +1,149 @@
+import heapq
+import multiprocessing
+import multiprocessing.connection
+import os
+import traceback
+import Instrumentation
+from Utils import HeapFreeze, printIfVerbose
+
+def findComponents(net):
+    """ Returns the flows of the network grouped into independent components, as lists in the order of net.flows
+
+    Flows only interfere with each other through the links they share, in either direction, see
+    Node.getWorstCaseService, so the delays and backlogs of the ports of a component depend on its own flows
+    only. Flows sharing a link, as assigned by Network.registerFlow, are joined in the same component. Components
+    are ordered by their first flow.
+    """
+    parents = {flow: flow for flow in net.flows.values()}
+    def find(flow):
+        while parents[flow] is not flow:
+            parents[flow] = parents[parents[flow]]
+            flow = parents[flow]
+        return flow
+
+    for link in net.links.values():
+        root = None
+        for flow in link.flows.values():
+            if root is None:
+                root = find(flow)
+            else:
+                other = find(flow)
+                if other is not root:
+                    parents[other] = root
+
+    components = {}
+    for flow in net.flows.values():
+        components.setdefault(find(flow), []).append(flow)
+    return list(components.values())
+
+def groupComponents(components, groups):
+    """ Splits the components into at most groups lists of flows of about the same size, in the order of the components
+
+    The size of a component is the number of hops of the routes of its targets. The largest components are
+    placed first, each one in the group having the fewest hops so far.
+    """
+    def size(component):
+        return sum(len(target.path) + 1 for flow in component for target in flow.targets.values())
+    heap = [(0, group) for group in range(min(groups, len(components)))]
+    members = [[] for group in heap]
+    for index in sorted(range(len(components)), key = lambda index: -size(components[index])):
+        hops, group = heapq.heappop(heap)
+        members[group].append(index)
+        heapq.heappush(heap, (hops + size(components[index]), group))
+    return [[flow for index in sorted(indices) for flow in components[index]] for indices in members]
+
+def analyzeComponents(net, workers = None, solver = None):
+    """ Analyses the independent components of the network in parallel, and returns the merged AnalysisResult
+
+    The components, see findComponents, are split into one group per worker process, and the delays of the
+    targets and the results of the ports of each group are computed in its own process. They are then merged,
+    and the loads and stability of the links are computed in this process. The result is the same as
+    Network.analyze gives, and is stored as it, so that produceXML and analyze reuse it. workers is the number
+    of processes, the number of cores by default. solver selects the analysis engine, the one of the network's configuration if None.
+
+    The worker processes are forked from this one, so that they share the network without copying it. The
+    network is analysed in this process when forking is not available, or when it has a single component.
+    Raises a ValueError if the analysis of a group fails, as a cyclic dependency between ports would.
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    if solver is None:
+        solver = net.getConfig().solver
+    result = net.getState().analysisResults.get(solver)
+    if result is not None:
+        return result
+
+    with Instrumentation.Timer("partition.components"):
+        components = findComponents(net)
+    if workers == 1 or len(components) < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return net.analyze(solver)
+    groups = groupComponents(components, workers)
+    printIfVerbose("{0} has {1} independent components, analysed in {2} processes", net.name, len(components), len(groups))
+
+    # The ports of the links used by a group are computed by its process, the others have no outgoing flow
+    groupOfFlow = {flow: group for group, flows in enumerate(groups) for flow in flows}
+    groupPorts = [[] for flows in groups]
+    for node in list(net.switches.values()) + list(net.stations.values()):
+        for link in node.getLinks():
+            for flow in link.flows.values():
+                groupPorts[groupOfFlow[flow]].append((node, link))
+                break
+
+    with Instrumentation.Timer("partition.workers"):
+        context = multiprocessing.get_context("fork")
+        running = {} # connection -> process
+        # Collections in the workers would go through the whole network, copying all of the memory they share with this process
+        with HeapFreeze():
+            for flows, ports in zip(groups, groupPorts):
+                receiver, sender = context.Pipe(duplex = False)
+                process = context.Process(target = runGroup, args = (net, flows, ports, solver, sender), daemon = True)
+                process.start()
+                sender.close() # Only the worker writes, so that its end is closed if it dies
+                running[receiver] = process
+
+        delays = {}
+        portResults = {}
+        errors = []
+        while running:
+            for receiver in multiprocessing.connection.wait(list(running)):
+                process = running.pop(receiver)
+                try:
+                    outcome = receiver.recv()
+                except EOFError:
+                    outcome = {"status": "crashed", "error": "The worker process exited with code {0}".format(process.exitcode)}
+                receiver.close()
+                process.join()
+                if outcome["status"] == "ok":
+                    delays.update(outcome["delays"])
+                    portResults.update(outcome["ports"])
+                else:
+                    errors.append(outcome["error"])
+    if errors:
+        print("ERROR: The analysis of {0} of the {1} groups of components of {2} failed!".format(len(errors), len(groups), net.name))
+        raise ValueError("\n".join(errors))
+
+    with Instrumentation.Timer("partition.merge"):
+        delays = {flow.name: delays[flow.name] for flow in net.flows.values()}
+        ports = {}
+        for node in list(net.switches.values()) + list(net.stations.values()):
+            nodePorts = {}
+            for link in node.getLinks():
+                portResult = portResults.get((node.name, link.name))
+                if portResult is None:
+                    portResult = net.analyzePort(node, link, solver)
+                nodePorts[link.name] = portResult
+            ports[node.name] = nodePorts
+        return net.completeAnalysis(solver, delays, ports)
+
+def runGroup(net, flows, ports, solver, connection):
+    """ Entry point of the worker processes, sends the delays of the targets of flows and the results of ports through connection """
+    try:
+        # The other flows never share a port with these ones. Engines solving the whole network then solve the group only
+        net.flows = {flow.name: flow for flow in flows}
+        delays = net.analyzeDelays(solver)
+        portResults = {(node.name, link.name): net.analyzePort(node, link, solver) for node, link in ports}
+        outcome = {"status": "ok", "delays": delays, "ports": portResults}
+    except Exception:
+        outcome = {"status": "error", "error": traceback.format_exc()}
+    connection.send(outcome)
+    connection.close()
@@ -0,0 +1,199 @@
+import argparse
+from Classes import Switch
+from Parser import parseXML
+import Instrumentation
+import Utils
+from Utils import ceilWithUnit, createQuantity, printIfVerbose
+
+margin = 1e-9 # Relative margin added to the bounds, so that rounding errors never make them lower than the delays
+
+class DelayBounds():
+    """ Upper bounds of the delays of the ports and targets of a network, computed without analysing it
+
+    The bound of a port is computed once for all its flows, from their arrival curves delayed by the bounds of
+    the ports they went through before, as Node.computeTargetArrivalAffine does. It assumes the worst service
+    any of the port's flows could be given: every flow of the link with a higher priority than the lowest one
+    leaving through the port is subtracted, and switches that store and forward wait for the largest message
+    of the link, see LinkStatistics. It is then at least the delay of the port whichever flow it is computed
+    for. The bound of a target is the sum of the bounds of the ports of its route. Ports depending on
+    themselves, or where the service left is not positive, are unbounded.
+    """
+    def __init__(self, net):
+        self.network = net
+        self.statistics = net.getLinkStatistics()
+        self.checkStability = net.getConfig().checkStability
+        self.portBounds = {} # (node, link) -> bound of its delay
+        self.delaysBefore = {} # (flow, node) -> bound of the delay of flow before it reaches node
+        self.arrivals = {} # flow -> (slope, burst) of its arrival curve at its source
+        self.upstreamPorts = {} # (flow, node) -> port flow goes through before reaching node
+        self.pendingPorts = set() # Ports whose dependencies are being computed
+
+    def getTargetBound(self, target):
+        """ Returns an upper bound of the end to end delay of target, see Target.computeEndToEndDelay """
+        node = target.findPreviousNode(target.path[-1])
+        port = (node, target.findOutgoingLink(node))
+        self.computePorts(port)
+        return self.getDelayBefore(target.parentFlow, node) + self.portBounds[port]
+
+    def computePorts(self, root):
+        """ Computes the bounds of the port root and of all the ports it depends on, each one after its dependencies """
+        if root in self.portBounds:
+            return
+        stack = [(root, self.iterateDependencies(*root))]
+        self.pendingPorts.add(root)
+        while stack:
+            port, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency in self.portBounds or dependency in self.pendingPorts:
+                    continue # A pending port depends on this one, it is left unbounded when reached, see getDelayBefore
+                self.pendingPorts.add(dependency)
+                stack.append((dependency, self.iterateDependencies(*dependency)))
+                break
+            else:
+                stack.pop()
+                self.pendingPorts.discard(port)
+                self.portBounds[port] = self.boundPort(*port)
+
+    def iterateDependencies(self, node, link):
+        """ Yields the ports preceding node in the routes of the flows the bound of the port of node towards link uses """
+        for flow in self.getFlows(node, link):
+            if node != flow.source:
+                yield self.getUpstreamPort(flow, node)
+
+    def getFlows(self, node, link):
+        """ Returns the flows leaving node through link, followed by the flows of link with a higher priority than the lowest of them """
+        direction = "direct" if link.start == node else "inverse"
+        flows = list(link.flowsPerDirection[direction].values())
+        if flows:
+            lowest = min(flow.priority for flow in flows)
+            flows += [flow for flow in link.flows.values() if flow.priority > lowest]
+        return flows
+
+    def getUpstreamPort(self, flow, node):
+        """ Returns the port flow goes through before reaching node, see Flow.findUpstream """
+        port = self.upstreamPorts.get((flow, node))
+        if port is None:
+            previousNode, target = flow.findUpstream(node)
+            port = self.upstreamPorts[(flow, node)] = (previousNode, target.findOutgoingLink(previousNode))
+        return port
+
+    def getArrival(self, flow):
+        """ Returns the slope and burst of the arrival curve of flow at its source
+
+        Delaying a curve only makes its burst grow when neither is negative, which a jitter larger than the
+        period gives. The burst of such a flow is then taken as infinite, leaving the ports it goes through unbounded.
+        """
+        arrival = self.arrivals.get(flow)
+        if arrival is None:
+            curve = flow.computeArrivalAffine()
+            arrival = (curve.m, curve.n) if curve.m >= 0 and curve.n >= 0 else (0, float("inf"))
+            self.arrivals[flow] = arrival
+        return arrival
+
+    def getDelayBefore(self, flow, node):
+        """ Returns the bound of the delay of flow before it reaches node, the sum of the bounds of the ports it went through """
+        chain = [] # Nodes whose delay is not known yet, and the port preceding them
+        while node != flow.source and (flow, node) not in self.delaysBefore:
+            port = self.getUpstreamPort(flow, node)
+            chain.append((node, port))
+            node = port[0]
+        delay = self.delaysBefore.get((flow, node), 0)
+        for node, port in reversed(chain):
+            # Ports still pending depend on this one, they are in a cycle
+            delay += self.portBounds.get(port, float("inf"))
+            self.delaysBefore[(flow, node)] = delay
+        return delay
+
+    def boundPort(self, node, link):
+        """ Returns the bound of the delay of the port of node towards link, its dependencies being computed """
+        direction = "direct" if link.start == node else "inverse"
+        leaving = link.flowsPerDirection[direction].values()
+        if not leaving:
+            return 0
+        if Utils.getConfig().instrument:
+            Instrumentation.count("screening.ports")
+        lowest = min(flow.priority for flow in leaving)
+        arrivalSlope = 0
+        arrivalBurst = 0
+        for flow in leaving:
+            slope, burst = self.getArrival(flow)
+            arrivalSlope += slope
+            arrivalBurst += burst + slope*self.getDelayBefore(flow, node)
+        serviceSlope = node.transmission_capacity
+        serviceBurst = -node.transmission_capacity*node.tech_latency
+        for flow in link.flows.values():
+            if flow.priority > lowest:
+                slope, burst = self.getArrival(flow)
+                serviceSlope -= slope
+                serviceBurst -= burst + slope*self.getDelayBefore(flow, node)
+        if serviceSlope <= 0 or (self.checkStability and serviceSlope <= arrivalSlope):
+            return float("inf")
+        delay = max(0, arrivalBurst - serviceBurst)/serviceSlope
+        if isinstance(node, Switch) and node.switching_technique == "STORE_AND_FORWARD":
+            delay += self.statistics[link].largestMessage/node.transmission_capacity
+        return ceilWithUnit(delay)*(1 + margin)
+
+def screenDeadlines(net, solver = None):
+    """ Checks the deadline of every flow, analysing only the flows that may miss it
+
+    The end to end delays of the targets are first bounded with DelayBounds, and a flow whose bounds are all
+    within its deadline is safe. The delays of the targets of the other flows are then computed with
+    Target.computeEndToEndDelay, solver selecting the engine, the one of the network's configuration if None. Flows without a deadline
+    are neither bounded nor analysed.
+
+    Only the ports the flows analysed depend on are computed. A port is computed for the first of these flows
+    requesting it, so where flows of different priorities share a port, its delay may differ from the one
+    Network.analyze gives when a safe flow requests it first, see Engine.MemoizedEngine.
+
+    Returns {flow name: report}, in the order of the flows, each report holding:
+        - "deadline": in seconds, 0 if the flow has none
+        - "bound": the largest bound of its targets
+        - "delay": the largest end to end delay of its targets, None if it was not analysed
+        - "slack": the deadline minus the delay, or minus the bound if the flow was not analysed
+        - "status": "safe" if the bounds are within the deadline, "met" or "missed" if the flow was analysed,
+          "none" if the flow has no deadline
+    """
+    reports = {}
+    unsafe = [] # Flows whose bounds exceed their deadline
+    with Instrumentation.Timer("screening.bounds"):
+        bounds = DelayBounds(net)
+        for flow in net.flows.values():
+            if flow.deadline <= 0:
+                reports[flow.name] = {"deadline": flow.deadline, "bound": None, "delay": None, "slack": None, "status": "none"}
+                continue
+            bound = max([bounds.getTargetBound(target) for target in flow.targets.values()], default = 0)
+            reports[flow.name] = {"deadline": flow.deadline, "bound": bound, "delay": None, "slack": flow.deadline - bound, "status": "safe"}
+            if bound > flow.deadline:
+                unsafe.append(flow)
+    printIfVerbose("{0} flows are safe without being analysed, {1} are analysed", lambda: sum(report["status"] == "safe" for report in reports.values()) - len(unsafe), len(unsafe))
+
+    with Instrumentation.Timer("screening.analysis"):
+        for flow in unsafe:
+            report = reports[flow.name]
+            delay = max([target.computeEndToEndDelay(solver) for target in flow.targets.values()], default = 0)
+            report["delay"] = delay
+            report["slack"] = flow.deadline - delay
+            report["status"] = "met" if delay <= flow.deadline else "missed"
+    return reports
+
+def printReport(reports):
+    counts = {}
+    print("{0:<16}{1:>14}{2:>14}{3:>14}{4:>14}  {5}".format("flow", "deadline (s)", "bound (s)", "delay (s)", "slack (s)", "status"))
+    for name, report in reports.items():
+        counts[report["status"]] = counts.get(report["status"], 0) + 1
+        values = [createQuantity(report[column], digits = 4) if report[column] is not None else "-" for column in ["deadline", "bound", "delay", "slack"]]
+        print("{0:<16}{1:>14}{2:>14}{3:>14}{4:>14}  {5}".format(name, *values, report["status"]))
+    print("\n" + ", ".join("{0} {1}".format(count, status) for status, count in counts.items()))
+
+def main(arguments = None):
+    """ Screens the deadlines of the flows of a network and prints the slack of each flow """
+    parser = argparse.ArgumentParser(description = "Checks the deadlines of the flows of a WoPANets network, analysing only the flows that may miss them")
+    parser.add_argument("file", help = "input file")
+    parser.add_argument("--solver", default = None, help = "engine of the flows analysed, Utils.solver by default")
+    args = parser.parse_args(arguments)
+    reports = screenDeadlines(parseXML(args.file), args.solver)
+    printReport(reports)
+    return reports
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import http.client
+import http.server
+import json
+import math
+import os
+import socket
+import socketserver
+import threading
+import traceback
+import urllib.parse
+import Sweep
+from Parser import parseXML
+from Utils import printIfVerbose
+
+defaultPort = 8765
+flowParameters = ["deadline", "jitter", "max_payload", "period", "priority"] # Those of Network.modifyFlow
+
+class QueryError(Exception):
+    """ Query that can't be answered because of what it asks, answered with status and the message of the exception """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class AnalysisServer():
+    """ Keeps parsed and analysed networks in memory and answers queries about them, see handle
+
+    The results of each network are read from its AnalysisResult, so answering a query computes nothing.
+    Queries are answered one at a time, as networks can't be analysed by several threads at once.
+    """
+    def __init__(self):
+        self.networks = {} # name -> Network
+        self.files = {} # name -> file the network was parsed from
+        self.lock = threading.Lock()
+        self.routes = {("GET", "/networks"): self.listNetworks, ("POST", "/networks"): self.loadNetwork,
+                       ("GET", "/delay"): self.getDelay, ("GET", "/backlog"): self.getBacklog,
+                       ("GET", "/load"): self.getLoad, ("POST", "/whatif"): self.evaluateEdit}
+
+    def load(self, path):
+        """ Parses and analyses the network of the file in path, replacing the one of the same name, returns its name """
+        net = parseXML(path)
+        net.analyze()
+        self.networks[net.name] = net
+        self.files[net.name] = path
+        printIfVerbose("{0} loaded from {1}", net.name, path)
+        return net.name
+
+    def handle(self, method, path, query, body = None):
+        """ Answers a query, returns its HTTP status and its answer as a dictionary
+
+        query holds the parameters of the URL and body the JSON document sent with POST queries. Unknown
+        networks, flows, nodes and links are answered with 404, malformed queries with 400, see QueryError.
+        Any other error is answered with 500, its traceback is printed.
+        """
+        route = self.routes.get((method, path))
+        if route is None:
+            return 404, {"error": "{0} {1} is not a valid query".format(method, path)}
+        with self.lock:
+            try:
+                return 200, route(query, body)
+            except QueryError as error:
+                return error.status, {"error": str(error)}
+            except Exception:
+                print("ERROR: {0} {1} failed!\n{2}".format(method, path, traceback.format_exc()))
+                return 500, {"error": "the query failed, see the output of the server"}
+
+    def getNetwork(self, query):
+        """ Returns the network named in the query, which may be left out when a single network is loaded """
+        name = query.get("network")
+        if name is None:
+            if len(self.networks) != 1:
+                raise QueryError(400, "the network parameter is required when {0} networks are loaded".format(len(self.networks)))
+            return next(iter(self.networks.values()))
+        return lookUp(self.networks, name, "network")
+
+    def listNetworks(self, query, body):
+        return {"networks": {name: {"file": self.files[name], "flows": len(net.flows), "stable": net.analyze().stable}
+                             for name, net in self.networks.items()}}
+
+    def loadNetwork(self, query, body):
+        if body is not None and not isinstance(body, dict):
+            raise QueryError(400, "the file to load must be sent as a JSON object")
+        path = (body or {}).get("file", query.get("file"))
+        if path is None:
+            raise QueryError(400, "the file to load is required")
+        if not isinstance(path, str):
+            raise QueryError(400, "the file to load must be a string")
+        if not os.path.isfile(path):
+            raise QueryError(404, "{0} is not a file".format(path))
+        try:
+            return {"network": self.load(path)}
+        except ValueError:
+            raise QueryError(400, "{0} is not a valid network, see the output of the server".format(path))
+
+    def getDelay(self, query, body):
+        """ End to end delay of a target, or of all the targets of a flow """
+        result = self.getNetwork(query).analyze()
+        flowName = requireParameter(query, "flow")
+        delays = lookUp(result.delays, flowName, "flow")
+        if "target" in query:
+            return {"flow": flowName, "target": query["target"], "delay": lookUp(delays, query["target"], "target")}
+        return {"flow": flowName, "delays": dict(delays)}
+
+    def getBacklog(self, query, body):
+        """ Delay, backlog and aggregate arrival of a port, or of all the ports of a node """
+        result = self.getNetwork(query).analyze()
+        nodeName = requireParameter(query, "node")
+        ports = lookUp(result.ports, nodeName, "station or switch")
+        if "link" in query:
+            return {"node": nodeName, "link": query["link"], **lookUp(ports, query["link"], "link")._asdict()}
+        answer = {"node": nodeName, "ports": {linkName: port._asdict() for linkName, port in ports.items()}}
+        if nodeName in result.totalBacklogs:
+            answer["totalBacklog"] = result.totalBacklogs[nodeName]
+        return answer
+
+    def getLoad(self, query, body):
+        """ Loads and usages of a link in both directions, and whether it is stable """
+        result = self.getNetwork(query).analyze()
+        linkName = requireParameter(query, "link")
+        return {"link": linkName, "loads": dict(lookUp(result.loads, linkName, "link")), "usages": dict(result.usages[linkName]),
+                "stable": result.stableLinks[linkName]}
+
+    def evaluateEdit(self, query, body):
+        """ Delays and backlogs that a proposed edit would change, the network is left as it was
+
+        The body is a scenario of Sweep.runSweep, such as {"flows": {name: {"period": 0.004}}}. Only the results
+        depending on the edit are computed, once to apply it and once to undo it, see Network.update. An edit
+        that can't be analysed is answered with 400, its traceback is printed.
+        """
+        net = self.getNetwork(query)
+        checkScenario(net, body)
+        result = net.analyze()
+        delays, backlogs, error = Sweep.analyseScenario(net, body)
+        net.analyze() # So that the next queries are answered without computing anything
+        if error is not None:
+            print("ERROR: The proposed edit could not be analysed!\n" + error)
+            raise QueryError(400, "the proposed edit could not be analysed: " + error.strip().splitlines()[-1])
+
+        changedDelays = []
+        targets = ((flow.name, target.name) for flow in net.flows.values() for target in flow.targets.values())
+        for (flowName, targetName), delay in zip(targets, delays):
+            before = result.delays[flowName][targetName]
+            if delay != before:
+                changedDelays.append({"flow": flowName, "target": targetName, "before": before, "after": delay})
+        changedBacklogs = []
+        ports = ((switch.name, link.name) for switch in net.switches.values() for link in switch.getLinks())
+        for (switchName, linkName), backlog in zip(ports, backlogs):
+            before = result.ports[switchName][linkName].backlog
+            if backlog != before:
+                changedBacklogs.append({"node": switchName, "link": linkName, "before": before, "after": backlog})
+        return {"delays": changedDelays, "backlogs": changedBacklogs}
+
+def lookUp(mapping, name, kind):
+    """ Returns mapping[name], raises a 404 QueryError describing the missing name otherwise """
+    if name not in mapping:
+        raise QueryError(404, "{0} is not a valid {1}".format(name, kind))
+    return mapping[name]
+
+def requireParameter(query, name):
+    if name not in query:
+        raise QueryError(400, "the {0} parameter is required".format(name))
+    return query[name]
+
+def checkScenario(net, scenario):
+    """ Raises a QueryError describing the first part of a what-if scenario that can't be applied to net, see Sweep.runSweep """
+    if not isinstance(scenario, dict):
+        raise QueryError(400, "the proposed edit must be sent as a JSON object")
+    for section, overrides in scenario.items():
+        if section not in ["flows", "links", "nodes"]:
+            raise QueryError(400, "{0} can't be edited, only flows, links and nodes can".format(section))
+        if not isinstance(overrides, dict):
+            raise QueryError(400, "the {0} to edit must be a JSON object".format(section))
+    for name, parameters in scenario.get("flows", {}).items():
+        lookUp(net.flows, name, "flow")
+        if not isinstance(parameters, dict):
+            raise QueryError(400, "the parameters of {0} must be a JSON object".format(name))
+        for parameter, value in parameters.items():
+            if parameter not in flowParameters:
+                raise QueryError(400, "{0} is not a parameter of flows, use one of {1}".format(parameter, flowParameters))
+            requireNumber(value, "the {0} of {1}".format(parameter, name))
+    for name, transmission_capacity in scenario.get("links", {}).items():
+        lookUp(net.links, name, "link")
+        requireNumber(transmission_capacity, "the transmission capacity of " + name)
+    for name, transmission_capacity in scenario.get("nodes", {}).items():
+        if name not in net.stations and name not in net.switches:
+            raise QueryError(404, "{0} is not a valid station or switch".format(name))
+        requireNumber(transmission_capacity, "the transmission capacity of " + name)
+
+def requireNumber(value, description):
+    """ Raises a QueryError unless value is a finite JSON number """
+    if type(value) not in (int, float) or not math.isfinite(value):
+        raise QueryError(400, "{0} must be a number, not {1}".format(description, json.dumps(value)))
+
+def encodeJSON(value):
+    """ Returns value as JSON, with infinite and undefined numbers written as the strings "inf", "-inf" and "nan" """
+    def clean(value):
+        if isinstance(value, float) and not math.isfinite(value):
+            return str(value)
+        if isinstance(value, dict):
+            return {key: clean(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(item) for item in value]
+        return value
+    return json.dumps(clean(value)).encode()
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """ Passes the HTTP requests to the AnalysisServer of the server, answers are sent as JSON """
+    protocol_version = "HTTP/1.1" # Connections are kept open between queries
+    disable_nagle_algorithm = True # Otherwise the body of each answer waits for the acknowledgement of its headers
+
+    def do_GET(self):
+        self.respond("GET")
+
+    def do_POST(self):
+        self.respond("POST")
+
+    def respond(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        query = {name: values[-1] for name, values in urllib.parse.parse_qs(url.query).items()}
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The end of the body is not known, so the connection can't be used for another query
+            self.close_connection = True
+            status, answer = 400, {"error": "the Content-Length header is not valid"}
+        else:
+            try:
+                body = json.loads(self.rfile.read(length)) if length else None
+            except ValueError:
+                status, answer = 400, {"error": "the body is not valid JSON"}
+            else:
+                status, answer = self.server.analysis.handle(method, url.path, query, body)
+        data = encodeJSON(answer)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Clients of Unix sockets have no address
+        return str(self.client_address[0]) if self.client_address else "local"
+
+    def log_message(self, format, *arguments):
+        printIfVerbose("{0}: {1}", self.address_string(), lambda: format % arguments)
+
+class UnixRequestHandler(RequestHandler):
+    disable_nagle_algorithm = False # Unix sockets don't use it
+
+class HTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def createServer(analysis, port = defaultPort, socketPath = None):
+    """ Returns the HTTP server answering the queries of analysis, on the Unix socket socketPath if given, on the loopback port otherwise """
+    if socketPath is not None:
+        if os.path.exists(socketPath):
+            os.remove(socketPath) # Left by a previous server
+        server = UnixHTTPServer(socketPath, UnixRequestHandler)
+    else:
+        server = HTTPServer(("127.0.0.1", port), RequestHandler)
+    server.analysis = analysis
+    return server
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """ HTTPConnection to a server listening on a Unix socket """
+    def __init__(self, socketPath, timeout = None):
+        super().__init__("localhost", timeout = timeout)
+        self.socketPath = socketPath
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socketPath)
+
+def query(connection, path, parameters = None, body = None):
+    """ Sends a query through an open connection to the server, returns its HTTP status and its answer
+
+    The query is a POST if body is given, it is then sent as JSON
+    """
+    if parameters:
+        path += "?" + urllib.parse.urlencode(parameters)
+    if body is None:
+        connection.request("GET", path)
+    else:
+        connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+def main(arguments = None):
+    """ Loads the given networks and answers queries about them until the program is stopped """
+    parser = argparse.ArgumentParser(description = "Keeps analysed WoPANets networks in memory and answers queries about them over HTTP")
+    parser.add_argument("files", nargs = "*", help = "input files analysed at start, more can be loaded with POST /networks")
+    parser.add_argument("--port", type = int, default = defaultPort, help = "loopback port the server listens on")
+    parser.add_argument("--socket", default = None, help = "Unix socket the server listens on instead of the port")
+    args = parser.parse_args(arguments)
+
+    analysis = AnalysisServer()
+    for path in args.files:
+        analysis.load(path)
+    server = createServer(analysis, args.port, args.socket)
+    print("Serving {0} networks on {1}, press Ctrl+C to stop".format(len(analysis.networks), args.socket or "127.0.0.1:{0}".format(args.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
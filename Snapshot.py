@@ -0,0 +1,382 @@
+import argparse
+import array
+import json
+import mmap
+import struct
+import sys
+import Classes
+import Engine
+from Utils import CollectionPause, printIfVerbose
+
+# A snapshot is the magic string, the length of a JSON header, the header, and the arrays it describes
+magic = b"WOPANETS"
+version = 2
+alignment = 8 # Arrays start at multiples of this, so they can be cast in place in the mapped file
+
+class SnapshotWriter():
+    """ Gathers the arrays of a snapshot and writes them after their JSON header """
+    def __init__(self):
+        self.strings = {} # string -> id
+        self.sections = {} # name -> {"kind", "typecode", "offset", "count"}
+        self.blocks = []
+        self.size = 0
+
+    def addArray(self, name, typecode, values, kind = "int"):
+        """ Adds an array of numbers stored with the given array typecode """
+        data = array.array(typecode, values).tobytes()
+        self.sections[name] = {"kind": kind, "typecode": typecode, "offset": self.size, "count": len(values)}
+        padding = -len(data) % alignment
+        self.blocks.append(data + bytes(padding))
+        self.size += len(data) + padding
+
+    def addColumn(self, name, values):
+        """ Adds a column of values of any type, which are read back with the same types
+
+        Integers and floats are stored as numbers, the integers of a column of floats being listed aside.
+        Strings are stored as ids in the table of strings, anything else as JSON strings.
+        """
+        if all(type(value) is int for value in values):
+            self.addArray(name, "q", values)
+        elif all(type(value) is int or isinstance(value, float) for value in values):
+            self.addArray(name, "d", [float(value) for value in values], "float")
+            self.addArray(name + ".ints", "q", [i for i, value in enumerate(values) if type(value) is int])
+        elif all(type(value) is str for value in values):
+            self.addArray(name, "q", [self.getStringId(value) for value in values], "str")
+        else:
+            self.addArray(name, "q", [self.getStringId(json.dumps(value)) for value in values], "json")
+
+    def addLists(self, name, lists):
+        """ Adds lists of integers as the offsets of each list and their concatenated values """
+        offsets = [0]
+        values = []
+        for items in lists:
+            values.extend(items)
+            offsets.append(len(values))
+        self.addArray(name + ".offsets", "q", offsets)
+        self.addArray(name, "q", values)
+
+    def getStringId(self, string):
+        stringId = self.strings.get(string)
+        if stringId is None:
+            stringId = len(self.strings)
+            self.strings[string] = stringId
+        return stringId
+
+    def write(self, path, header):
+        """ Writes the snapshot to the file given by path, header being extra JSON data """
+        if any("\0" in string for string in self.strings):
+            print("ERROR: Names can't contain null characters!")
+            raise ValueError
+        self.addArray("strings", "B", "\0".join(self.strings).encode("utf-8"))
+        header = dict(header, version = version, byteorder = sys.byteorder, stringCount = len(self.strings), sections = self.sections)
+        headerData = json.dumps(header).encode("utf-8")
+        headerData += b" "*(-(len(magic) + 8 + len(headerData)) % alignment)
+        with open(path, "wb") as snapshotFile:
+            snapshotFile.write(magic)
+            snapshotFile.write(struct.pack("<Q", len(headerData)))
+            snapshotFile.write(headerData)
+            for block in self.blocks:
+                snapshotFile.write(block)
+
+class SnapshotReader():
+    """ Reads the arrays of a snapshot from the memory mapped file, see readArray """
+    def __init__(self, view):
+        if bytes(view[:len(magic)]) != magic:
+            print("ERROR: The file is not a network snapshot!")
+            raise ValueError
+        headerLength = struct.unpack("<Q", view[len(magic):len(magic) + 8])[0]
+        self.dataStart = len(magic) + 8 + headerLength
+        self.header = json.loads(bytes(view[len(magic) + 8:self.dataStart]))
+        if self.header["version"] != version:
+            print("ERROR: The snapshot has version {0}, only version {1} can be read!".format(self.header["version"], version))
+            raise ValueError
+        if self.header["byteorder"] != sys.byteorder:
+            print("ERROR: The snapshot was written on a machine with a different byte order!")
+            raise ValueError
+        self.view = view
+        self.strings = [] # Read before any string column
+        if self.header["stringCount"]:
+            self.strings = bytes(self.readArray("strings")).decode("utf-8").split("\0")
+
+    def readArray(self, name):
+        """ Returns the numbers of an array as a list, or the bytes of the strings
+
+        The array is cast in place in the mapped file, without decoding it, and copied to the list in a single
+        call. Each number is used once to build the network, which indexing the mapped file would only slow down.
+        """
+        section = self.header["sections"][name]
+        start = self.dataStart + section["offset"]
+        end = start + section["count"]*array.array(section["typecode"]).itemsize
+        with self.view[start:end] as data:
+            if section["typecode"] == "B":
+                return bytes(data)
+            with data.cast(section["typecode"]) as values:
+                return values.tolist()
+
+    def readColumn(self, name):
+        """ Returns the values of a column added with SnapshotWriter.addColumn """
+        values = self.readArray(name)
+        kind = self.header["sections"][name]["kind"]
+        if kind == "float":
+            for i in self.readArray(name + ".ints"):
+                values[i] = int(values[i])
+        elif kind == "str":
+            strings = self.strings
+            values = [strings[i] for i in values]
+        elif kind == "json":
+            decoded = {i: json.loads(self.strings[i]) for i in set(values)}
+            values = [decoded[i] for i in values]
+        return values
+
+    def readLists(self, name):
+        """ Returns the lists of integers added with SnapshotWriter.addLists """
+        offsets = self.readArray(name + ".offsets")
+        values = self.readArray(name)
+        return [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+def saveSnapshot(net, path, includeResults = False):
+    """ Writes the network to the file given by path as a binary snapshot, which loadSnapshot reads back
+
+    Nodes, links, flows and routes are stored as arrays of numbers, nodes, links and flows being referred to by
+    their position, with the state built while the paths were checked, so loading doesn't have to check them
+    again. If includeResults is True, the results computed so far for the ports and the outputs of the flows
+    are stored too, so the loaded network doesn't have to compute them again. A network with incorrect paths is
+    refused with a ValueError, as parseXML refuses it.
+    """
+    writer = SnapshotWriter()
+    stations = list(net.stations.values())
+    switches = list(net.switches.values())
+    nodes = stations + switches
+    links = list(net.links.values())
+    flows = list(net.flows.values())
+    targets = [target for flow in flows for target in flow.targets.values()]
+    nodeIds = {node: i for i, node in enumerate(nodes)}
+    linkIds = {link: i for i, link in enumerate(links)}
+    flowIds = {flow: i for i, flow in enumerate(flows)}
+
+    errors = [target.checkPath()[0] for target in targets] # Leaves the network as it was
+    if any(error is not None for error in errors):
+        # The network could not have been parsed, and can't be analysed
+        for target, error in zip(targets, errors):
+            if error is not None:
+                print("ERROR: the path of {0} to {1} was not built correctly, {2}!".format(target.parentFlow.name, target.name, error))
+        raise ValueError
+
+    for attribute in ["name", "service_policy", "transmission_capacity", "x", "y", "tech_latency"]:
+        writer.addColumn("node." + attribute, [getattr(node, attribute) for node in nodes])
+    for attribute in ["switching_technique", "buffer", "redundancy"]:
+        writer.addColumn("switch." + attribute, [getattr(switch, attribute, None) for switch in switches])
+
+    for attribute in ["name", "startPort", "endPort", "transmission_capacity"]:
+        writer.addColumn("link." + attribute, [getattr(link, attribute) for link in links])
+    writer.addArray("link.start", "q", [nodeIds[link.start] for link in links])
+    writer.addArray("link.end", "q", [nodeIds[link.end] for link in links])
+    writer.addLists("link.flows", [[flowIds[flow] for flow in link.flows.values()] for link in links])
+    for direction in ["direct", "inverse"]:
+        writer.addLists("link." + direction, [[flowIds[flow] for flow in link.flowsPerDirection[direction].values()] for link in links])
+
+    for attribute in ["deadline", "jitter", "max_payload", "min_payload", "name", "period", "priority"]:
+        writer.addColumn("flow." + attribute, [getattr(flow, attribute) for flow in flows])
+    writer.addArray("flow.source", "q", [nodeIds[flow.source] for flow in flows])
+    writer.addArray("flow.targets", "q", [len(flow.targets) for flow in flows])
+
+    writer.addColumn("target.key", [key for flow in flows for key in flow.targets])
+    writer.addColumn("target.name", [target.name for target in targets])
+    writer.addColumn("target.redundancy", [target.redundancy for target in targets])
+    writer.addColumn("target.error", errors)
+    writer.addArray("target.target", "q", [nodeIds[target.target] for target in targets])
+    writer.addArray("target.source", "q", [nodeIds[target.source] for target in targets])
+    writer.addLists("target.path", [[nodeIds[node] for node in target.path] for target in targets])
+    writer.addLists("target.links", [[linkIds[link] for link in target.linkDirections] for target in targets])
+    writer.addArray("target.inverse", "b", [direction == "inverse" for target in targets for direction in target.linkDirections.values()])
+
+    header = {"network": {"name": net.name, "overhead": net.overhead, "transmission_capacity": net.transmission_capacity,
+                          "x_type": net.x_type, "shortest_path_policy": net.shortest_path_policy, "technology": net.technology},
+              "stationCount": len(stations), "results": includeResults}
+    if includeResults:
+        saveResults(net, writer, header, nodes, nodeIds, linkIds, flowIds)
+    writer.write(path, header)
+
+def saveResults(net, writer, header, nodes, nodeIds, linkIds, flowIds):
+    """ Adds the results of the ports, the flows they were computed for and the outputs of the engine of the network's state to the snapshot """
+    state = net.getState()
+    ports = [(node, link) for node in nodes for link in node.getLinks() if state.delayBounds.get((node, link), -1) >= 0]
+    writer.addArray("port.node", "q", [nodeIds[node] for node, link in ports])
+    writer.addArray("port.link", "q", [linkIds[link] for node, link in ports])
+    writer.addColumn("port.delay", [state.delayBounds[port] for port in ports])
+    writer.addColumn("port.arrivalM", [state.totalArrivals[port].m for port in ports])
+    writer.addColumn("port.arrivalN", [state.totalArrivals[port].n for port in ports])
+    writer.addColumn("port.backlog", [state.backlogs[port] for port in ports])
+
+    claims = [(node, link, flow) for (node, link), flow in state.claims.items()]
+    writer.addArray("claim.node", "q", [nodeIds[node] for node, link, flow in claims])
+    writer.addArray("claim.link", "q", [linkIds[link] for node, link, flow in claims])
+    writer.addArray("claim.flow", "q", [flowIds[flow] for node, link, flow in claims])
+    diverged = list(state.divergedPorts.items())
+    writer.addArray("diverged.node", "q", [nodeIds[node] for (node, link), origin in diverged])
+    writer.addArray("diverged.link", "q", [linkIds[link] for (node, link), origin in diverged])
+    writer.addArray("diverged.originNode", "q", [nodeIds[origin[0]] for port, origin in diverged])
+    writer.addArray("diverged.originLink", "q", [linkIds[origin[1]] for port, origin in diverged])
+
+    # The engine of the network's solver is preferred, the recursive engine keeps no outputs
+    outputs = []
+    ranks = []
+    header["nextRank"] = 0
+    engines = sorted(state.engines.items(), key = lambda item: item[0] != net.getConfig().solver)
+    for solver, engine in engines:
+        if isinstance(engine, Engine.MemoizedEngine):
+            outputs = [(key, output) for key, output in engine.getOutputs().items() if state.delayBounds.get(key[:2], -1) >= 0]
+            ranks = list(engine.portRanks.items())
+            header["nextRank"] = engine.nextRank
+            break
+    writer.addArray("output.node", "q", [nodeIds[node] for (node, link, flow), output in outputs])
+    writer.addArray("output.link", "q", [linkIds[link] for (node, link, flow), output in outputs])
+    writer.addArray("output.flow", "q", [flowIds[flow] for (node, link, flow), output in outputs])
+    writer.addColumn("output.arrivalM", [output.outputArrival.m for key, output in outputs])
+    writer.addColumn("output.arrivalN", [output.outputArrival.n for key, output in outputs])
+    writer.addColumn("output.delay", [output.delay for key, output in outputs])
+    writer.addArray("rank.node", "q", [nodeIds[node] for (node, link), rank in ranks])
+    writer.addArray("rank.link", "q", [linkIds[link] for (node, link), rank in ranks])
+    writer.addArray("rank.value", "q", [rank for port, rank in ranks])
+
+def loadSnapshot(path, solver = None):
+    """ Returns the network stored in the snapshot file given by path, see saveSnapshot
+
+    The arrays are copied from the memory mapped file without decoding them, see SnapshotReader. The stored
+    results, if any, are given to the engine of solver, the one of the configuration in use if None, see
+    Utils.getConfig.
+    """
+    with open(path, "rb") as snapshotFile:
+        mapped = mmap.mmap(snapshotFile.fileno(), 0, access = mmap.ACCESS_READ)
+    try:
+        with CollectionPause(), memoryview(mapped) as view:
+            net = buildNetwork(SnapshotReader(view), solver)
+    finally:
+        mapped.close()
+    printIfVerbose("The network has been loaded from {0}!", path)
+    return net
+
+def buildNetwork(reader, solver):
+    """ Builds the network stored in the snapshot read by reader """
+    header = reader.header
+    networkHeader = header["network"]
+    net = Classes.Network(networkHeader["name"], networkHeader["overhead"], networkHeader["transmission_capacity"], networkHeader["x_type"],
+                          networkHeader["shortest_path_policy"], networkHeader["technology"])
+
+    nodes = []
+    stationCount = header["stationCount"]
+    nodeColumns = [reader.readColumn("node." + attribute) for attribute in ["name", "service_policy", "transmission_capacity", "x", "y", "tech_latency"]]
+    switchColumns = [reader.readColumn("switch." + attribute) for attribute in ["switching_technique", "buffer", "redundancy"]]
+    for i, (name, service_policy, transmission_capacity, x, y, tech_latency) in enumerate(zip(*nodeColumns)):
+        if i < stationCount:
+            node = Classes.Station(name, transmission_capacity, x, y, service_policy, tech_latency)
+            net.stations[name] = node
+        else:
+            switching_technique, buffer_size, redundancy = (column[i - stationCount] for column in switchColumns)
+            node = Classes.Switch(name, transmission_capacity, x, y, switching_technique, service_policy, tech_latency, buffer_size)
+            if redundancy is not None:
+                node.setRedundancy(redundancy)
+            net.switches[name] = node
+        node.setNetwork(net)
+        nodes.append(node)
+
+    links = []
+    linkColumns = [reader.readColumn("link." + attribute) for attribute in ["name", "startPort", "endPort", "transmission_capacity"]]
+    for (name, startPort, endPort, transmission_capacity), start, end in zip(zip(*linkColumns), reader.readArray("link.start"), reader.readArray("link.end")):
+        link = Classes.Link(name, nodes[start], startPort, nodes[end], endPort, transmission_capacity)
+        link.setNetwork(net)
+        net.links[name] = link
+        links.append(link)
+
+    flows = []
+    flowColumns = [reader.readColumn("flow." + attribute) for attribute in ["deadline", "jitter", "max_payload", "min_payload", "name", "period", "priority"]]
+    for (deadline, jitter, max_payload, min_payload, name, period, priority), source in zip(zip(*flowColumns), reader.readArray("flow.source")):
+        flow = Classes.Flow(deadline, jitter, max_payload, name, period, priority, nodes[source], min_payload)
+        flow.setNetwork(net)
+        net.flows[name] = flow
+        flows.append(flow)
+
+    targetFlows = [flow for flow, count in zip(flows, reader.readArray("flow.targets")) for i in range(count)]
+    directionNames = ("direct", "inverse")
+    inverse = reader.readArray("target.inverse")
+    linkOffsets = reader.readArray("target.links.offsets")
+    targetLinks = reader.readArray("target.links")
+    targetColumns = [reader.readColumn("target." + attribute) for attribute in ["key", "name", "redundancy", "error"]]
+    targetColumns += [reader.readArray("target.target"), reader.readArray("target.source"), reader.readLists("target.path")]
+    pathErrors = 0
+    for i, (flow, (key, name, redundancy, error, targetNode, source, path)) in enumerate(zip(targetFlows, zip(*targetColumns))):
+        target = Classes.Target(nodes[targetNode], nodes[source], flow, redundancy)
+        target.name = name
+        target.path = [nodes[node] for node in path]
+        target.setNetwork(net)
+        target.freezeRoute()
+        start, end = linkOffsets[i], linkOffsets[i + 1]
+        target.linkDirections = dict(zip([links[link] for link in targetLinks[start:end]], [directionNames[flag] for flag in inverse[start:end]]))
+        flow.targets[key] = target
+        if error is not None:
+            print("ERROR: the path of {0} to {1} was not built correctly, {2}!".format(flow.name, name, error))
+            pathErrors += 1
+    if pathErrors:
+        raise ValueError # Written before saveSnapshot refused such networks
+
+    linkFlows = reader.readLists("link.flows")
+    directFlows = reader.readLists("link.direct")
+    inverseFlows = reader.readLists("link.inverse")
+    for link, flowIds, directIds, inverseIds in zip(links, linkFlows, directFlows, inverseFlows):
+        link.flows = {flows[i].name: flows[i] for i in flowIds}
+        link.flowsPerDirection = {"direct": {flows[i].name: flows[i] for i in directIds}, "inverse": {flows[i].name: flows[i] for i in inverseIds}}
+
+    net.buildTopologyIndex()
+    net.initializeNodes()
+    if header["results"]:
+        loadResults(net, reader, solver, nodes, links, flows)
+    return net
+
+def loadResults(net, reader, solver, nodes, links, flows):
+    """ Restores the results stored by saveResults in the network's state """
+    state = net.getState()
+    portColumns = [reader.readColumn("port." + attribute) for attribute in ["delay", "arrivalM", "arrivalN", "backlog"]]
+    for node, link, delay, arrivalM, arrivalN, backlog in zip(reader.readArray("port.node"), reader.readArray("port.link"), *portColumns):
+        port = (nodes[node], links[link])
+        state.delayBounds[port] = delay
+        state.totalArrivals[port] = Classes.AffineCurve(arrivalM, arrivalN)
+        state.backlogs[port] = backlog
+    for node, link, flow in zip(reader.readArray("claim.node"), reader.readArray("claim.link"), reader.readArray("claim.flow")):
+        state.claims[(nodes[node], links[link])] = flows[flow]
+    for node, link, originNode, originLink in zip(*[reader.readArray("diverged." + name) for name in ["node", "link", "originNode", "originLink"]]):
+        state.divergedPorts[(nodes[node], links[link])] = (nodes[originNode], links[originLink])
+
+    engine = net.getEngine(solver)
+    if not isinstance(engine, Engine.MemoizedEngine):
+        return # The recursion only uses the results of the ports
+    outputs = {}
+    outputColumns = [reader.readColumn("output." + attribute) for attribute in ["arrivalM", "arrivalN", "delay"]]
+    for node, link, flow, arrivalM, arrivalN, delay in zip(reader.readArray("output.node"), reader.readArray("output.link"),
+                                                           reader.readArray("output.flow"), *outputColumns):
+        port = (nodes[node], links[link])
+        outputs[(*port, flows[flow])] = Classes.FlowOutput(Classes.AffineCurve(arrivalM, arrivalN), delay,
+                                                           state.totalArrivals[port], state.backlogs[port])
+    portRanks = {(nodes[node], links[link]): rank for node, link, rank in zip(reader.readArray("rank.node"), reader.readArray("rank.link"),
+                                                                               reader.readArray("rank.value"))}
+    engine.loadOutputs(outputs, portRanks, reader.header["nextRank"])
+
+def main(arguments = None):
+    """ Writes the snapshot of a network given in the WoPANets input format """
+    from Parser import parseXML
+    parser = argparse.ArgumentParser(description = "Writes a binary snapshot of a network, which Snapshot.loadSnapshot reads much faster than the XML file")
+    parser.add_argument("input", help = "network in the WoPANets input format")
+    parser.add_argument("output", help = "file the snapshot is written to")
+    parser.add_argument("--results", action = "store_true", help = "analyse the network and store its results too")
+    args = parser.parse_args(arguments)
+    net = parseXML(args.input)
+    if args.results:
+        for flow in net.flows.values():
+            for target in flow.targets.values():
+                target.computeEndToEndDelay()
+        for switch in net.switches.values():
+            for link in switch.getLinks():
+                switch.getBacklog(link)
+    saveSnapshot(net, args.output, args.results)
+
+if __name__ == "__main__":
+    main()
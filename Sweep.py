@@ -0,0 +1,145 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import traceback
+import Utils
+
+def runSweep(net, scenarios, workers = None):
+    """ Analyses the network under each scenario of a list of parameter overrides, returns a table with the results of each one
+
+    A scenario is a dictionary that may contain:
+        - "flows": {flow name: {parameter: value}}, the parameters being those of Network.modifyFlow
+        - "links": {link name: transmission capacity}
+        - "nodes": {station or switch name: transmission capacity}
+    Values are given in the units of the classes' constructors, an empty scenario gives the results of the network itself.
+
+    The network is analysed once. Each scenario is then analysed in a process forked from this one, which
+    applies the overrides to its copy of the analysed network with the mutation API of Network, so only the
+    results that depend on them are computed again, see Network.update. Up to workers scenarios are analysed
+    at the same time, the number of cores by default. Where processes can't be forked, the scenarios are
+    applied and undone one after the other in this process. The network is left as it was given.
+
+    Returns a dictionary with:
+        - "targets": the (flow name, target name) of each delay column
+        - "ports": the (switch name, link name) of each backlog column
+        - "delays" and "backlogs": a row for each scenario, None if the scenario failed
+        - "errors": None for each scenario that succeeded, the error otherwise
+    """
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+
+    # Analysing the network before forking saves each scenario from doing it
+    collectResults(net)
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        rows = forkScenarios(net, scenarios, workers)
+    else:
+        rows = [analyseScenario(net, overrides) for overrides in scenarios]
+
+    return {"targets": [(flow.name, target.name) for flow in net.flows.values() for target in flow.targets.values()],
+            "ports": [(switch.name, link.name) for switch in net.switches.values() for link in switch.getLinks()],
+            "delays": [row[0] for row in rows], "backlogs": [row[1] for row in rows], "errors": [row[2] for row in rows]}
+
+def forkScenarios(net, scenarios, workers):
+    """ Analyses each scenario in its own forked process, up to workers at the same time, returns their rows in order """
+    context = multiprocessing.get_context("fork")
+    rows = [None]*len(scenarios)
+    pending = list(reversed(range(len(scenarios))))
+    running = {} # connection -> (process, scenario index)
+    # Objects the garbage collector doesn't visit are only copied by the processes that change them
+    with Utils.HeapFreeze():
+        try:
+            while pending or running:
+                while pending and len(running) < workers:
+                    index = pending.pop()
+                    receiver, sender = context.Pipe(duplex = False)
+                    process = context.Process(target = runScenario, args = (net, scenarios[index], sender), daemon = True)
+                    process.start()
+                    sender.close() # Only the scenario's process writes, so that its end is closed if it dies
+                    running[receiver] = (process, index)
+
+                for receiver in multiprocessing.connection.wait(list(running)):
+                    process, index = running.pop(receiver)
+                    try:
+                        rows[index] = receiver.recv()
+                    except EOFError:
+                        pass
+                    receiver.close()
+                    process.join()
+                    if rows[index] is None:
+                        rows[index] = (None, None, "The scenario's process exited with code {0}".format(process.exitcode))
+        finally:
+            for process, index in running.values():
+                process.terminate()
+    return rows
+
+def runScenario(net, overrides, connection):
+    """ Entry point of the scenario processes, sends the delays, backlogs and error of the scenario through connection """
+    try:
+        applyOverrides(net, overrides, {})
+        delays, backlogs = collectResults(net)
+        row = (delays, backlogs, None)
+    except Exception:
+        row = (None, None, traceback.format_exc())
+    connection.send(row)
+    connection.close()
+
+def analyseScenario(net, overrides):
+    """ Applies the overrides to the network and returns its delays, backlogs and error, then undoes them
+    
+    Used where processes can't be forked
+    """
+    undo = {}
+    try:
+        applyOverrides(net, overrides, undo)
+        delays, backlogs = collectResults(net)
+        error = None
+    except Exception:
+        delays = None
+        backlogs = None
+        error = traceback.format_exc()
+
+    try:
+        applyOverrides(net, undo, {})
+    except Exception:
+        # The results can't be brought back incrementally, they will be computed again from scratch
+        Utils.printIfVerbose("Scenario could not be undone, the network will be analysed again")
+        restoreParameters(net, undo)
+        net.initializeNodes()
+    return delays, backlogs, error
+
+def applyOverrides(net, overrides, undo):
+    """ Applies a scenario to the network, recording in undo the scenario that restores the previous values
+
+    Each value is recorded before it is changed, so undo is complete even if an override fails
+    """
+    for name, parameters in overrides.get("flows", {}).items():
+        flow = net.getFlow(name)
+        undo.setdefault("flows", {})[name] = {parameter: getattr(flow, parameter) for parameter in parameters}
+        net.modifyFlow(name, **parameters)
+    for name, transmission_capacity in overrides.get("links", {}).items():
+        if name in net.links:
+            undo.setdefault("links", {})[name] = net.links[name].transmission_capacity
+        net.setLinkCapacity(name, transmission_capacity)
+    for name, transmission_capacity in overrides.get("nodes", {}).items():
+        node = net.getNode(name)
+        undo.setdefault("nodes", {})[name] = node.transmission_capacity
+        net.setNodeCapacity(name, transmission_capacity)
+
+def restoreParameters(net, undo):
+    """ Sets back the values recorded by applyOverrides without updating any result """
+    for name, parameters in undo.get("flows", {}).items():
+        flow = net.flows[name]
+        for parameter, value in parameters.items():
+            setattr(flow, parameter, value)
+        flow.setNetwork(net)
+    for name, transmission_capacity in undo.get("links", {}).items():
+        net.links[name].transmission_capacity = transmission_capacity
+    for name, transmission_capacity in undo.get("nodes", {}).items():
+        net.getNode(name).transmission_capacity = transmission_capacity
+
+def collectResults(net):
+    """ Returns the end to end delay of every target and the backlog of every switch port of the network """
+    delays = [target.computeEndToEndDelay() for flow in net.flows.values() for target in flow.targets.values()]
+    backlogs = [switch.getBacklog(link) for switch in net.switches.values() for link in switch.getLinks()]
+    return delays, backlogs
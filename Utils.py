@@ -1,10 +1,36 @@
+from collections import namedtuple
+import contextvars
+import gc
+import os
+import re
+import threading
+
+# Default settings, used by analyses given no AnalysisConfig, see getConfig
 verbose = False # Controls printIfVerbose function
 checkStability = False # Controls whether delay and background calculations take into account the link's stability
+solver = "memoized" # Engine used to compute delays and backlogs, one of Engine.solvers
+instrument = False # Controls whether the counters and timers of Instrumentation are updated
+digitsPrecision = 2 # Number of decimal places included in results
+fixedPointTolerance = 1e-9 # Relative change of the delays and bursts below which the fixed point engine considers a port converged, see Engine.FixedPointEngine
+fixedPointIterations = 1000 # Times the fixed point engine computes a port before considering that its delay diverges
+partitionWorkers = 1 # Processes analysing the independent components of each network in parallel, see Partition. 1 analyses the whole network in one process
+
+# Settings of an analysis, with the meaning of the module settings above. Tuples can't be modified, so the same
+# configuration can be shared by any number of networks and threads. Use _replace to derive another one. The
+# settings of the fixed point engine may be left out, they then take the default values above
+AnalysisConfig = namedtuple("AnalysisConfig", ["verbose", "checkStability", "solver", "instrument", "digitsPrecision",
+                                                 "fixedPointTolerance", "fixedPointIterations"],
+                            defaults = [fixedPointTolerance, fixedPointIterations])
+
+activeConfig = contextvars.ContextVar("activeConfig", default = None) # Set by ConfigScope, see getConfig
 
 # Don't touch these parameters
 SIunits = {"G" : 1e9, "M": 1e6, "": 1, "m": 1e-3, "µ": 1e-6}
 # SIUnits ordered by decreasing size
 orderedSI = {k: v for k, v in sorted(SIunits.items(), key=lambda item: item[1], reverse=True)}
+nonNumeric = re.compile(r"[^\d.]+") # Characters ignored by interpretQuantity
+quantities = {} # Cache of interpretQuantity, quantity string -> number
+maxQuantities = 65536 # The cache is emptied beyond this many quantities
 
 def ceilWithUnit(amount, selectUnit = None):
     if selectUnit == "u":
@@ -22,9 +48,101 @@ def ceilWithUnit(amount, selectUnit = None):
             amount = amount*orderedSI[selectUnit]
     return amount
 
-def printIfVerbose(printString):
-    """ Useful to control the program's verbosity and switch between nominal and debugging modes """
-    if verbose:
+def getConfig():
+    """ Returns the AnalysisConfig in use: the one of the innermost ConfigScope, or the module settings outside of any
+    
+    The scopes of each thread and asynchronous task are their own, so analyses run at the same time with different
+    configurations don't interfere. The module settings are read when no scope is open, as when the program is
+    configured by setting them.
+    """
+    config = activeConfig.get()
+    if config is None:
+        config = AnalysisConfig(verbose, checkStability, solver, instrument, digitsPrecision, fixedPointTolerance, fixedPointIterations)
+    return config
+
+class ConfigScope():
+    """ Context manager making config the AnalysisConfig returned by getConfig in its block, nothing changes if config is None """
+    def __init__(self, config):
+        self.config = config
+        self.token = None
+
+    def __enter__(self):
+        if self.config is not None and activeConfig.get() is not self.config:
+            self.token = activeConfig.set(self.config)
+        return self.config
+
+    def __exit__(self, *exception):
+        if self.token is not None:
+            activeConfig.reset(self.token)
+            self.token = None
+        return False
+
+# The garbage collector is shared by all the threads of the process: pauses and freezes are counted, so that
+# the collector is only restored when the last one ends, see CollectionPause and HeapFreeze
+collectorLock = threading.Lock()
+pauses = 0
+collectorEnabled = True # Whether the collector was enabled when the first pause began
+freezes = 0
+
+def resetCollectorLock():
+    """ Gives forked processes a lock of their own, the thread that may hold it in the parent is not copied """
+    global collectorLock
+    collectorLock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child = resetCollectorLock)
+
+class CollectionPause():
+    """ Context manager disabling the garbage collector in its block, used while a network is built
+    
+    None of the objects created can be freed before the network is built, collecting them would only waste time.
+    Collections are paused for every thread of the process, until the last pause ends
+    """
+    def __enter__(self):
+        global pauses, collectorEnabled
+        with collectorLock:
+            if pauses == 0:
+                collectorEnabled = gc.isenabled()
+                gc.disable()
+            pauses += 1
+    
+    def __exit__(self, *exception):
+        global pauses
+        with collectorLock:
+            pauses -= 1
+            if pauses == 0 and collectorEnabled:
+                gc.enable()
+        return False
+
+class HeapFreeze():
+    """ Context manager moving every object to the permanent generation of the garbage collector in its block, see gc.freeze
+
+    Used before forking processes, whose collections would otherwise go through the objects they share with
+    this one and copy their memory. Objects are unfrozen when the last freeze of the process ends
+    """
+    def __enter__(self):
+        global freezes
+        with collectorLock:
+            gc.freeze() # Objects created since an earlier freeze are frozen too
+            freezes += 1
+    
+    def __exit__(self, *exception):
+        global freezes
+        with collectorLock:
+            freezes -= 1
+            if freezes == 0:
+                gc.unfreeze()
+        return False
+
+def printIfVerbose(printString, *arguments):
+    """ Useful to control the program's verbosity and switch between nominal and debugging modes
+    
+    printString is only formatted with the arguments when it is printed, and arguments that are functions
+    are only called then, so that messages cost nothing to build when verbose is False, see getConfig
+    """
+    if getConfig().verbose:
+        if arguments:
+            printString = printString.format(*[argument() if callable(argument) else argument for argument in arguments])
         print(printString)
 
 def interpretQuantity(quantity):
@@ -36,11 +154,21 @@ def interpretQuantity(quantity):
     
     Only characters within SIUnits are processed correctly, all other characters are ignored.
     xxx strings including characters from the SIUnits system can lead to uncontrolled behaviour.
+    Raises a ValueError if the string holds no number. Results are cached, as the same quantities
+    are repeated throughout an input file.
     """
-    a = float(''.join(ele for ele in quantity if ele.isdigit() or ele == '.'))
+    try:
+        return quantities[quantity]
+    except KeyError:
+        pass
+    a = float(nonNumeric.sub("", quantity))
     for unit in SIunits:
         if unit in quantity:
-            return a*SIunits[unit]
+            a = a*SIunits[unit]
+            break
+    if len(quantities) >= maxQuantities:
+        quantities.clear()
+    quantities[quantity] = a
     return a
 
 def createQuantity(amount, digits = 2, omitUnit = False, selectUnit = None):
@@ -84,7 +212,7 @@ def computeTheorem1Delay(arrival, service):
     
     
     # Verify that this is not an unstable situation
-    if service.m <= arrival.m and checkStability:
+    if service.m <= arrival.m and getConfig().checkStability:
         print("ERROR: Arrival rate is {0}bps and service rate is {1}bps, \
         this situation is not stable and the delay is not bounded.".format(createQuantity(arrival.m), createQuantity(service.m)))
         return float("inf")
@@ -109,7 +237,7 @@ def computeTheorem1Backlog(arrival, service):
     
     
     # Verify that this is not an unstable situation
-    if service.m <= arrival.m and checkStability:
+    if service.m <= arrival.m and getConfig().checkStability:
         print("ERROR: Arrival rate is {0}bps and service rate is {1}bps, \
         this situation is not stable and the backlog is not bounded.".format(createQuantity(arrival.m), createQuantity(service.m)))
         return float("inf")
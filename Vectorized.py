@@ -0,0 +1,310 @@
+import numpy as np
+from Classes import AffineCurve, FlowOutput, Switch
+from Engine import TopologicalEngine, findUpstream
+import Utils
+import Instrumentation
+
+class VectorizedEngine(TopologicalEngine):
+    """ Computes the whole network with numpy, one topological layer of output ports at a time
+
+    The outputs are planned as in the topological engine. The slopes of all curves only depend on the flows,
+    so they are summed once while the plan is turned into arrays, and only the bursts, which depend on the
+    delays upstream, are left to compute. Every output and port is assigned the layer following those it
+    depends on, and each layer is then computed at once: aggregate arrival and worst case service bursts
+    through sparse flow x port incidence sums, theorem 1 delays and backlogs, and theorem 2 output bursts.
+    Sums are done in the same order as the other engines, so results match them to the last digit.
+
+    Once the network has been modified, the outputs are taken out of the arrays and the few outputs to compute
+    again are computed one at a time as in the topological engine, see MemoizedEngine.update. Networks where
+    the delay of a port is negative, which is unstable, are also computed as in the topological engine, and so
+    are those where the service slope of a port is zero without checking stability, so that the division by zero
+    raises a ZeroDivisionError as in the other engines.
+    """
+    def __init__(self, state):
+        super().__init__(state)
+        self.rows = {} # (node, link, flow) -> row of the output in the arrays, None once the network is modified
+
+    def computeTargetArrivalAffine(self, node, target):
+        """ Computes target's output arrival affine curve, total delay up to this point, backlog, and total arrival curves incoming to this outgoing port of the node
+
+        See Node.computeTargetArrivalAffine. The whole network is solved on the first request
+        """
+        link = target.findOutgoingLink(node)
+        key = (node, link, target.parentFlow)
+        result = self.outputs.get(key)
+        if result is None:
+            if self.rows is None:
+                return TopologicalEngine.computeTargetArrivalAffine(self, node, target)
+            if not self.rows:
+                with Instrumentation.Timer("engine.solve"):
+                    self.solve(self.getAnalysisOrder() + [(node, target)])
+                if self.rows is None:
+                    return self.outputs[key] # Computed as in the topological engine, see solve
+            elif Utils.getConfig().instrument:
+                Instrumentation.count("cache.hits") # Computed by solve
+            row = self.rows[key]
+            result = FlowOutput(AffineCurve(self.rates[row], float(self.bursts[row])), float(self.cumulativeDelays[row]),
+                                self.state.totalArrivals[(node, link)], self.state.backlogs[(node, link)])
+            self.outputs[key] = result
+        elif Utils.getConfig().instrument:
+            Instrumentation.count("cache.hits")
+        return result
+
+    def update(self, ports, links):
+        """ Computes again the given ports after the network has been modified, see MemoizedEngine.update
+        
+        All the outputs are taken out of the arrays first
+        """
+        self.getOutputs()
+        self.rows = None
+        super().update(ports, links)
+
+    def getOutputs(self):
+        """ Returns the (node, link, flow) -> output dictionary of every output computed so far, taking them out of the arrays """
+        if self.rows:
+            for key, row in self.rows.items():
+                if key not in self.outputs:
+                    node, link, flow = key
+                    self.outputs[key] = FlowOutput(AffineCurve(self.rates[row], float(self.bursts[row])), float(self.cumulativeDelays[row]),
+                                                   self.state.totalArrivals[(node, link)], self.state.backlogs[(node, link)])
+        return self.outputs
+
+    def loadOutputs(self, outputs, portRanks, nextRank):
+        """ See MemoizedEngine.loadOutputs, the outputs missing are then computed one at a time as after an update """
+        self.rows = None
+        super().loadOutputs(outputs, portRanks, nextRank)
+
+    def fork(self, state):
+        """ See MemoizedEngine.fork. An engine that has not solved the network yet is forked as a new one, which still solves it with arrays """
+        if self.rows is not None and not self.rows:
+            return VectorizedEngine(state)
+        return super().fork(state)
+
+    def solve(self, roots):
+        """ Computes all the outputs needed by the given (node, target) pairs """
+        if self.rows is None:
+            return TopologicalEngine.solve(self, roots)
+        with Instrumentation.Timer("engine.plan"):
+            order = self.planOrder(roots)
+        outputCount = len(order)
+
+        # Bursts are read from a single vector holding the output bursts followed by constant bursts,
+        # such as the bursts of the flows at their source
+        constants = []
+        def constant(value):
+            constants.append(value)
+            return -len(constants) # Turned into an index once the number of outputs is known
+
+        rates = []
+        ports = [] # Port of each output
+        upstreams = [] # Burst entering the port for each output, index in the burst vector
+        upstreamRows = [] # Output upstream of each output, outputCount at the source
+        outputLayers = []
+        layerOutputs = []
+
+        portIndexes = {}
+        portDelays = [] # Known delays of ports calculated before, None for ports computed here
+        portClaims = {} # Flow each port computed here is computed for
+        portLayers = []
+        portArrivalSlopes = []
+        portServiceSlopes = []
+        portMessageFactors = [] # Store and forward correction of the service burst, per bit of service slope
+        layerPorts = []
+        layerArrivalSlots = [] # Per layer, port of the slot and burst summed in the aggregate arrival
+        layerServiceSlots = [] # Per layer, port of the slot, burst and its sign in the service
+
+        def getLayer(layers, layer, slotLists):
+            while len(layers) <= layer:
+                layers.append(tuple([] for i in range(slotLists)))
+            return layers[layer]
+
+        for node, target in order:
+            link = target.findOutgoingLink(node)
+            flow = target.parentFlow
+            row = len(rates)
+            self.rows[(node, link, flow)] = row
+            rates.append(flow.computeArrivalAffine().m)
+
+            if node == target.source:
+                upstreams.append(constant(flow.computeArrivalAffine().n))
+                upstreamRows.append(outputCount)
+                layer = 0
+            else:
+                upstreamRow = self.rows[self.getUpstreamKey(node, flow)]
+                upstreams.append(upstreamRow)
+                upstreamRows.append(upstreamRow)
+                layer = outputLayers[upstreamRow] + 1
+
+            port = portIndexes.get((node, link))
+            if port is None:
+                port = len(portDelays)
+                portIndexes[(node, link)] = port
+                if self.state.delayBounds.get((node, link), -1) >= 0:
+                    # Calculated before, only its delay is needed
+                    portDelays.append(self.state.delayBounds[(node, link)])
+                    portLayers.append(0)
+                    portArrivalSlopes.append(0)
+                    portServiceSlopes.append(0)
+                    portMessageFactors.append(0)
+                else:
+                    # This output is the first through the port, the port is computed for its flow
+                    portDelays.append(None)
+                    portClaims[port] = self.state.claims.get((node, link), flow)
+                    portLayers.append(self.planPort(node, link, target, portClaims[port], port, constant, outputLayers, getLayer, layerPorts, layerArrivalSlots, layerServiceSlots, portArrivalSlopes, portServiceSlopes, portMessageFactors))
+            ports.append(port)
+            layer = max(layer, portLayers[port])
+            outputLayers.append(layer)
+            getLayer(layerOutputs, layer, 1)[0].append(row)
+
+        # Constant bursts go after the output bursts
+        bursts = np.zeros(outputCount + len(constants))
+        bursts[outputCount:] = constants[::-1]
+        constantBase = outputCount + len(constants)
+        def toIndexes(references):
+            references = np.array(references, dtype = np.int64)
+            return np.where(references < 0, constantBase + references, references)
+
+        rates = np.array(rates, dtype = float)
+        ports = np.array(ports, dtype = np.int64)
+        upstreams = toIndexes(upstreams)
+        upstreamRows = np.array(upstreamRows, dtype = np.int64)
+        cumulativeDelays = np.zeros(outputCount + 1) # The last entry is the delay before the source
+        delays = np.array([0.0 if delay is None else delay for delay in portDelays])
+        backlogs = np.zeros(len(portDelays))
+        arrivalBursts = np.zeros(len(portDelays))
+        portArrivalSlopes = np.array(portArrivalSlopes, dtype = float)
+        portServiceSlopes = np.array(portServiceSlopes, dtype = float)
+        portMessageFactors = np.array(portMessageFactors, dtype = float)
+
+        checkStability = Utils.getConfig().checkStability
+        zeroService = False # Whether theorem 1 divides by a service slope of zero at a port that is not unstable
+        # Divisions by zero at unstable ports are replaced by infinite results, see computeTheorem1
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            for layer in range(max(len(layerOutputs), len(layerPorts))):
+                if layer < len(layerPorts) and layerPorts[layer][0]:
+                    layerPortIndexes = np.array(layerPorts[layer][0], dtype = np.int64)
+                    arrivalPorts, arrivalBurstIndexes = layerArrivalSlots[layer]
+                    servicePorts, serviceBurstIndexes, serviceSigns = layerServiceSlots[layer]
+                    count = len(layerPortIndexes)
+                    arrivalN = np.bincount(np.array(arrivalPorts, dtype = np.int64), bursts[toIndexes(arrivalBurstIndexes)], count)
+                    serviceN = np.bincount(np.array(servicePorts, dtype = np.int64), np.array(serviceSigns)*bursts[toIndexes(serviceBurstIndexes)], count)
+                    arrivalM = portArrivalSlopes[layerPortIndexes]
+                    serviceM = portServiceSlopes[layerPortIndexes]
+                    serviceN = serviceN - portMessageFactors[layerPortIndexes]*serviceM
+                    zeroService = zeroService or (not checkStability and bool(np.any(serviceM == 0)))
+                    layerDelays, layerBacklogs = computeTheorem1(arrivalM, arrivalN, serviceM, serviceN)
+                    delays[layerPortIndexes] = layerDelays
+                    backlogs[layerPortIndexes] = layerBacklogs
+                    arrivalBursts[layerPortIndexes] = arrivalN
+
+                if layer < len(layerOutputs):
+                    rows = np.array(layerOutputs[layer][0], dtype = np.int64)
+                    rowDelays = delays[ports[rows]]
+                    bursts[rows] = bursts[upstreams[rows]] + rates[rows]*rowDelays
+                    cumulativeDelays[rows] = cumulativeDelays[upstreamRows[rows]] + rowDelays
+
+        # Ports whose delay is negative are computed again for each flow requesting them, which layers can't express,
+        # and the other engines raise a ZeroDivisionError for a service slope of zero, which numpy doesn't report
+        if zeroService or any(delay is None and delays[port] < 0 for port, delay in enumerate(portDelays)):
+            self.rows = None
+            return TopologicalEngine.solve(self, roots)
+
+        # Store the results of the ports computed here in the state, as the other engines do
+        state = self.state
+        for key, port in portIndexes.items():
+            if portDelays[port] is None:
+                state.delayBounds[key] = float(delays[port])
+                state.totalArrivals[key] = AffineCurve(float(portArrivalSlopes[port]), float(arrivalBursts[port]))
+                state.backlogs[key] = float(backlogs[port])
+                state.claims[key] = portClaims[port]
+                self.portRanks[key] = portLayers[port]
+        self.nextRank = max(portLayers, default = -1) + 1
+        if Utils.getConfig().instrument:
+            Instrumentation.count("cache.misses", outputCount)
+            Instrumentation.count("ports.evaluated", sum(1 for delay in portDelays if delay is None))
+
+        self.rates = rates.tolist()
+        self.bursts = bursts
+        self.cumulativeDelays = cumulativeDelays
+
+    def planPort(self, node, link, target, flow, port, constant, outputLayers, getLayer, layerPorts, layerArrivalSlots, layerServiceSlots, portArrivalSlopes, portServiceSlopes, portMessageFactors):
+        """ Records the bursts summed at the port of node towards link, in target's direction, when computed for flow, returns its layer """
+        arrivalSlope = 0
+        arrivalBursts = []
+        for otherFlow in link.getFlowsInSameDirection(target).values():
+            arrival = otherFlow.computeArrivalAffine()
+            arrivalSlope += arrival.m
+            if node == target.source:
+                arrivalBursts.append(constant(arrival.n))
+            else:
+                arrivalBursts.append(self.rows[self.getUpstreamKey(node, otherFlow)])
+
+        service = node.computeServiceAffine()
+        serviceBursts = [constant(service.n)]
+        serviceSigns = [1]
+        for otherFlow in link.flows.values():
+            if otherFlow.priority > flow.priority:
+                arrival = otherFlow.computeArrivalAffine()
+                service.m -= arrival.m
+                if node == otherFlow.source:
+                    serviceBursts.append(constant(arrival.n))
+                else:
+                    serviceBursts.append(self.rows[self.getUpstreamKey(node, otherFlow)])
+                serviceSigns.append(-1)
+
+        maximumMsgSize = 0
+        if isinstance(node, Switch) and node.switching_technique == "STORE_AND_FORWARD":
+            largest, largestFlow, secondLargest = self.getLargestMessages(link)
+            maximumMsgSize = secondLargest if largestFlow == flow else largest
+
+        portArrivalSlopes.append(arrivalSlope)
+        portServiceSlopes.append(service.m)
+        portMessageFactors.append(maximumMsgSize/node.transmission_capacity)
+
+        layer = 0
+        for burst in arrivalBursts + serviceBursts:
+            if burst >= 0:
+                layer = max(layer, outputLayers[burst] + 1)
+        portsOfLayer = getLayer(layerPorts, layer, 1)[0]
+        localPort = len(portsOfLayer)
+        portsOfLayer.append(port)
+        arrivalSlots = getLayer(layerArrivalSlots, layer, 2)
+        for burst in arrivalBursts:
+            arrivalSlots[0].append(localPort)
+            arrivalSlots[1].append(burst)
+        serviceSlots = getLayer(layerServiceSlots, layer, 3)
+        for burst, sign in zip(serviceBursts, serviceSigns):
+            serviceSlots[0].append(localPort)
+            serviceSlots[1].append(burst)
+            serviceSlots[2].append(sign)
+        return layer
+
+    def getUpstreamKey(self, node, flow):
+        """ Returns the key of flow's output at the node preceding node """
+        previousNode, currentTarget = findUpstream(node, flow)
+        return (previousNode, currentTarget.findOutgoingLink(previousNode), flow)
+
+def computeTheorem1(arrivalM, arrivalN, serviceM, serviceN):
+    """ Vectorized computeTheorem1Delay and computeTheorem1Backlog, returns arrays of delays and backlogs
+
+    A service slope of zero gives infinite or undefined results instead of raising, see VectorizedEngine
+    """
+    unstable = (serviceM <= arrivalM) & Utils.getConfig().checkStability
+    for index in np.flatnonzero(unstable):
+        print("ERROR: Arrival rate is {0}bps and service rate is {1}bps, this situation is not stable and the delay is not bounded.".format(Utils.createQuantity(arrivalM[index]), Utils.createQuantity(serviceM[index])))
+
+    burst = arrivalN - serviceN
+    delays = np.where(burst <= 0, 0.0, ceilWithUnit(burst/serviceM))
+    delays[unstable] = float("inf")
+
+    timeMaxBacklog = np.maximum(-serviceN/serviceM, 0)
+    backlogs = timeMaxBacklog*arrivalM + arrivalN
+    backlogs[unstable] = float("inf")
+    return delays, backlogs
+
+def ceilWithUnit(amounts):
+    """ Vectorized Utils.ceilWithUnit without a selected unit """
+    for unit in Utils.orderedSI.values():
+        scaled = amounts/unit
+        amounts = np.where(np.abs(amounts) >= unit, (scaled - scaled%1 + 1)*unit, amounts)
+    return amounts
@@ -0,0 +1,70 @@
+""" Helpers shared by the tests: generated networks, analyses without output and results as plain values """
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import Generator
+import Utils
+from Parser import parseXML, produceXML
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+solvers = ["recursive", "memoized", "topological", "vectorized", "fixedpoint"]
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def quiet():
+    """ Context manager hiding what the analyses print """
+    return contextlib.redirect_stdout(io.StringIO())
+
+def createConfig(solver = "memoized", checkStability = False, **settings):
+    settings = dict({"verbose": False, "instrument": False}, **settings)
+    return Utils.getConfig()._replace(solver = solver, checkStability = checkStability, **settings)
+
+def resultValues(result):
+    """ Returns the delays, ports, loads and stability of an AnalysisResult as plain values, compared through their repr so that nan equals nan """
+    delays = {flow: dict(targets) for flow, targets in result.delays.items()}
+    ports = {node: {link: tuple(port) for link, port in links.items()} for node, links in result.ports.items()}
+    loads = {link: dict(directions) for link, directions in result.loads.items()}
+    return repr((delays, ports, dict(result.totalBacklogs), loads, dict(result.stableLinks)))
+
+class NetworkTestCase(unittest.TestCase):
+    """ Test case writing its networks and results to a temporary folder """
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.folder.name, name)
+
+    def generate(self, name, **options):
+        """ Writes a network of Generator.generateNetwork, returns its path """
+        path = self.path(name)
+        with quiet():
+            Generator.generateNetwork(path, **options)
+        return path
+
+    def parse(self, path, solver = "memoized", checkStability = False):
+        with quiet():
+            return parseXML(path, createConfig(solver, checkStability))
+
+    def analyse(self, path, solver = "memoized", checkStability = False):
+        """ Returns the resultValues of the network of path """
+        net = self.parse(path, solver, checkStability)
+        with quiet():
+            return resultValues(net.analyze())
+
+    def produce(self, net):
+        """ Returns the file written by produceXML for net """
+        path = self.path("results.xml")
+        with quiet():
+            produceXML(net, path)
+        with open(path, "rb") as resultsFile:
+            return resultsFile.read()
+
+    def requireSolver(self, solver):
+        if solver == "vectorized" and numpy is None:
+            self.skipTest("the vectorized engine needs numpy")
@@ -0,0 +1,55 @@
+from tests.common import NetworkTestCase, quiet
+import json
+import multiprocessing
+import os
+import select
+import time
+import unittest
+from unittest import mock
+import Batch
+
+analyseFile = Batch.analyseFile
+
+def analyseOrHang(inputPath, outputDirectory):
+    """ Analyses the file, hangs in a process of its own if it is called slow.xml, and exits if it is called crash.xml """
+    name = os.path.basename(inputPath)
+    if name == "slow.xml":
+        if os.fork() == 0:
+            time.sleep(60) # As a process of Partition would, keeping the pipe of the test open
+            os._exit(0)
+        time.sleep(60)
+    elif name == "crash.xml":
+        os._exit(3)
+    return analyseFile(inputPath, outputDirectory)
+
+@unittest.skipUnless(hasattr(os, "fork") and "fork" in multiprocessing.get_all_start_methods(), "the workers are forked from the test")
+class BatchTest(NetworkTestCase):
+    """ A file failing, crashing or timing out is reported without affecting the others, and a timeout stops the processes of its worker """
+
+    def testOutcomes(self):
+        paths = [self.generate("first.xml", seed = 1), self.path("slow.xml"), self.path("broken.xml"), self.path("crash.xml"),
+                 self.generate("second.xml", seed = 2)]
+        for path in paths[1:4]:
+            with open(path, "w") as brokenFile:
+                brokenFile.write("<network")
+        summaryPath = self.path("summary.json")
+        reader, writer = os.pipe()
+        try:
+            with mock.patch.object(Batch, "analyseFile", analyseOrHang), quiet():
+                summary = Batch.runBatch(paths, self.path("results"), workers = 3, timeout = 3, summaryPath = summaryPath)
+        finally:
+            os.close(writer)
+        # The pipe closes once every process started by the workers exited
+        readable, writable, failed = select.select([reader], [], [], 10)
+        self.assertEqual(readable, [reader])
+        self.assertEqual(os.read(reader, 1), b"")
+        os.close(reader)
+
+        self.assertEqual([outcome["file"] for outcome in summary["files"]], paths)
+        self.assertEqual([outcome["status"] for outcome in summary["files"]], ["ok", "timeout", "error", "crashed", "ok"])
+        self.assertEqual(summary["counts"], {"ok": 2, "timeout": 1, "error": 1, "crashed": 1})
+        self.assertIn("exited with code 3", summary["files"][3]["error"])
+        for outcome in [summary["files"][0], summary["files"][4]]:
+            self.assertTrue(os.path.isfile(outcome["output"]))
+        with open(summaryPath) as summaryFile:
+            self.assertEqual(json.load(summaryFile), summary)
@@ -0,0 +1,102 @@
+from tests.common import NetworkTestCase, quiet
+import os
+import time
+import Batch
+import Cache
+
+class CacheTest(NetworkTestCase):
+    """ Results are reused only for the same file, settings and code, and the cache stays within its size """
+
+    def setUp(self):
+        super().setUp()
+        self.cacheDirectory = self.path("cache")
+        self.outputDirectory = self.path("results")
+
+    def runBatch(self, inputPaths):
+        with quiet():
+            return Batch.runBatch(inputPaths, self.outputDirectory, workers = 1, cacheDirectory = self.cacheDirectory)
+
+    def storeEntry(self, key, size, lastUse):
+        """ Stores a results file of size bytes as the entry of key, last used lastUse seconds ago """
+        outputPath = self.path(key + "_res.xml")
+        with open(outputPath, "wb") as outputFile:
+            outputFile.write(b"0"*size)
+        Cache.store(self.cacheDirectory, key, outputPath)
+        used = time.time() - lastUse
+        os.utime(os.path.join(self.cacheDirectory, key), (used, used))
+
+    def testKeys(self):
+        path = self.generate("network.xml", seed = 1)
+        settings = Batch.getSettings()
+        key = Cache.computeKey(path, settings)
+        self.assertEqual(Cache.computeKey(path, dict(settings)), key)
+        # Settings that don't change the results don't change the key
+        self.assertEqual(Cache.computeKey(path, dict(settings, verbose = not settings["verbose"], partitionWorkers = 4)), key)
+        for name, value in [("solver", "topological"), ("checkStability", not settings["checkStability"]),
+                            ("digitsPrecision", settings["digitsPrecision"] + 1), ("fixedPointIterations", 7)]:
+            with self.subTest(setting = name):
+                self.assertNotEqual(Cache.computeKey(path, dict(settings, **{name: value})), key)
+        other = self.generate("other.xml", seed = 2)
+        self.assertNotEqual(Cache.computeKey(other, settings), key)
+
+    def testHits(self):
+        paths = [self.generate("first.xml", seed = 1), self.generate("second.xml", seed = 2)]
+        summary = self.runBatch(paths)
+        self.assertEqual(summary["counts"], {"ok": 2})
+        self.assertFalse(any(outcome.get("cached") for outcome in summary["files"]))
+        results = {}
+        for outcome in summary["files"]:
+            with open(outcome["output"], "rb") as resultsFile:
+                results[outcome["output"]] = resultsFile.read()
+            os.remove(outcome["output"])
+
+        summary = self.runBatch(paths)
+        self.assertEqual(summary["counts"], {"ok": 2})
+        for outcome in summary["files"]:
+            self.assertTrue(outcome["cached"])
+            with open(outcome["output"], "rb") as resultsFile:
+                self.assertEqual(resultsFile.read(), results[outcome["output"]])
+
+        # A modified file is analysed again
+        self.generate("first.xml", seed = 3)
+        summary = self.runBatch(paths)
+        self.assertEqual([bool(outcome.get("cached")) for outcome in summary["files"]], [False, True])
+
+    def testEviction(self):
+        for index, lastUse in enumerate([40, 10, 30, 20]):
+            self.storeEntry("key{0}".format(index), 1000, lastUse)
+        # Fetching an entry marks it as used
+        self.assertIsNotNone(Cache.fetch(self.cacheDirectory, "key0", self.folder.name))
+        self.assertIsNone(Cache.fetch(self.cacheDirectory, "missing", self.folder.name))
+        self.assertEqual(Cache.evict(self.cacheDirectory, 2500), 2)
+        self.assertEqual(sorted(os.listdir(self.cacheDirectory)), ["key0", "key1"])
+        self.assertEqual(Cache.evict(self.cacheDirectory, 2500), 0)
+
+    def testStaleEntries(self):
+        self.storeEntry("key", 10, 0)
+        for name, age in [("stale.1.tmp", Cache.staleSeconds + 60), ("writing.2.tmp", 0)]:
+            temporary = os.path.join(self.cacheDirectory, name)
+            os.makedirs(temporary)
+            used = time.time() - age
+            os.utime(temporary, (used, used))
+        self.assertEqual(Cache.evict(self.cacheDirectory), 0)
+        # Entries still being stored by another process are left alone
+        self.assertEqual(sorted(os.listdir(self.cacheDirectory)), ["key", "writing.2.tmp"])
+
+    def testWatch(self):
+        watched = self.path("watched")
+        os.makedirs(watched)
+        first = self.generate("watched/first.xml", seed = 1)
+        with quiet():
+            summaries = Batch.watchDirectory(watched, ".xml", self.outputDirectory, 0, workers = 1, cacheDirectory = self.cacheDirectory)
+            self.assertEqual([outcome["file"] for outcome in next(summaries)["files"]], [first])
+
+            second = self.generate("watched/second.xml", seed = 2)
+            self.generate("watched/first.xml", seed = 3)
+            # The file may be rewritten within the same clock tick
+            modified = os.stat(first).st_mtime_ns + 1000000000
+            os.utime(first, ns = (modified, modified))
+            summary = next(summaries)
+        self.assertEqual(sorted(outcome["file"] for outcome in summary["files"]), [first, second])
+        self.assertEqual(summary["counts"], {"ok": 2})
+        self.assertFalse(any(outcome.get("cached") for outcome in summary["files"]))
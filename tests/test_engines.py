@@ -0,0 +1,64 @@
+from tests.common import NetworkTestCase, createConfig, fixtures, quiet, solvers
+import contextlib
+import io
+import os
+from Parser import parseXML
+
+class EngineTest(NetworkTestCase):
+    """ The engines give the results of the recursion of Node.computeTargetArrivalAffine """
+
+    def testSolversMatchRecursion(self):
+        for seed in range(4):
+            path = self.generate("network{0}.xml".format(seed), seed = seed, switches = 5, flows = 60, multicast = 3, highPriorityShare = 0.5)
+            for checkStability in [False, True]:
+                expected = self.analyse(path, "recursive", checkStability)
+                for solver in solvers[1:]:
+                    with self.subTest(seed = seed, checkStability = checkStability, solver = solver):
+                        self.requireSolver(solver)
+                        self.assertEqual(self.analyse(path, solver, checkStability), expected)
+
+    def testUnstablePortsMatchBaseline(self):
+        """ Ports whose delay is negative are computed again for each flow requesting them, as the recursion does
+
+        generated6_results.xml was written by the original recursion, which takes minutes on this network
+        """
+        path = self.generate("generated6.xml", seed = 6, switches = 10, flows = 600, multicast = 4, highPriorityShare = 0.5)
+        with open(os.path.join(fixtures, "generated6_results.xml"), "rb") as fixture:
+            expected = fixture.read()
+        for solver in solvers[1:]:
+            with self.subTest(solver = solver):
+                self.requireSolver(solver)
+                self.assertEqual(self.produce(self.parse(path, solver)), expected)
+
+    def testZeroServiceSlope(self):
+        """ The high priority flow of saturated.xml takes the whole capacity of the switch before the low priority one """
+        path = os.path.join(fixtures, "saturated.xml")
+        expected = self.analyse(path, "recursive", checkStability = True)
+        for solver in solvers:
+            with self.subTest(solver = solver):
+                self.requireSolver(solver)
+                self.assertEqual(self.analyse(path, solver, checkStability = True), expected)
+                with self.assertRaises(ZeroDivisionError), quiet():
+                    self.analyse(path, solver)
+
+    def testVerboseTrace(self):
+        """ The memoized and topological solvers print the trace of the recursion once for each output they compute """
+        path = self.generate("network.xml", seed = 1, switches = 5, flows = 40, multicast = 3, highPriorityShare = 0.5)
+        traces = {}
+        outputs = {} # solver -> outputs its engine computed
+        for solver in ["recursive", "memoized", "topological"]:
+            with quiet():
+                net = parseXML(path, createConfig(solver, verbose = True))
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                net.analyze()
+            traces[solver] = [line for line in output.getvalue().splitlines() if line]
+            if solver != "recursive":
+                outputs[solver] = net.getState().engines[solver].getOutputs()
+        for solver in ["memoized", "topological"]:
+            with self.subTest(solver = solver):
+                calculations = [line for line in traces[solver] if line.startswith("Calculating")]
+                self.assertEqual(len(calculations), len(outputs[solver]))
+                self.assertEqual(set(calculations), set(line for line in traces["recursive"] if line.startswith("Calculating")))
+                # The recursion prints partial aggregates for the ports it computed before
+                self.assertLessEqual(set(traces[solver]), set(traces["recursive"]))
@@ -0,0 +1,69 @@
+from tests.common import NetworkTestCase, fixtures, quiet, resultValues
+import math
+import os
+
+ring = os.path.join(fixtures, "ring.xml")
+
+class FixedPointTest(NetworkTestCase):
+    """ The fixedpoint engine analyses networks whose ports depend on each other """
+
+    def testRing(self):
+        """ Every flow of the ring crosses four switches, the ports of each switch depend on the previous ones """
+        with self.assertRaises(ValueError):
+            self.analyse(ring, "memoized")
+        net = self.parse(ring, "fixedpoint")
+        with quiet():
+            result = net.analyze()
+        self.assertEqual(net.state.divergedPorts, {})
+        self.assertTrue(all(result.stableLinks.values()))
+        for flow, delays in result.delays.items():
+            for delay in delays.values():
+                self.assertTrue(0 < delay < math.inf)
+        # Lowering the bounds of a converged result can't give a fixed point again
+        self.assertEqual(self.analyse(ring, "fixedpoint"), resultValues(result))
+
+    def testDivergence(self):
+        """ Ports that keep growing are unstable instead of raising """
+        net = self.parse(ring, "fixedpoint")
+        with quiet():
+            for switch in net.switches:
+                net.setNodeCapacity(switch, 2e7)
+            result = net.analyze()
+        self.assertNotEqual(net.state.divergedPorts, {})
+        self.assertFalse(all(result.stableLinks.values()))
+        self.assertEqual(result.delays["VL0"]["ES3"], math.inf)
+
+    def checkUpdates(self, path, edits, prepare = lambda net: None):
+        for name, edit in edits:
+            with self.subTest(edit = name):
+                net = self.parse(path, "fixedpoint")
+                with quiet():
+                    prepare(net)
+                    net.analyze()
+                    edit(net)
+                    updated = resultValues(net.analyze())
+                fresh = self.parse(path, "fixedpoint")
+                with quiet():
+                    prepare(fresh)
+                    edit(fresh)
+                    self.assertEqual(updated, resultValues(fresh.analyze()))
+
+    def testRingUpdates(self):
+        self.checkUpdates(ring, [
+            ("period", lambda net: net.modifyFlow("VL2", period = 1)),
+            ("payload", lambda net: net.modifyFlow("VL3", max_payload = 200)),
+            ("priority", lambda net: net.modifyFlow("VL4", priority = 1)),
+            ("capacity", lambda net: net.setNodeCapacity("S1", 3e7)),
+            ("remove", lambda net: net.removeFlow("VL0")),
+        ])
+
+    def testCyclicUpdates(self):
+        """ A priority raised on a generated network makes its ports depend on each other """
+        path = self.generate("network.xml", seed = 7, switches = 10, flows = 600, multicast = 4, highPriorityShare = 0.5, transmissionCapacity = "1Gbps")
+        raisePriority = lambda net: net.modifyFlow("VL557", priority = 1)
+        self.checkUpdates(path, [("priority", raisePriority)])
+        self.checkUpdates(path, [
+            ("period", lambda net: net.modifyFlow("VL100", period = net.flows["VL100"].period*2)),
+            ("payload", lambda net: net.modifyFlow("VL300", max_payload = 1500)),
+            ("capacity", lambda net: net.setNodeCapacity("S0", 3e8)),
+        ], raisePriority)
@@ -0,0 +1,69 @@
+from tests.common import NetworkTestCase, createConfig, quiet
+import multiprocessing
+import unittest
+from unittest import mock
+import Batch
+import Instrumentation
+import Utils
+from Parser import parseXML
+
+class InstrumentationTest(NetworkTestCase):
+    """ Instrumented analyses update the counters and timers, which add up across the files of a batch """
+
+    def setUp(self):
+        super().setUp()
+        Instrumentation.reset()
+        self.addCleanup(Instrumentation.reset)
+
+    def analyseInstrumented(self, path, solver, instrument):
+        Instrumentation.reset()
+        with quiet():
+            net = parseXML(path, createConfig(solver, instrument = instrument))
+            net.analyze()
+        return net, Instrumentation.getReport()
+
+    def testCounters(self):
+        path = self.generate("network.xml", seed = 1, switches = 5, flows = 40, multicast = 3)
+        for solver, counter in [("recursive", "recursive.calls"), ("memoized", "ports.evaluated"), ("topological", "ports.evaluated")]:
+            with self.subTest(solver = solver):
+                net, report = self.analyseInstrumented(path, solver, False)
+                self.assertEqual(report, {"counters": {}, "timers": {}})
+
+                net, report = self.analyseInstrumented(path, solver, True)
+                self.assertGreater(report["counters"][counter], 0)
+                for timer in ["analysis.delays", "analysis.ports", "analysis.loads"]:
+                    self.assertEqual(report["timers"][timer]["calls"], 1)
+                    self.assertGreater(report["timers"][timer]["seconds"], 0)
+
+        # Updating the results after an edit computes ports again
+        with quiet():
+            net.modifyFlow("VL3", max_payload = net.flows["VL3"].max_payload*2)
+            net.analyze()
+        report = Instrumentation.getReport()
+        self.assertGreater(report["counters"]["ports.refreshed"], 0)
+        self.assertEqual(report["timers"]["engine.update"]["calls"], 1)
+
+    def testMergeReports(self):
+        first = {"counters": {"cache.hits": 3, "ports.evaluated": 5}, "timers": {"parse": {"seconds": 0.5, "calls": 1}}}
+        second = {"counters": {"ports.evaluated": 2, "cache.misses": 1},
+                  "timers": {"parse": {"seconds": 0.25, "calls": 1}, "results": {"seconds": 0.125, "calls": 2}}}
+        self.assertEqual(Instrumentation.mergeReports([first, second]),
+                         {"counters": {"cache.hits": 3, "cache.misses": 1, "ports.evaluated": 7},
+                          "timers": {"parse": {"seconds": 0.75, "calls": 2}, "results": {"seconds": 0.125, "calls": 2}}})
+        self.assertEqual(Instrumentation.mergeReports([]), {"counters": {}, "timers": {}})
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "the workers are forked from the test")
+    def testBatchReports(self):
+        paths = [self.generate("first.xml", seed = 1), self.generate("second.xml", seed = 2)]
+        with mock.patch.object(Utils, "instrument", True), quiet():
+            summary = Batch.runBatch(paths, self.path("results"), workers = 2)
+        reports = [outcome["instrumentation"] for outcome in summary["files"]]
+        merged = Instrumentation.mergeReports(reports)
+        for report, path in zip(reports, paths):
+            # Each worker reports its own file only
+            self.assertEqual(report["counters"], self.analyseInstrumented(path, "memoized", True)[1]["counters"])
+            self.assertEqual(report["timers"]["parse"]["calls"], 1)
+        self.assertEqual(merged["counters"], {name: sum(report["counters"].get(name, 0) for report in reports)
+                                              for name in set().union(*[report["counters"] for report in reports])})
+        self.assertEqual(merged["timers"]["parse"]["calls"], 2)
+        self.assertGreater(merged["counters"]["ports.evaluated"], reports[0]["counters"]["ports.evaluated"])
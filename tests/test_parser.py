@@ -0,0 +1,82 @@
+from tests.common import NetworkTestCase
+from Parser import parseXML
+import contextlib
+import gc
+import io
+
+malformed = """<?xml version="1.0" encoding="UTF-8"?>
+<elements>
+<network name="broken" overhead="67" transmission-capacity="100Mbps" x-type="AFDX"/>
+<station name="ES0" transmission-capacity="100Mbps"/>
+<station name="ES1" transmission-capacity="fast"/>
+<switch name="S0"/>
+<link name="L0" from="ES0" to="S0" transmission-capacity="100Mbps"/>
+<link name="L1" from="S0" to="ES1" transmission-capacity="100Mbps"/>
+<flow name="VL0" deadline="4" jitter="0" max-payload="100" period="2" priority="Low" source="ES9">
+<target name="ES1">
+<path node="S0"/>
+<path node="ES1"/>
+</target>
+</flow>
+</elements>
+"""
+
+wrongPaths = """<?xml version="1.0" encoding="UTF-8"?>
+<elements>
+<network name="paths" overhead="67" transmission-capacity="100Mbps" x-type="AFDX"/>
+<station name="ES0" transmission-capacity="100Mbps"/>
+<station name="ES1" transmission-capacity="100Mbps"/>
+<switch name="S0" transmission-capacity="100Mbps"/>
+<link name="L0" from="ES0" to="S0" transmission-capacity="100Mbps"/>
+<link name="L1" from="S0" to="ES1" transmission-capacity="100Mbps"/>
+<flow name="VL0" deadline="4" jitter="0" max-payload="100" period="2" priority="Low" source="ES0">
+<target name="ES1"/>
+</flow>
+<flow name="VL1" deadline="4" jitter="0" max-payload="100" period="2" priority="Low" source="ES0">
+<target name="ES1">
+<path node="S0"/>
+</target>
+</flow>
+</elements>
+"""
+
+class ParserTest(NetworkTestCase):
+    """ Errors found while reading networks """
+
+    def testErrorsReported(self):
+        """ Every error is printed with its line before the ValueError is raised """
+        path = self.path("broken.xml")
+        with open(path, "w") as networkFile:
+            networkFile.write(malformed)
+        output = io.StringIO()
+        with self.assertRaises(ValueError) as raised, contextlib.redirect_stdout(output):
+            parseXML(path)
+        errors = [line for line in output.getvalue().splitlines() if line.startswith("ERROR")]
+        self.assertEqual([error.split(":")[1] for error in errors], [" line 5", " line 6", " line 9"])
+        self.assertIn("fast", errors[0])
+        self.assertIn("transmission-capacity", errors[1])
+        self.assertIn("ES9", errors[2])
+        self.assertEqual(str(raised.exception), "3 errors found in {0}, the first at line 5".format(path))
+        self.assertTrue(gc.isenabled()) # Disabled while the network is built
+
+    def testMalformedXML(self):
+        path = self.path("truncated.xml")
+        with open(path, "w") as networkFile:
+            networkFile.write(malformed[:malformed.index("<flow")] + "<flow name=")
+        output = io.StringIO()
+        with self.assertRaises(ValueError), contextlib.redirect_stdout(output):
+            parseXML(path)
+        self.assertIn("ERROR: line 9", output.getvalue())
+
+    def testPathErrors(self):
+        """ Incorrect paths are reported with the other errors, an empty path would make the analysis fail """
+        path = self.path("paths.xml")
+        with open(path, "w") as networkFile:
+            networkFile.write(wrongPaths)
+        output = io.StringIO()
+        with self.assertRaises(ValueError) as raised, contextlib.redirect_stdout(output):
+            parseXML(path)
+        errors = [line for line in output.getvalue().splitlines() if line.startswith("ERROR")]
+        self.assertEqual(errors, ["ERROR: line 10: the path of VL0 to ES1 was not built correctly, the path is empty",
+                                  "ERROR: line 13: the path of VL1 to ES1 was not built correctly, the path ends at S0 instead of ES1"])
+        self.assertEqual(str(raised.exception), "2 errors found in {0}, the first at line 10".format(path))
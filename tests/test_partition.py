@@ -0,0 +1,24 @@
+from tests.common import NetworkTestCase, quiet, resultValues
+import multiprocessing
+import unittest
+import Partition
+
+@unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "components are analysed in forked processes")
+class PartitionTest(NetworkTestCase):
+    """ Analysing the independent components in worker processes gives the results of Network.analyze """
+
+    def testComponents(self):
+        path = self.generate("network.xml", seed = 1, switches = 10, flows = 40, multicast = 2, maxPathLength = 1, highPriorityShare = 0.3)
+        net = self.parse(path)
+        components = Partition.findComponents(net)
+        self.assertEqual(len(components), 10)
+        self.assertEqual(sorted(flow.name for component in components for flow in component), sorted(net.flows))
+        for solver in ["memoized", "topological"]:
+            for workers in [1, 3]:
+                with self.subTest(solver = solver, workers = workers):
+                    net = self.parse(path)
+                    with quiet():
+                        result = Partition.analyzeComponents(net, workers, solver)
+                    self.assertEqual(resultValues(result), self.analyse(path, solver))
+                    # Stored as the result of the network's analysis
+                    self.assertIs(net.analyze(solver), result)
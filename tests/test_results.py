@@ -0,0 +1,22 @@
+from tests.common import NetworkTestCase, fixtures, quiet, solvers
+import os
+
+class ResultsTest(NetworkTestCase):
+    """ Results files written by produceXML """
+
+    def testResultsMatchBaseline(self):
+        """ network_results.xml was written by the original parser and recursion """
+        with open(os.path.join(fixtures, "network_results.xml"), "rb") as fixture:
+            expected = fixture.read()
+        for solver in solvers:
+            with self.subTest(solver = solver):
+                self.requireSolver(solver)
+                net = self.parse(os.path.join(fixtures, "network.xml"), solver, checkStability = True)
+                self.assertEqual(self.produce(net), expected)
+
+    def testFailedAnalysisWritesNothing(self):
+        """ The results are written to a temporary file, removed when the analysis fails """
+        net = self.parse(os.path.join(fixtures, "ring.xml"), "memoized")
+        with self.assertRaises(ValueError), quiet():
+            self.produce(net)
+        self.assertEqual(os.listdir(self.folder.name), [])
@@ -0,0 +1,53 @@
+from tests.common import NetworkTestCase, quiet
+from unittest import mock
+from Classes import Target
+import Screening
+
+class ScreeningTest(NetworkTestCase):
+    """ The bounds of the screening are never below the delays of the analysis, and only the flows they can't clear are analysed """
+
+    def testBoundsAboveDelays(self):
+        for seed in range(4):
+            path = self.generate("network.xml", seed = seed, switches = 6, flows = 80, multicast = 3, highPriorityShare = 0.5)
+            for solver in ["memoized", "topological"]:
+                with self.subTest(seed = seed, solver = solver):
+                    net = self.parse(path, solver)
+                    bounds = Screening.DelayBounds(net)
+                    with quiet():
+                        delays = net.analyze().delays
+                    for flow in net.flows.values():
+                        for target in flow.targets.values():
+                            self.assertGreaterEqual(bounds.getTargetBound(target), delays[flow.name][target.name])
+
+    def testSafeFlowsNotAnalysed(self):
+        path = self.generate("network.xml", seed = 5, switches = 6, flows = 80, multicast = 3, highPriorityShare = 0.5)
+        net = self.parse(path)
+        bounds = Screening.DelayBounds(net)
+        flowBounds = {flow.name: max(bounds.getTargetBound(target) for target in flow.targets.values()) for flow in net.flows.values()}
+        # Half the flows get a deadline below their bound
+        deadline = sorted(flowBounds.values())[len(flowBounds)//2]
+        for flow in net.flows.values():
+            flow.deadline = deadline
+        with quiet():
+            delays = self.parse(path).analyze().delays
+
+        analysed = []
+        computeEndToEndDelay = Target.computeEndToEndDelay
+        def recordFlow(target, *args):
+            analysed.append(target.parentFlow.name)
+            return computeEndToEndDelay(target, *args)
+        with mock.patch.object(Target, "computeEndToEndDelay", autospec = True, side_effect = recordFlow):
+            with quiet():
+                reports = Screening.screenDeadlines(net)
+
+        unsafe = [name for name, bound in flowBounds.items() if bound > deadline]
+        self.assertTrue(0 < len(unsafe) < len(net.flows))
+        self.assertEqual(sorted(set(analysed)), sorted(unsafe))
+        for name, report in reports.items():
+            if name in unsafe:
+                self.assertEqual(report["status"], "met" if report["delay"] <= deadline else "missed")
+                self.assertLessEqual(report["delay"], report["bound"])
+            else:
+                self.assertEqual(report["status"], "safe")
+                self.assertIsNone(report["delay"])
+                self.assertLessEqual(max(delays[name].values()), deadline)
@@ -0,0 +1,114 @@
+from tests.common import NetworkTestCase, fixtures, quiet
+import contextlib
+import io
+import os
+import socket
+import threading
+import Server
+
+network = os.path.join(fixtures, "network.xml")
+
+class ServerTest(NetworkTestCase):
+    """ Queries answered by AnalysisServer.handle """
+
+    def setUp(self):
+        super().setUp()
+        self.server = Server.AnalysisServer()
+        with quiet():
+            self.name = self.server.load(network)
+        self.net = self.server.networks[self.name]
+
+    def handle(self, method, path, query = {}, body = None):
+        with quiet():
+            return self.server.handle(method, path, query, body)
+
+    def testDelay(self):
+        result = self.net.analyze()
+        status, answer = self.handle("GET", "/delay", {"flow": "VL3", "target": "ES0_2"})
+        self.assertEqual(status, 200)
+        self.assertEqual(answer["delay"], result.delays["VL3"]["ES0_2"])
+        status, answer = self.handle("GET", "/delay", {"flow": "VL3"})
+        self.assertEqual(answer["delays"], dict(result.delays["VL3"]))
+
+    def testBacklogAndLoad(self):
+        result = self.net.analyze()
+        status, answer = self.handle("GET", "/backlog", {"node": "S0"})
+        self.assertEqual(status, 200)
+        self.assertEqual(answer["totalBacklog"], result.totalBacklogs["S0"])
+        link = next(iter(answer["ports"]))
+        status, answer = self.handle("GET", "/load", {"link": link})
+        self.assertEqual((status, answer["stable"]), (200, result.stableLinks[link]))
+
+    def testErrors(self):
+        self.assertEqual(self.handle("GET", "/delay", {"flow": "VL9999"}), (404, {"error": "VL9999 is not a valid flow"}))
+        self.assertEqual(self.handle("GET", "/delay", {}), (400, {"error": "the flow parameter is required"}))
+        self.assertEqual(self.handle("GET", "/latency", {})[0], 404)
+        self.assertEqual(self.handle("POST", "/networks", {}, {"file": self.path("missing.xml")})[0], 404)
+        self.assertEqual(self.handle("POST", "/networks", {}, ["network.xml"])[0], 400)
+        self.assertEqual(self.handle("POST", "/networks", {}, {"file": 3})[0], 400)
+
+    def testInternalErrors(self):
+        """ Errors that are not caused by the query are logged, not answered """
+        def failingRoute(query, body):
+            return {}["missing"]
+        self.server.routes[("GET", "/delay")] = failingRoute
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status, answer = self.server.handle("GET", "/delay", {"flow": "VL3"})
+        self.assertEqual(status, 500)
+        self.assertNotIn("Traceback", answer["error"])
+        self.assertIn("Traceback", output.getvalue())
+
+    def testInvalidEdits(self):
+        for edit, status in [([], 400), ({"switches": {}}, 400), ({"links": []}, 400), ({"links": {"L9999": 1e8}}, 404),
+                             ({"links": {next(iter(self.net.links)): "fast"}}, 400), ({"nodes": {"S0": None}}, 400),
+                             ({"flows": {"VL3": {"payload": 100}}}, 400), ({"flows": {"VL3": {"period": True}}}, 400),
+                             ({"flows": {"VL3": 0.1}}, 400), ({"nodes": {"S9999": 1e8}}, 404)]:
+            with self.subTest(edit = edit):
+                self.assertEqual(self.handle("POST", "/whatif", {}, edit)[0], status)
+
+    def testFailedEdit(self):
+        """ An edit that can't be analysed is answered with its error, and undone """
+        before = self.net.analyze()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status, answer = self.server.handle("POST", "/whatif", {}, {"nodes": {"S0": 0}})
+        self.assertEqual(status, 400)
+        self.assertTrue(answer["error"].startswith("the proposed edit could not be analysed: ZeroDivisionError"))
+        self.assertNotIn("Traceback", answer["error"])
+        self.assertIn("Traceback", output.getvalue())
+        self.assertEqual(self.net.analyze().delays, before.delays)
+
+    def testListAndLoad(self):
+        status, answer = self.handle("POST", "/networks", {}, {"file": network})
+        self.assertEqual((status, answer), (200, {"network": self.name}))
+        status, answer = self.handle("GET", "/networks")
+        self.assertEqual(answer["networks"][self.name]["flows"], len(self.net.flows))
+
+    def testWhatIf(self):
+        """ The changes an edit would make are answered, and the network is left as it was """
+        before = self.net.analyze()
+        status, answer = self.handle("POST", "/whatif", {}, {"flows": {"VL3": {"max_payload": 1400}}})
+        self.assertEqual(status, 200)
+        changed = {(change["flow"], change["target"]): change for change in answer["delays"]}
+        self.assertIn(("VL3", "ES0_2"), changed)
+        for (flowName, targetName), change in changed.items():
+            self.assertEqual(change["before"], before.delays[flowName][targetName])
+            self.assertNotEqual(change["after"], change["before"])
+        self.assertEqual(self.net.flows["VL3"].max_payload, 367*8)
+        self.assertEqual(self.server.handle("GET", "/delay", {"flow": "VL3"}, None)[1]["delays"], dict(before.delays["VL3"]))
+
+    def testContentLength(self):
+        """ A malformed Content-Length is answered with 400, and the connection closed """
+        httpServer = Server.createServer(self.server, 0)
+        self.addCleanup(httpServer.server_close)
+        thread = threading.Thread(target = httpServer.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(httpServer.shutdown)
+        with socket.create_connection(httpServer.server_address, timeout = 10) as connection:
+            connection.sendall(b"POST /whatif HTTP/1.1\r\nHost: localhost\r\nContent-Length: twelve\r\n\r\n{}")
+            with quiet():
+                response = connection.makefile("rb").read()
+        self.assertTrue(response.startswith(b"HTTP/1.1 400"))
+        self.assertIn(b"the Content-Length header is not valid", response)
@@ -0,0 +1,78 @@
+from tests.common import NetworkTestCase, createConfig, fixtures, quiet, resultValues
+import contextlib
+import io
+import os
+import Instrumentation
+import Snapshot
+import Utils
+from Parser import parseXML
+
+network = os.path.join(fixtures, "network.xml")
+
+class SnapshotTest(NetworkTestCase):
+    """ Networks loaded from a snapshot are those saved """
+
+    def load(self, net, includeResults = False):
+        path = self.path("network.snapshot")
+        with quiet():
+            Snapshot.saveSnapshot(net, path, includeResults)
+            return Snapshot.loadSnapshot(path)
+
+    def testRoundTrip(self):
+        net = self.parse(network)
+        loaded = self.load(net)
+        self.assertEqual(list(loaded.flows), list(net.flows))
+        self.assertEqual(list(loaded.links), list(net.links))
+        self.assertEqual(self.produce(loaded), self.produce(net))
+
+    def testNetworkUnchanged(self):
+        """ Saving reads the network without building its routes again """
+        net = self.parse(network)
+        with quiet():
+            net.analyze()
+        trees = [flow.getTree() for flow in net.flows.values()]
+        directions = [target.linkDirections for flow in net.flows.values() for target in flow.targets.values()]
+        self.load(net, True)
+        self.assertEqual([flow.tree for flow in net.flows.values()], trees)
+        for before, target in zip(directions, (target for flow in net.flows.values() for target in flow.targets.values())):
+            self.assertIs(target.linkDirections, before)
+
+    def testResults(self):
+        """ The stored results are not computed again, and the loaded network is updated as the saved one """
+        for solver in ["memoized", "fixedpoint"]:
+            with self.subTest(solver = solver):
+                net = self.parse(network, solver)
+                with quiet():
+                    expected = resultValues(net.analyze())
+                with Utils.ConfigScope(createConfig(solver, instrument = True)):
+                    loaded = self.load(net, True)
+                    Instrumentation.reset()
+                    with quiet():
+                        self.assertEqual(resultValues(loaded.analyze()), expected)
+                    self.assertEqual(Instrumentation.counters.get("ports.evaluated", 0), 0)
+                    with quiet():
+                        for edited in [net, loaded]:
+                            edited.modifyFlow("VL7", max_payload = 1400)
+                        self.assertEqual(resultValues(loaded.analyze()), resultValues(net.analyze()))
+
+    def testPathErrors(self):
+        """ Networks with incorrect paths can't be parsed, and can't be saved """
+        with open(network) as networkFile:
+            text = networkFile.read()
+        path = self.path("broken.xml")
+        with open(path, "w") as networkFile:
+            networkFile.write(text.replace('<path node="S1" />\n\t\t\t<path node="S0" />', '<path node="S0" />', 1))
+        output = io.StringIO()
+        with self.assertRaises(ValueError), contextlib.redirect_stdout(output):
+            parseXML(path)
+        self.assertIn("was not built correctly", output.getvalue())
+
+        net = self.parse(network)
+        target = next(iter(net.flows["VL7"].targets.values()))
+        target.path = []
+        snapshot = self.path("broken.snapshot")
+        output = io.StringIO()
+        with self.assertRaises(ValueError), contextlib.redirect_stdout(output):
+            Snapshot.saveSnapshot(net, snapshot)
+        self.assertEqual(output.getvalue(), "ERROR: the path of VL7 to {0} was not built correctly, the path is empty!\n".format(target.name))
+        self.assertFalse(os.path.exists(snapshot))
@@ -0,0 +1,44 @@
+from tests.common import NetworkTestCase, quiet, resultValues
+import threading
+
+class StateTest(NetworkTestCase):
+    """ Analyses with their own AnalysisState don't share results """
+
+    def testThreads(self):
+        """ Threads analysing the network at the same time build its lazy caches together """
+        path = self.generate("network.xml", seed = 4, switches = 6, flows = 200, multicast = 3, highPriorityShare = 0.5)
+        net = self.parse(path)
+        with quiet():
+            expected = resultValues(net.analyze(state = net.createState()))
+        for attempt in range(5):
+            net.invalidateLinkStatistics(True)
+            for flow in net.flows.values():
+                flow.tree = None
+            states = [net.createState() for thread in range(8)]
+            results = [None]*len(states)
+            barrier = threading.Barrier(len(states))
+            def analyse(index):
+                barrier.wait()
+                try:
+                    results[index] = resultValues(net.analyze(state = states[index]))
+                except Exception as error:
+                    results[index] = error
+            threads = [threading.Thread(target = analyse, args = (index,)) for index in range(len(states))]
+            with quiet():
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            self.assertEqual(results, [expected]*len(states))
+
+    def testForkKeepsResults(self):
+        path = self.generate("network.xml", seed = 5, switches = 4, flows = 40, multicast = 2)
+        net = self.parse(path)
+        with quiet():
+            expected = resultValues(net.analyze())
+            state = net.state.fork()
+            net.modifyFlow("VL3", period = net.flows["VL3"].period/2)
+            modified = resultValues(net.analyze())
+            self.assertNotEqual(modified, expected)
+            # The fork was computed before the edit, it is emptied and computed again for the edited network
+            self.assertEqual(resultValues(net.analyze(state = state)), modified)
@@ -0,0 +1,98 @@
+from tests.common import NetworkTestCase, quiet, resultValues
+import multiprocessing
+import unittest
+from unittest import mock
+import Sweep
+
+def applyScenario(net, overrides):
+    """ Applies a scenario with the mutation API of Network, as a user editing the network would """
+    for name, parameters in overrides.get("flows", {}).items():
+        net.modifyFlow(name, **parameters)
+    for name, transmission_capacity in overrides.get("links", {}).items():
+        net.setLinkCapacity(name, transmission_capacity)
+    for name, transmission_capacity in overrides.get("nodes", {}).items():
+        net.setNodeCapacity(name, transmission_capacity)
+
+class SweepTest(NetworkTestCase):
+    """ Each row of a sweep holds the results of the network edited by its scenario and analysed from the start """
+
+    def setUp(self):
+        super().setUp()
+        self.networkPath = self.generate("network.xml", seed = 3, switches = 4, flows = 30, multicast = 2, highPriorityShare = 0.5)
+        net = self.parse(self.networkPath)
+        self.scenarios = [{},
+                          {"flows": {"VL3": {"max_payload": 1500}}},
+                          {"flows": {"VL5": {"priority": 1 - net.flows["VL5"].priority}, "VL8": {"period": 0.008}}},
+                          {"links": {"L2": 5e7}},
+                          {"nodes": {"S1": 5e7}},
+                          {"flows": {"VL12": {"max_payload": 300}}, "nodes": {"S0": 2e8, "ES0_0": 5e7}}]
+
+    def expectedRow(self, overrides):
+        """ Returns the delays and backlogs of Network.analyze on a copy of the network edited by the scenario """
+        net = self.parse(self.networkPath)
+        with quiet():
+            applyScenario(net, overrides)
+            result = net.analyze()
+        delays = [result.delays[flow.name][target.name] for flow in net.flows.values() for target in flow.targets.values()]
+        backlogs = [result.ports[switch.name][link.name].backlog for switch in net.switches.values() for link in switch.getLinks()]
+        return repr((delays, backlogs))
+
+    def checkUnchanged(self, net, parameters):
+        self.assertEqual({name: (flow.max_payload, flow.period, flow.priority) for name, flow in net.flows.items()}, parameters)
+        with quiet():
+            self.assertEqual(resultValues(net.analyze()), self.analyse(self.networkPath))
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "scenarios are analysed in forked processes")
+    def testForkedScenarios(self):
+        net = self.parse(self.networkPath)
+        parameters = {name: (flow.max_payload, flow.period, flow.priority) for name, flow in net.flows.items()}
+        scenarios = self.scenarios + [{"flows": {"VL404": {"period": 0.008}}}]
+        for workers in [1, 3]:
+            with self.subTest(workers = workers):
+                with quiet():
+                    table = Sweep.runSweep(net, scenarios, workers)
+                self.assertEqual(table["targets"], [(flow.name, target.name) for flow in net.flows.values() for target in flow.targets.values()])
+                for index, overrides in enumerate(self.scenarios):
+                    self.assertIsNone(table["errors"][index])
+                    self.assertEqual(repr((table["delays"][index], table["backlogs"][index])), self.expectedRow(overrides))
+                # A failing scenario leaves the others alone
+                self.assertIsNone(table["delays"][-1])
+                self.assertIn("KeyError", table["errors"][-1])
+                self.checkUnchanged(net, parameters)
+
+    def testScenariosInProcess(self):
+        """ Where processes can't be forked, each scenario is applied and undone in the analysed network """
+        net = self.parse(self.networkPath)
+        parameters = {name: (flow.max_payload, flow.period, flow.priority) for name, flow in net.flows.items()}
+        with quiet():
+            net.analyze()
+        for index, overrides in enumerate(self.scenarios):
+            with self.subTest(scenario = index):
+                with quiet():
+                    delays, backlogs, error = Sweep.analyseScenario(net, overrides)
+                self.assertIsNone(error)
+                self.assertEqual(repr((delays, backlogs)), self.expectedRow(overrides))
+                self.checkUnchanged(net, parameters)
+
+    def testRestoreParameters(self):
+        """ A scenario that can't be undone incrementally has its values set back and the network analysed again """
+        net = self.parse(self.networkPath)
+        parameters = {name: (flow.max_payload, flow.period, flow.priority) for name, flow in net.flows.items()}
+        overrides = {"flows": {"VL3": {"max_payload": 1500}}, "nodes": {"S1": 5e7}}
+        with quiet():
+            net.analyze()
+        setNodeCapacity = net.setNodeCapacity
+        calls = []
+        def failUndo(name, transmission_capacity):
+            """ Applying the scenario works, undoing it fails """
+            calls.append(name)
+            if len(calls) > 1:
+                raise ValueError("undo")
+            setNodeCapacity(name, transmission_capacity)
+        with mock.patch.object(net, "setNodeCapacity", side_effect = failUndo):
+            with quiet():
+                delays, backlogs, error = Sweep.analyseScenario(net, overrides)
+        self.assertIsNone(error)
+        self.assertEqual(repr((delays, backlogs)), self.expectedRow(overrides))
+        self.assertEqual(net.getNode("S1").transmission_capacity, self.parse(self.networkPath).getNode("S1").transmission_capacity)
+        self.checkUnchanged(net, parameters)
@@ -0,0 +1,92 @@
+from tests.common import NetworkTestCase, quiet, resultValues, solvers
+
+def analyse(net):
+    """ Returns the resultValues of the network, or the error raised when it can't be analysed """
+    try:
+        with quiet():
+            return resultValues(net.analyze())
+    except ValueError:
+        return "ValueError"
+
+def editFlow(net, kind, name):
+    flow = net.flows[name]
+    with quiet():
+        if kind == "priority":
+            net.modifyFlow(name, priority = 1 - flow.priority)
+        elif kind == "period":
+            net.modifyFlow(name, period = flow.period*2)
+        elif kind == "payload":
+            net.modifyFlow(name, max_payload = flow.max_payload*2 + 800)
+        elif kind == "remove":
+            net.removeFlow(name)
+        elif kind == "capacity":
+            net.setNodeCapacity(flow.source.name, flow.source.transmission_capacity/3)
+
+class UpdateTest(NetworkTestCase):
+    """ The results updated after editing an analysed network are those of the edited network analysed from the start """
+
+    def checkEdits(self, path, solver, names):
+        for name in names:
+            for kind in ["priority", "period", "payload", "remove", "capacity"]:
+                with self.subTest(solver = solver, flow = name, edit = kind):
+                    net = self.parse(path, solver)
+                    analyse(net)
+                    editFlow(net, kind, name)
+                    fresh = self.parse(path, solver)
+                    editFlow(fresh, kind, name)
+                    self.assertEqual(analyse(net), analyse(fresh))
+
+    def testEdits(self):
+        path = self.generate("network.xml", seed = 1, switches = 5, flows = 80, multicast = 3, highPriorityShare = 0.5)
+        for solver in solvers[1:]:
+            self.requireSolver(solver)
+            self.checkEdits(path, solver, ["VL0", "VL17", "VL42", "VL79"])
+
+    def testCongestedEdits(self):
+        """ Ports whose delay is negative and priorities making the flows depend on each other """
+        path = self.generate("network.xml", seed = 7, switches = 10, flows = 300, multicast = 4, highPriorityShare = 0.5, transmissionCapacity = "1Gbps")
+        for solver in ["memoized", "topological", "vectorized"]:
+            self.requireSolver(solver)
+            self.checkEdits(path, solver, ["VL5", "VL150", "VL299"])
+
+    def testAddFlow(self):
+        path = self.generate("network.xml", seed = 2, switches = 5, flows = 60, multicast = 3, highPriorityShare = 0.5)
+        for solver in solvers[1:]:
+            with self.subTest(solver = solver):
+                self.requireSolver(solver)
+                net = self.parse(path, solver)
+                with quiet():
+                    flow = net.removeFlow("VL30")
+                analyse(net)
+                with quiet():
+                    net.addFlow(flow)
+                fresh = self.parse(path, solver)
+                with quiet():
+                    fresh.addFlow(fresh.removeFlow("VL30")) # Moved after the other flows too
+                self.assertEqual(analyse(net), analyse(fresh))
+
+    def testFlowEditsKeepResults(self):
+        """ Adding or removing a flow or changing its priority computes again the ports depending on it only """
+        path = self.generate("network.xml", seed = 2, switches = 5, flows = 60, multicast = 3)
+        for solver in solvers[1:]:
+            self.requireSolver(solver)
+            for kind in ["priority", "remove"]:
+                with self.subTest(solver = solver, edit = kind):
+                    net = self.parse(path, solver)
+                    analyse(net)
+                    editFlow(net, kind, "VL12")
+                    self.assertEqual(list(net.state.engines), [solver])
+                    fresh = self.parse(path, solver)
+                    editFlow(fresh, kind, "VL12")
+                    self.assertEqual(analyse(net), analyse(fresh))
+
+    def testUpdateWithoutOutputs(self):
+        """ Ports analysed by another solver are computed again by the engine of the network's solver, with the ports depending on them """
+        path = self.generate("network.xml", seed = 3, switches = 5, flows = 60, multicast = 3)
+        net = self.parse(path, "memoized")
+        with quiet():
+            net.analyze(solver = "topological")
+        editFlow(net, "period", "VL10")
+        fresh = self.parse(path, "memoized")
+        editFlow(fresh, "period", "VL10")
+        self.assertEqual(analyse(net), analyse(fresh))
@@ -0,0 +1,39 @@
+import gc
+import threading
+import unittest
+import Utils
+
+class CollectorTest(unittest.TestCase):
+    """ Pauses and freezes of the garbage collector from several threads end when the last one does """
+
+    def testOverlappingPauses(self):
+        self.assertTrue(gc.isenabled())
+        first, second = Utils.CollectionPause(), Utils.CollectionPause()
+        first.__enter__()
+        thread = threading.Thread(target = second.__enter__)
+        thread.start()
+        thread.join()
+        first.__exit__(None, None, None)
+        self.assertFalse(gc.isenabled()) # The other thread still builds its network
+        second.__exit__(None, None, None)
+        self.assertTrue(gc.isenabled())
+
+        # A collector disabled before stays disabled
+        gc.disable()
+        try:
+            with Utils.CollectionPause():
+                pass
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+
+    def testOverlappingFreezes(self):
+        first, second = Utils.HeapFreeze(), Utils.HeapFreeze()
+        first.__enter__()
+        frozen = gc.get_freeze_count()
+        self.assertGreater(frozen, 0)
+        second.__enter__()
+        first.__exit__(None, None, None)
+        self.assertGreaterEqual(gc.get_freeze_count(), frozen)
+        second.__exit__(None, None, None)
+        self.assertEqual(gc.get_freeze_count(), 0)